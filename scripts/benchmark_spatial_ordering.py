@@ -0,0 +1,112 @@
+"""Benchmark of the processing order of the buildings within a tile.
+
+The crop windows of the buildings are replayed tile by tile against a simulated LRU block
+cache (as the GDAL block cache), for the original order of the buildings and for the
+orderings of `utils.spatial_ordering`. The block cache hit rate is reported per ordering.
+
+Example:
+    PYTHONPATH=src python scripts/benchmark_spatial_ordering.py buildings.gpkg
+"""
+
+from collections import OrderedDict
+
+import click
+import numpy as np
+import pandas as pd
+
+from utils.building_artifact import CROP_BOX_COLUMNS, read_buildings
+from utils.opengeodata_nrw import DatasetType
+from utils.spatial_ordering import SpatialOrdering
+from utils.tile_catalog import load_default_catalog
+from utils.tile_prefetch import plan_tiles
+
+
+class BlockCacheSimulation:
+    def __init__(self, capacity: int):
+        """LRU cache of raster blocks, counting hits and misses.
+
+        Args:
+            capacity (int): number of blocks the cache holds
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+
+    def request(self, block):
+        if block in self._blocks:
+            self._blocks.move_to_end(block)
+            self.hits += 1
+            return
+
+        self.misses += 1
+        self._blocks[block] = None
+        if len(self._blocks) > self.capacity:
+            self._blocks.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+def replay_crop_reads(
+    crop_boxes: np.ndarray,
+    tile_bounds: tuple[float, float, float, float],
+    cache: BlockCacheSimulation,
+    resolution: float,
+    block_size: int,
+):
+    """Request the blocks of a tile touched by the crop windows, in the given order."""
+    min_x, _, _, max_y = tile_bounds
+    block_extent = resolution * block_size
+
+    for crop_min_x, crop_min_y, crop_max_x, crop_max_y in crop_boxes:
+        col_start = int(np.floor((crop_min_x - min_x) / block_extent))
+        col_stop = int(np.floor((crop_max_x - min_x) / block_extent))
+        row_start = int(np.floor((max_y - crop_max_y) / block_extent))
+        row_stop = int(np.floor((max_y - crop_min_y) / block_extent))
+        for row in range(row_start, row_stop + 1):
+            for col in range(col_start, col_stop + 1):
+                cache.request((tile_bounds, row, col))
+
+
+@click.command()
+@click.argument("buildings_file", type=click.Path(exists=True))
+@click.option("--resolution", default=0.1, show_default=True, help="Pixel size in meters.")
+@click.option("--block-size", default=1024, show_default=True, help="Block size in pixels.")
+@click.option("--cache-blocks", default=16, show_default=True, help="Capacity of the block cache.")
+def main(buildings_file: str, resolution: float, block_size: int, cache_blocks: int):
+    """Compare the block cache hit rate of the crop reads for the buildings in BUILDINGS_FILE
+    processed in their original order and along space-filling curves."""
+    buildings = read_buildings(buildings_file)
+    tile_manager = load_default_catalog().tile_manager(DatasetType.AERIAL_IMAGE)
+
+    results = []
+    for ordering in [None, *SpatialOrdering]:
+        plan = plan_tiles(buildings, {"aerial_tile": tile_manager}, ordering=ordering)
+
+        cache = BlockCacheSimulation(cache_blocks)
+        for tile_name, tile_buildings in plan.buildings_by_tile("aerial_tile").items():
+            replay_crop_reads(
+                tile_buildings[CROP_BOX_COLUMNS].to_numpy(),
+                tile_manager.get_tile_geometry(tile_name).bounds,
+                cache,
+                resolution,
+                block_size,
+            )
+
+        results.append(
+            {
+                "ordering": ordering if ordering is not None else "original",
+                "block_requests": cache.hits + cache.misses,
+                "block_reads": cache.misses,
+                "hit_rate": cache.hit_rate,
+            }
+        )
+
+    click.echo(pd.DataFrame(results).to_string(index=False, float_format="{:.3f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ TILES=("318_5653_1")
 SEGMENTATION_THRESHOLD=0.8
 
 MAIN_REPO_FOLDER=$(pwd)
-SOLAR_PANEL_DETECTOR_REPO_FOLDER="/Users/kopytjuk/Code/solar-panel-segmentation"
+SEGMENTATION_MODEL_FOLDER="$MAIN_REPO_FOLDER/results/training-20250610/stored_model"
 
 OUTPUT_MAIN_FOLDER=/Users/kopytjuk/Data/roof-analysis/Titz/
 
@@ -54,14 +54,8 @@ for TILE in "${TILES[@]}"; do
 
     echo "----- Detect solar panels from images -----"
 
-    cd $SOLAR_PANEL_DETECTOR_REPO_FOLDER
-
     # create segmentation masks
-    
-    poetry run python run.py segment_new_data $IMAGES_AND_MASKS_PARENT_FOLDER $SEGMENTATION_MASK_FOLDER
-
-    # go back
-    cd $MAIN_REPO_FOLDER
+    poetry run segment-buildings $CROPPED_IMAGES_FOLDER $SEGMENTATION_MODEL_FOLDER $SEGMENTATION_MASK_FOLDER
 
     echo "----- Determine the energy yield -----"
     poetry run energy-extractor "$TILE_RESULT_FOLDER/buildings_general_info.gpkg" $CROPPED_IMAGES_FOLDER $SEGMENTATION_MASK_FOLDER \
@@ -2,7 +2,11 @@ import logging
 
 import click
 
-from building_finder.extract_buildings import extract_buildings, write_gdf_to
+from building_finder.extract_buildings import (
+    create_building_artifact,
+    extract_buildings,
+    write_gdf_to,
+)
 from utils.logging import get_client_logger
 
 logger = get_client_logger()
@@ -36,6 +40,9 @@ def building_finder_cli(
         with_address=with_address_only,
     )
 
+    # reprojected and prepared once for all later stages
+    buildings_gdf = create_building_artifact(buildings_gdf)
+
     write_gdf_to(
         output_location,
         buildings_gdf,
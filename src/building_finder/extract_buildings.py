@@ -2,6 +2,7 @@ import io
 import os
 from pathlib import Path
 
+import geopandas as gpd
 from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient
 from shapely.geometry import box
@@ -10,10 +11,13 @@ from utils import (
     get_bounding_box_from_tile_name,
     get_buildings_from_bbox,
     transform_utm32N_to_wgs84,
-    transform_wgs84_to_utm32N,
 )
 from utils.azure import parse_blob_storage_uri
+from utils.building_artifact import add_building_columns
 from utils.logging import get_library_logger
+from utils.opengeodata_nrw import DatasetType
+from utils.tile_catalog import load_default_catalog
+from utils.transform import UTM_EPSG
 
 logger = get_library_logger(__name__)
 
@@ -34,8 +38,7 @@ def extract_buildings(tile_name: str, with_address: bool = False):
     logger.info(f"Found {len(buildings_from_bbox)} buildings in the bounding box!")
 
     # Compute the area for all geometries and store it in a column (m² in UTM32N)
-    area_arr = [transform_wgs84_to_utm32N(geom).area for geom in buildings_from_bbox.geometry]
-    buildings_from_bbox["area"] = area_arr
+    buildings_from_bbox["area"] = buildings_from_bbox.geometry.to_crs(UTM_EPSG).area
 
     if len(buildings_from_bbox) == 0:
         return
@@ -43,6 +46,37 @@ def extract_buildings(tile_name: str, with_address: bool = False):
     return buildings_from_bbox
 
 
+def create_building_artifact(buildings: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Convert the buildings into the UTM-native artifact read by the later stages, see
+    `utils.building_artifact`.
+
+    Tile keys are added for the aerial images and the energy yield, in case the tile
+    catalog is available.
+
+    Args:
+        buildings (gpd.GeoDataFrame): buildings (WGS84), see `extract_buildings`
+
+    Returns:
+        gpd.GeoDataFrame: buildings in UTM32N with precomputed columns
+    """
+    try:
+        catalog = load_default_catalog()
+    except FileNotFoundError as e:
+        logger.warning(f"No tile keys are added to the buildings: {e}")
+        return add_building_columns(buildings)
+
+    tile_datasets = {
+        "aerial_tile": DatasetType.AERIAL_IMAGE,
+        "energy_tile": DatasetType.ENERGY_YIELD_50CM,
+    }
+    tile_managers = {
+        tile_column: catalog.tile_manager(dataset_type)
+        for tile_column, dataset_type in tile_datasets.items()
+        if dataset_type in catalog.datasets
+    }
+    return add_building_columns(buildings, tile_managers)
+
+
 def write_gdf_to(output_location, buildings_from_bbox, file_name):
     is_remote = "://" in output_location
     logger.info(f"The output remote storage: {is_remote}")
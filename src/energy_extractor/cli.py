@@ -1,7 +1,16 @@
+from contextlib import ExitStack
+
 import click
+import geopandas as gpd
 
-from energy_extractor.energy_extraction import extract_energy_from_buildings
+from energy_extractor.energy_extraction import (
+    ENERGY_DATASETS,
+    EnergyEngine,
+    extract_energy_from_buildings,
+)
+from energy_extractor.potential_cache import PotentialEnergyCache
 from utils.logging import get_client_logger
+from utils.raw_raster_cache import RawRasterCache
 
 logger = get_client_logger()
 
@@ -17,6 +26,74 @@ logger = get_client_logger()
 @click.argument("result_file", type=click.Path(exists=False))
 @click.option("-st", "--segmentation-threshold", default=0.8, type=click.FLOAT)
 @click.option("-e", "--efficiency_panel", default=0.21, type=click.FLOAT)
+@click.option(
+    "--max-cache-gb",
+    default=None,
+    type=click.FLOAT,
+    help="Disk budget for downloaded energy yield tiles, least recently used tiles are evicted.",
+)
+@click.option(
+    "--engine",
+    default=EnergyEngine.WINDOW.value,
+    type=click.Choice([e.value for e in EnergyEngine]),
+    show_default=True,
+    help="Window reads per building or zonal statistics per energy yield tile.",
+)
+@click.option(
+    "--potential-cache",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="SQLite file caching the potential energy per building across runs "
+    "(requires --engine zonal).",
+)
+@click.option(
+    "--sweep-threshold",
+    "sweep_thresholds",
+    multiple=True,
+    type=click.FLOAT,
+    help="Segmentation threshold of a sweep (repeatable), the result is a long format "
+    "table with a row per building, threshold and efficiency.",
+)
+@click.option(
+    "--sweep-efficiency",
+    "sweep_efficiencies",
+    multiple=True,
+    type=click.FLOAT,
+    help="Panel efficiency of a sweep (repeatable). Defaults to --efficiency_panel.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of worker processes, the energy yield tiles are distributed among them.",
+)
+@click.option(
+    "--energy-dataset",
+    default=ENERGY_DATASETS[0].value,
+    type=click.Choice([d.value for d in ENERGY_DATASETS]),
+    show_default=True,
+    help="Energy yield dataset (resolution) of the buildings outside --energy-regions.",
+)
+@click.option(
+    "--energy-regions",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Polygons with a `dataset` column, buildings within use that energy yield dataset.",
+)
+@click.option(
+    "--raw-cache",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Folder of uncompressed, memory-mapped copies of the energy yield tiles, "
+    "each tile is decompressed once and reused across runs.",
+)
+@click.option(
+    "--remote",
+    is_flag=True,
+    default=False,
+    help="Read windows of the energy yield tiles by HTTP range requests instead of "
+    "downloading whole tiles.",
+)
 def energy_extractor_cli(
     buildings_file: str,
     cropped_images_folder: str,
@@ -24,6 +101,16 @@ def energy_extractor_cli(
     result_file: str,
     segmentation_threshold: float,
     efficiency_panel: float,
+    max_cache_gb: float | None,
+    engine: str,
+    potential_cache: str | None,
+    sweep_thresholds: tuple[float, ...],
+    sweep_efficiencies: tuple[float, ...],
+    workers: int,
+    energy_dataset: str,
+    energy_regions: str | None,
+    raw_cache: str | None,
+    remote: bool,
 ):
     """
     Extract soloar energy yields for each building in BUILDINGS_FILE. The tool relies
@@ -37,18 +124,45 @@ def energy_extractor_cli(
         segmentation_threshold (float): threshold for a segmentation result of a pixel,
             above which a solar panel installation is assumed
         efficiency_panel (float): assumed efficiency of the solar panel
+        max_cache_gb (float | None): disk budget for the tile data in GB
+        engine (str): computation engine, see `EnergyEngine`
+        potential_cache (str | None): potential energy cache file
+        sweep_thresholds (tuple[float, ...]): segmentation thresholds of a sweep
+        sweep_efficiencies (tuple[float, ...]): panel efficiencies of a sweep
+        workers (int): number of worker processes
+        energy_dataset (str): energy yield dataset, see `ENERGY_DATASETS`
+        energy_regions (str | None): file with regions of other energy yield datasets
+        raw_cache (str | None): folder of the raw energy yield tiles
+        remote (bool): whether to read the energy yield tiles remotely
     """
 
     energy_data_location = "data"
-    energy_info = extract_energy_from_buildings(
-        buildings_file,
-        cropped_images_folder,
-        segmentation_result_folder,
-        energy_data_location,
-        segmentation_threshold=segmentation_threshold,
-        efficiency=efficiency_panel,
-    )
-    energy_info.to_csv(result_file)
+    with ExitStack() as stack:
+        cache = (
+            stack.enter_context(PotentialEnergyCache(potential_cache))
+            if potential_cache is not None
+            else None
+        )
+        energy_info = extract_energy_from_buildings(
+            buildings_file,
+            cropped_images_folder,
+            segmentation_result_folder,
+            energy_data_location,
+            segmentation_threshold=segmentation_threshold,
+            efficiency=efficiency_panel,
+            max_cache_bytes=int(max_cache_gb * 1024**3) if max_cache_gb is not None else None,
+            engine=engine,
+            potential_cache=cache,
+            sweep_thresholds=sweep_thresholds or None,
+            sweep_efficiencies=sweep_efficiencies or None,
+            workers=workers,
+            energy_dataset=energy_dataset,
+            energy_regions=gpd.read_file(energy_regions) if energy_regions is not None else None,
+            raw_cache=RawRasterCache(raw_cache) if raw_cache is not None else None,
+            remote=remote,
+        )
+    # the long format table of a sweep has no index
+    energy_info.to_csv(result_file, index=len(sweep_thresholds) == 0)
 
     logger.info("Processing complete!")
 
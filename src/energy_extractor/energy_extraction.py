@@ -1,8 +1,14 @@
+import multiprocessing
 import os
-from ast import literal_eval as make_tuple
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import ExitStack, nullcontext
 from dataclasses import dataclass
+from enum import StrEnum
 from pathlib import Path
 
+import affine
 import geopandas as gpd
 import numpy as np
 import pandas as pd
@@ -10,165 +16,952 @@ import rasterio
 import shapely
 from PIL import Image
 from rasterio.features import rasterize
+from rasterio.io import DatasetReader
 from rasterio.windows import transform as window_transform
 from tqdm import tqdm
 
+from energy_extractor.potential_cache import PotentialEnergyCache, geometry_hashes
+from energy_extractor.sweep import SEGMENTATION_LEVELS, sweep_energy
+from energy_extractor.zonal import (
+    YieldFootprint,
+    compute_energy,
+    compute_footprints,
+    compute_histograms,
+    read_zonal_area,
+)
+from utils.building_artifact import CENTROID_COLUMNS, read_buildings, tile_key_column
+from utils.cog import COG_SUFFIX
+from utils.crop_store import TRANSFORM_COLUMNS, CropStore
 from utils.logging import get_library_logger
+from utils.mosaic import open_mosaic
 from utils.opengeodata_nrw import DatasetType
+from utils.pipeline import Pipeline, Stage
+from utils.raster_pool import RasterDatasetPool, get_default_pool
+from utils.raw_raster_cache import RawRasterCache
+from utils.remote_tiles import is_remote_path
+from utils.tile_cache import TileCache
+from utils.tile_catalog import load_default_catalog
 from utils.tile_management import TileManager
-from utils.transform import transform_wgs84_to_utm32N
+from utils.tile_prefetch import iter_tiles_with_prefetch, plan_tiles
+from utils.window_planning import read_window
 
 logger = get_library_logger(__name__)
 
 
+# energy yield datasets (resolutions) the energy can be extracted from
+ENERGY_DATASETS = [DatasetType.ENERGY_YIELD_50CM, DatasetType.ENERGY_YIELD_100CM]
+
+
+class EnergyEngine(StrEnum):
+    # a window read and rasterization per building
+    WINDOW = "window"
+    # a single read, rasterization and bincount per energy tile, see `energy_extractor.zonal`
+    ZONAL = "zonal"
+
+
 @dataclass
 class CroppedImageExtent:
     width: int
     height: int
-    trafo_px_to_geo: tuple[float]
+    trafo_px_to_geo: affine.Affine
 
     def to_utm_bounds(self) -> shapely.Polygon:
         image_bounds = shapely.box(0, 0, self.width, self.height)
-        return shapely.affinity.affine_transform(image_bounds, self.trafo_px_to_geo)
+        return shapely.affinity.affine_transform(image_bounds, self.trafo_px_to_geo.to_shapely())
 
 
-def extract_energy_from_buildings(
-    buildings_file: str,
-    cropped_images_folder: str,
-    segmentation_output_folder: str,
-    energy_data_location: str,
+@dataclass
+class BuildingYieldData:
+    """Input data of the energy computation of a single building.
+
+    Attributes:
+        building_order: position of the building in the buildings file
+        building_id: building identifier
+        building_polygon_utm: building outline (UTM32N)
+        yield_data: energy yield of the crop area (kWh/m² per pixel)
+        yield_transform: transformation of `yield_data` pixels to UTM32N
+        segmentation_mask: segmentation result of the crop (0..255), resized to
+            `yield_data`
+    """
+
+    building_order: int
+    building_id: int
+    building_polygon_utm: shapely.Polygon
+    yield_data: np.ndarray
+    yield_transform: affine.Affine
+    segmentation_mask: np.ndarray
+
+
+def read_yield_window(
+    yield_dataset: DatasetReader, area_utm: shapely.Polygon
+) -> tuple[np.ndarray, affine.Affine]:
+    """Read the energy yield within an area.
+
+    Args:
+        yield_dataset (DatasetReader): energy yield tile or mosaic
+        area_utm (shapely.Polygon): area (UTM32N)
+
+    Returns:
+        tuple[np.ndarray, affine.Affine]: energy yield and its transformation
+    """
+    # transforms a UTM coordinate to pixel coordinates
+    transform_px_to_geo_yield = yield_dataset.transform
+
+    crop_window = rasterio.windows.from_bounds(
+        *area_utm.bounds,
+        transform=transform_px_to_geo_yield,
+    )
+
+    yield_cropped_area = read_window(yield_dataset, crop_window, indexes=[1])
+    yield_cropped_area = yield_cropped_area[0, ...]
+
+    return yield_cropped_area, window_transform(crop_window, transform_px_to_geo_yield)
+
+
+def compute_building_energy(
+    data: BuildingYieldData,
     *,
+    no_data_value: float | None,
     segmentation_threshold: float,
-    efficiency: float = 0.21,
-) -> pd.DataFrame:
-    buildings = gpd.read_file(buildings_file)
+    efficiency: float,
+) -> dict:
+    """Energy yield of a building, in total and of its solar panel installations.
+
+    Args:
+        data (BuildingYieldData): input data of the building
+        no_data_value (float | None): no data value of the energy yield
+        segmentation_threshold (float): threshold of the segmentation result (0..1)
+        efficiency (float): efficiency of the solar panels
+
+    Returns:
+        dict: energy statistics of the building
+    """
+    yield_cropped_area = data.yield_data
+
+    # raw rasters are read-only and have their no data values replaced already
+    if no_data_value is not None:
+        yield_cropped_area[yield_cropped_area == no_data_value] = (
+            0  # we assume the energy output is 0kWh/m^2 for this pixel
+        )
 
-    cropped_images_folder = Path(cropped_images_folder)
+    building_mask = rasterize(
+        [data.building_polygon_utm],
+        out_shape=yield_cropped_area.shape,
+        transform=data.yield_transform,
+        fill=0,
+        default_value=1,
+        dtype=np.uint8,
+    ).astype(bool)
+
+    building_yield_bitmap = np.where(
+        building_mask,
+        yield_cropped_area,
+        np.zeros_like(yield_cropped_area),
+    )
 
-    cropped_images_overview = pd.read_csv(cropped_images_folder / "overview.csv")
-    cropped_images_overview = cropped_images_overview.set_index("building_id")  # for faster lookup
+    solar_panel_segmentation_mask = data.segmentation_mask / 255  # to 0..1
 
-    segmentation_output_folder = Path(segmentation_output_folder)
+    # 0: does not exist, 1: exists
+    solar_panel_existence_in_building_mask = solar_panel_segmentation_mask > segmentation_threshold
 
-    tile_manager_energy = TileManager.from_html_extraction_result(
-        "data/Strahlungsenergie-0.5x0.5.csv",
-        data_folder=energy_data_location,
-        tile_type=DatasetType.ENERGY_YIELD_50CM,
+    # keep only pixel within the building
+    solar_panel_existence_in_building_mask = building_mask & solar_panel_existence_in_building_mask
+
+    actual_yield_bitmap = np.where(
+        solar_panel_existence_in_building_mask,
+        building_yield_bitmap,
+        np.zeros_like(building_yield_bitmap),
     )
 
-    # for collecting results
-    energy_stats = []
+    area_pixel = abs(data.yield_transform.determinant)  # in m2, of the energy yield grid
+    actual_energy = actual_yield_bitmap.sum() * area_pixel
+    potential_energy = building_yield_bitmap.sum() * area_pixel
 
-    # iterate over each building and extract the energy yield
-    for _, building in tqdm(buildings.iterrows(), total=len(buildings)):
-        building_id = building["building_id"]
-        building_wgs84_polygon = building["geometry"]
+    return {
+        "building_order": data.building_order,
+        "building_id": data.building_id,
+        "actual_energy_kWh": actual_energy,
+        "mined_energy_kWh": actual_energy * efficiency,
+        "potential_energy_kWh": potential_energy,
+    }
 
-        # skipped, in case image cropping did not work
-        if building_id not in cropped_images_overview.index:
-            continue
 
-        crop_image_info = cropped_images_overview.loc[building_id]
-        cropped_transform_px_to_geo = make_tuple(crop_image_info["transform_px_to_geo"])
-        cie = CroppedImageExtent(
-            crop_image_info["image_shape_width"],
-            crop_image_info["image_shape_height"],
-            cropped_transform_px_to_geo,
+def compute_building_histogram(
+    data: BuildingYieldData,
+    *,
+    no_data_value: float | None,
+) -> dict:
+    """Potential energy of a building and its histogram over the segmentation result.
+
+    Args:
+        data (BuildingYieldData): input data of the building
+        no_data_value (float | None): no data value of the energy yield
+
+    Returns:
+        dict: potential energy and `histogram`, see `energy_extractor.sweep`
+    """
+    yield_cropped_area = data.yield_data
+
+    # raw rasters are read-only and have their no data values replaced already
+    if no_data_value is not None:
+        yield_cropped_area[yield_cropped_area == no_data_value] = (
+            0  # we assume the energy output is 0kWh/m^2 for this pixel
         )
-        cropped_image_extent_utm = cie.to_utm_bounds()
 
-        building_polygon_utm = transform_wgs84_to_utm32N(building_wgs84_polygon)
+    building_mask = rasterize(
+        [data.building_polygon_utm],
+        out_shape=yield_cropped_area.shape,
+        transform=data.yield_transform,
+        fill=0,
+        default_value=1,
+        dtype=np.uint8,
+    ).astype(bool)
+
+    building_yield = yield_cropped_area[building_mask]
+    histogram = np.bincount(
+        data.segmentation_mask[building_mask],
+        weights=building_yield,
+        minlength=SEGMENTATION_LEVELS,
+    )
 
-        tile_name = tile_manager_energy.get_tile_name_from_point(
-            building_polygon_utm.centroid.x,
-            building_polygon_utm.centroid.y,
-            with_extension=False,
-        )
+    area_pixel = abs(data.yield_transform.determinant)  # in m2, of the energy yield grid
+    return {
+        "building_order": data.building_order,
+        "building_id": data.building_id,
+        "potential_energy_kWh": building_yield.sum() * area_pixel,
+        "histogram": histogram * area_pixel,
+    }
 
-        if not tile_manager_energy.check_if_tile_exists(tile_name):
-            logger.info(f"Downloading tile data for {tile_name}")
-            tile_manager_energy.download_tile(tile_name)
-            logger.info("Download complete!")
 
-        # assemble the energy tile file name
-        file_extension = tile_manager_energy.file_extension
-        energy_map_filename = f"{tile_name}.{file_extension}"
-        energy_filepath = os.path.join(energy_data_location, energy_map_filename)
+@dataclass
+class TileEnergyResult:
+    """Result of `extract_tile_energy`.
+
+    Attributes:
+        energy_stats: energy statistics (or histograms of a sweep) per building, with its
+            position in the buildings file as `building_order`
+        footprints: yield footprint per building (zonal engine only)
+    """
+
+    energy_stats: list[dict]
+    footprints: list[YieldFootprint] | None = None
+
+
+def crop_extents(crops: pd.DataFrame) -> np.ndarray:
+    """Extents of crops (UTM32N).
+
+    Args:
+        crops (pd.DataFrame): crop store index rows
+
+    Returns:
+        np.ndarray: polygon per crop
+    """
+    return np.array(
+        [
+            CroppedImageExtent(
+                crop_info["width"],
+                crop_info["height"],
+                affine.Affine(*crop_info[TRANSFORM_COLUMNS]),
+            ).to_utm_bounds()
+            for _, crop_info in crops.iterrows()
+        ],
+        dtype=object,
+    )
 
-        with rasterio.open(energy_filepath) as energy_yield_file:
-            # transforms a UTM coordinate to pixel coordinates
-            transform_px_to_geo_yield = energy_yield_file.transform
 
-            no_data_value = energy_yield_file.profile["nodata"]
+def find_energy_neighbour_tiles(
+    areas: np.ndarray, tile_manager: TileManager, tile_name: str
+) -> list[str]:
+    """Find the neighbouring tiles which the read areas of a tile extend into.
 
-            crop_window = rasterio.windows.from_bounds(
-                *cropped_image_extent_utm.bounds,
-                transform=transform_px_to_geo_yield,
-            )
+    Args:
+        areas (np.ndarray): read areas of the tile (UTM32N)
+        tile_manager (TileManager): tile manager of the energy yield
+        tile_name (str): tile name
 
-            yield_cropped_area = energy_yield_file.read(window=crop_window)
-            yield_cropped_area = yield_cropped_area[0, ...]
+    Returns:
+        list[str]: neighbouring tile names
+    """
+    outside = ~shapely.contains(tile_manager.get_tile_geometry(tile_name), areas)
 
-            yield_cropped_area[yield_cropped_area == no_data_value] = (
-                0  # we assume the energy output is 0kWh/m^2 for this pixel
-            )
+    neighbour_tiles = set()
+    for area in areas[outside]:
+        neighbour_tiles.update(tile_manager.get_tiles_intersecting(area))
+    neighbour_tiles.discard(tile_name)
+
+    return sorted(neighbour_tiles)
 
-            yield_cropped_area_trafo = window_transform(crop_window, transform_px_to_geo_yield)
-
-            building_mask = rasterize(
-                [building_polygon_utm],
-                out_shape=yield_cropped_area.shape,
-                transform=yield_cropped_area_trafo,
-                fill=0,
-                default_value=1,
-                dtype=np.uint8,
-            ).astype(bool)
-
-            building_yield_bitmap = np.where(
-                building_mask,
-                yield_cropped_area,
-                np.zeros_like(yield_cropped_area),
+
+def extract_tile_energy(
+    tile_name: str,
+    energy_filepath: Path | None,
+    tile_buildings: pd.DataFrame,
+    crops: pd.DataFrame,
+    segmentation_output_folder: Path,
+    *,
+    segmentation_threshold: float,
+    efficiency: float,
+    engine: EnergyEngine = EnergyEngine.WINDOW,
+    sweep: bool = False,
+    neighbour_tile_paths: dict[str, Path] | None = None,
+    footprints: list[YieldFootprint | None] | None = None,
+    raster_pool: RasterDatasetPool | None = None,
+    raw_cache: RawRasterCache | None = None,
+    read_threads: int = 2,
+    compute_threads: int = 2,
+) -> TileEnergyResult:
+    """Energy yield of the buildings of an energy yield tile.
+
+    Args:
+        tile_name (str): energy yield tile
+        energy_filepath (Path | None): local file of the tile, only None if all
+            `footprints` are known
+        tile_buildings (pd.DataFrame): buildings of the tile, indexed by their position
+            in the buildings file
+        crops (pd.DataFrame): crop store index rows of the buildings (indexed by
+            `building_id`)
+        segmentation_output_folder (Path): segmentation results (`<crop_id>.bmp`)
+        segmentation_threshold (float): threshold of the segmentation result (0..1)
+        efficiency (float): efficiency of the solar panels
+        engine (EnergyEngine, optional): computation engine. Defaults to window reads.
+        sweep (bool, optional): collect histograms for a sweep, see
+            `energy_extractor.sweep`. Defaults to False.
+        neighbour_tile_paths (dict[str, Path] | None, optional): local files of the
+            neighbouring tiles the buildings extend into, see
+            `find_energy_neighbour_tiles`. Defaults to None.
+        footprints (list[YieldFootprint | None] | None, optional): known (e.g. cached)
+            footprints per building, zonal engine only. Defaults to None.
+        raster_pool (RasterDatasetPool | None, optional): pool of raster handles.
+            Defaults to the shared pool.
+        raw_cache (RawRasterCache | None, optional): memory-mapped copies of the tiles,
+            read instead of the tile files. Defaults to None.
+        read_threads (int, optional): reader threads of the window engine. Defaults to 2.
+        compute_threads (int, optional): compute threads of the window engine.
+            Defaults to 2.
+
+    Returns:
+        TileEnergyResult: energy statistics in the order of `tile_buildings`
+    """
+    engine = EnergyEngine(engine)
+    raster_pool = raster_pool if raster_pool is not None else get_default_pool()
+    neighbour_tile_paths = neighbour_tile_paths if neighbour_tile_paths is not None else dict()
+
+    def load_segmentation(crop_id: int) -> np.ndarray:
+        # buildings sharing a canvas share its segmentation result
+        return np.array(Image.open(segmentation_output_folder / f"{crop_id}.bmp"))
+
+    def open_tile():
+        # the raw raster is shared by all threads, it is read without a handle
+        if raw_cache is not None:
+            return nullcontext(raw_cache.open(energy_filepath))
+        return raster_pool.open(energy_filepath)
+
+    def read_mosaic(read: Callable, yield_dataset: DatasetReader, area_utm):
+        yield_data, yield_transform = read(yield_dataset, area_utm)
+        # the mosaic of the tile files still contains the no data values of the tiles,
+        # the raw raster does not
+        if raw_cache is not None and yield_dataset.nodata is not None:
+            yield_data = np.where(yield_data == yield_dataset.nodata, 0, yield_data)
+        return yield_data, yield_transform
+
+    with ExitStack() as stack:
+        # mosaics with the neighbouring tiles, for areas crossing the tile edge, the
+        # mosaic handles are shared by the reader threads. They are opened and closed by
+        # this thread, as their GDAL environment is bound to the opening thread.
+        mosaics = dict()
+        mosaic_lock = threading.Lock()
+        neighbour_extents = dict()
+
+        def open_mosaic_with(neighbour_tiles: tuple[str, ...]) -> DatasetReader:
+            if neighbour_tiles not in mosaics:
+                mosaics[neighbour_tiles] = stack.enter_context(
+                    open_mosaic(
+                        [energy_filepath, *(neighbour_tile_paths[t] for t in neighbour_tiles)]
+                    )
+                )
+            return mosaics[neighbour_tiles]
+
+        def neighbours_of(area_utm: shapely.Polygon) -> tuple[str, ...]:
+            if tile_extent.contains(area_utm):
+                return ()
+
+            for neighbour_tile, neighbour_path in neighbour_tile_paths.items():
+                if neighbour_tile not in neighbour_extents:
+                    with raster_pool.open(neighbour_path) as neighbour_file:
+                        neighbour_extents[neighbour_tile] = shapely.box(*neighbour_file.bounds)
+
+            # tiles which only share an edge with the area are not of interest
+            return tuple(
+                sorted(
+                    neighbour_tile
+                    for neighbour_tile, extent in neighbour_extents.items()
+                    if extent.intersects(area_utm) and not extent.touches(area_utm)
+                )
             )
 
+        if engine == EnergyEngine.ZONAL:
+            geometries = np.asarray(tile_buildings["geometry"].to_numpy())
+            footprints = list(footprints) if footprints is not None else [None] * len(geometries)
+
+            missing = [i for i, footprint in enumerate(footprints) if footprint is None]
+            if len(missing) > 0:
+                energy_yield_file = stack.enter_context(open_tile())
+                no_data_value = energy_yield_file.profile["nodata"]
+                tile_extent = shapely.box(*energy_yield_file.bounds)
+
+                # a single read covering all outlines
+                area_utm = shapely.box(*shapely.total_bounds(geometries[missing]))
+                neighbour_tiles = neighbours_of(area_utm)
+                if len(neighbour_tiles) > 0:
+                    yield_data, yield_transform = read_mosaic(
+                        read_zonal_area, open_mosaic_with(neighbour_tiles), area_utm.bounds
+                    )
+                else:
+                    yield_data, yield_transform = read_zonal_area(
+                        energy_yield_file, area_utm.bounds
+                    )
+                computed = compute_footprints(
+                    geometries[missing], yield_data, yield_transform, no_data_value
+                )
+                for i, footprint in zip(missing, computed):
+                    footprints[i] = footprint
+
+            if sweep:
+                tile_energy = compute_histograms(
+                    tile_buildings["building_id"].to_numpy(), footprints, crops, load_segmentation
+                )
+            else:
+                tile_energy = compute_energy(
+                    tile_buildings["building_id"].to_numpy(),
+                    footprints,
+                    crops,
+                    load_segmentation,
+                    segmentation_threshold=segmentation_threshold,
+                    efficiency=efficiency,
+                )
+            tile_energy.insert(0, "building_order", tile_buildings.index)
+            return TileEnergyResult(tile_energy.to_dict("records"), footprints)
+
+        energy_yield_file = stack.enter_context(open_tile())
+        no_data_value = energy_yield_file.profile["nodata"]
+        tile_extent = shapely.box(*energy_yield_file.bounds)
+
+        crop_extents_utm = crop_extents(crops.loc[tile_buildings["building_id"]])
+        building_neighbours = [neighbours_of(extent) for extent in crop_extents_utm]
+        for neighbour_tiles in set(building_neighbours) - {()}:
+            open_mosaic_with(neighbour_tiles)
+
+        def read(building_entry: tuple[int, tuple[int, pd.Series]]) -> BuildingYieldData:
+            position, (building_order, building) = building_entry
+            building_id = building["building_id"]
+
+            crop_image_info = crops.loc[building_id]
+            cropped_image_extent_utm = crop_extents_utm[position]
+
+            neighbour_tiles = building_neighbours[position]
+            if len(neighbour_tiles) > 0:
+                with mosaic_lock:
+                    yield_data, yield_transform = read_mosaic(
+                        read_yield_window,
+                        open_mosaic_with(neighbour_tiles),
+                        cropped_image_extent_utm,
+                    )
+            else:
+                # each reader thread borrows its own handle of the tile
+                with open_tile() as yield_dataset:
+                    yield_data, yield_transform = read_yield_window(
+                        yield_dataset, cropped_image_extent_utm
+                    )
+
+            # buildings sharing a canvas share its segmentation result
             solar_panel_segmentation_bitmap = Image.open(
-                segmentation_output_folder / f"{building_id}.bmp"
+                segmentation_output_folder / f"{int(crop_image_info['crop_id'])}.bmp"
             )
-            # we reshape it in order to overlay with other bitmaps
+            # we resample it to the energy yield grid in order to overlay the bitmaps
             solar_panel_segmentation_bitmap = solar_panel_segmentation_bitmap.resize(
-                yield_cropped_area.shape
+                (yield_data.shape[1], yield_data.shape[0])
             )
-            solar_panel_segmentation_mask = np.array(solar_panel_segmentation_bitmap, copy=True)
-            solar_panel_segmentation_mask = solar_panel_segmentation_mask / 255  # to 0..1
 
-            # 0: does not exist, 1: exists
-            solar_panel_existence_in_building_mask = (
-                solar_panel_segmentation_mask > segmentation_threshold
+            return BuildingYieldData(
+                building_order=building_order,
+                building_id=building_id,
+                building_polygon_utm=building["geometry"],
+                yield_data=yield_data,
+                yield_transform=yield_transform,
+                segmentation_mask=np.array(solar_panel_segmentation_bitmap, copy=True),
             )
 
-            # keep only pixel within the building
-            solar_panel_existence_in_building_mask = (
-                building_mask & solar_panel_existence_in_building_mask
+        def compute(data: BuildingYieldData) -> dict:
+            if sweep:
+                return compute_building_histogram(data, no_data_value=no_data_value)
+            return compute_building_energy(
+                data,
+                no_data_value=no_data_value,
+                segmentation_threshold=segmentation_threshold,
+                efficiency=efficiency,
             )
 
-            actual_yield_bitmap = np.where(
-                solar_panel_existence_in_building_mask,
-                building_yield_bitmap,
-                np.zeros_like(building_yield_bitmap),
+        pipeline = Pipeline(
+            [
+                Stage(read, workers=read_threads, name="read"),
+                Stage(compute, workers=compute_threads, name="compute"),
+            ]
+        )
+        energy_stats = list(pipeline.run(enumerate(tile_buildings.iterrows())))
+        logger.debug(f"Pipeline statistics of {tile_name}: {pipeline.stats}")
+
+    return TileEnergyResult(energy_stats)
+
+
+def assign_energy_datasets(
+    buildings: gpd.GeoDataFrame,
+    energy_dataset: DatasetType,
+    energy_regions: gpd.GeoDataFrame | None = None,
+) -> pd.Series:
+    """Choose the energy yield dataset (resolution) per building.
+
+    Buildings whose centroid lies within a region use the dataset of the region (the
+    first region if they overlap), all others use `energy_dataset`.
+
+    Args:
+        buildings (gpd.GeoDataFrame): buildings, see `utils.building_artifact`
+        energy_dataset (DatasetType): default energy yield dataset
+        energy_regions (gpd.GeoDataFrame | None, optional): regions with a `dataset`
+            column. Defaults to None.
+
+    Raises:
+        ValueError: in case a dataset is not an energy yield dataset
+
+    Returns:
+        pd.Series: energy yield dataset per building
+    """
+    region_datasets = pd.Series(dtype=object)
+    if energy_regions is not None:
+        region_datasets = energy_regions["dataset"].map(DatasetType)
+
+    invalid = set(region_datasets).union([DatasetType(energy_dataset)]) - set(ENERGY_DATASETS)
+    if len(invalid) > 0:
+        raise ValueError(f"Not an energy yield dataset: {sorted(invalid)}")
+
+    datasets = pd.Series(DatasetType(energy_dataset), index=buildings.index, dtype=object)
+    if energy_regions is None or len(buildings) == 0:
+        return datasets
+
+    centroids = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(*buildings[CENTROID_COLUMNS].to_numpy().T),
+        index=buildings.index,
+        crs=buildings.crs,
+    )
+    regions = gpd.GeoDataFrame(
+        {"region_dataset": region_datasets.to_numpy()},
+        geometry=energy_regions.geometry.to_crs(buildings.crs).to_numpy(),
+        crs=buildings.crs,
+    )
+
+    joined = centroids.sjoin(regions, how="inner", predicate="within")
+    joined = joined.sort_values("index_right", kind="stable")
+    joined = joined[~joined.index.duplicated(keep="first")]
+    datasets.loc[joined.index] = joined["region_dataset"]
+    return datasets
+
+
+def extract_dataset_energy(
+    tile_manager: TileManager,
+    buildings: gpd.GeoDataFrame,
+    crops: pd.DataFrame,
+    segmentation_output_folder: Path,
+    *,
+    engine: EnergyEngine = EnergyEngine.WINDOW,
+    potential_cache: PotentialEnergyCache | None = None,
+    raster_pool: RasterDatasetPool | None = None,
+    workers: int = 1,
+    progress_bar: tqdm | None = None,
+    **tile_kwargs,
+) -> list[dict]:
+    """Energy yield of buildings from the tiles of a single energy yield dataset.
+
+    Args:
+        tile_manager (TileManager): tile manager of the energy yield dataset
+        buildings (gpd.GeoDataFrame): buildings, indexed by their position in the
+            buildings file
+        crops (pd.DataFrame): crop store index, indexed by `building_id`
+        segmentation_output_folder (Path): segmentation results (`<crop_id>.bmp`)
+        engine (EnergyEngine, optional): computation engine. Defaults to window reads.
+        potential_cache (PotentialEnergyCache | None, optional): cache of the potential
+            energy, requires the zonal engine. Defaults to None.
+        raster_pool (RasterDatasetPool | None, optional): pool of raster handles.
+            Defaults to the shared pool.
+        workers (int, optional): number of worker processes. Defaults to 1.
+        progress_bar (tqdm | None, optional): progress bar updated per tile
+        **tile_kwargs: see `extract_tile_energy`
+
+    Returns:
+        list[dict]: energy statistics (or histograms of a sweep) per building, with its
+            position in the buildings file as `building_order`
+    """
+    raster_pool = raster_pool if raster_pool is not None else get_default_pool()
+    tile_kwargs = dict(tile_kwargs, engine=engine)
+
+    # plan all required tiles up front, the buildings are processed tile by tile
+    plan = plan_tiles(buildings, {"energy_tile": tile_manager})
+    buildings_by_tile = plan.buildings_by_tile("energy_tile")
+
+    def tile_inputs(tile_name: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        tile_buildings = buildings_by_tile[tile_name]
+        return tile_buildings, crops.loc[tile_buildings["building_id"]]
+
+    # areas crossing the tile edge are read from a mosaic with the neighbours
+    neighbour_tiles = dict()
+    for tile_name in plan.tiles["energy_tile"]:
+        tile_buildings, tile_crops = tile_inputs(tile_name)
+        if engine == EnergyEngine.ZONAL:
+            areas = np.array([shapely.box(*tile_buildings.total_bounds)], dtype=object)
+        else:
+            areas = crop_extents(tile_crops)
+        neighbour_tiles[tile_name] = find_energy_neighbour_tiles(areas, tile_manager, tile_name)
+
+    def tile_version_of(tile_name: str, tile_path: Path | None = None) -> str | None:
+        # the listed version (publication date or size) is known without a download
+        tile_version = tile_manager.get_tile_version(tile_name)
+        if tile_version is None and tile_path is not None and not is_remote_path(tile_path):
+            tile_version = str(os.path.getsize(tile_path))
+        return tile_version
+
+    # geometry hashes and cached footprints of the buildings of a tile
+    cache_entries: dict[str, tuple[str, list[str], list[YieldFootprint | None]]] = dict()
+
+    def lookup_cache(tile_name: str, tile_path: Path | None = None):
+        tile_version = tile_version_of(tile_name, tile_path)
+        if potential_cache is None or tile_version is None:
+            return None
+        hashes = geometry_hashes(buildings_by_tile[tile_name]["geometry"].to_numpy())
+        cached = potential_cache.get(tile_name, tile_version, hashes)
+        cache_entries[tile_name] = (
+            tile_version,
+            hashes,
+            [cached[h][1] if h in cached else None for h in hashes],
+        )
+        return cache_entries[tile_name][2]
+
+    def is_cached(tile_name: str) -> bool:
+        tile_version = tile_version_of(tile_name)
+        if potential_cache is None or tile_version is None:
+            return False
+        hashes = geometry_hashes(buildings_by_tile[tile_name]["geometry"].to_numpy())
+        return bool(potential_cache.contains(tile_name, tile_version, hashes).all())
+
+    # energy statistics per tile
+    tile_results: dict[str, list[dict]] = dict()
+
+    def collect(tile_name: str, result: TileEnergyResult):
+        tile_results[tile_name] = result.energy_stats
+
+        if tile_name in cache_entries:
+            tile_version, hashes, cached_footprints = cache_entries.pop(tile_name)
+            missing = [i for i, footprint in enumerate(cached_footprints) if footprint is None]
+            if len(missing) > 0:
+                potential_cache.put(
+                    tile_name,
+                    tile_version,
+                    [hashes[i] for i in missing],
+                    [result.energy_stats[i]["potential_energy_kWh"] for i in missing],
+                    [result.footprints[i] for i in missing],
+                )
+
+        if progress_bar is not None:
+            progress_bar.update(len(buildings_by_tile[tile_name]))
+
+    tile_names = plan.tiles["energy_tile"]
+    if potential_cache is not None:
+        # tiles with all their buildings in the cache are neither downloaded nor read
+        cached_tiles = [tile_name for tile_name in tile_names if is_cached(tile_name)]
+        for tile_name in cached_tiles:
+            result = extract_tile_energy(
+                tile_name,
+                None,
+                *tile_inputs(tile_name),
+                segmentation_output_folder,
+                footprints=lookup_cache(tile_name),
+                raster_pool=raster_pool,
+                **tile_kwargs,
             )
+            collect(tile_name, result)
+        tile_names = [tile_name for tile_name in tile_names if tile_name not in cached_tiles]
+
+    # the next tiles are downloaded while the current one is processed
+    tiles = iter_tiles_with_prefetch(tile_manager, tile_names)
+
+    if workers > 1 and len(tile_names) > 0:
+        extract_tiles_with_process_pool(
+            tile_manager,
+            tiles,
+            neighbour_tiles,
+            lambda tile_name, tile_path: (
+                tile_name,
+                tile_path,
+                *tile_inputs(tile_name),
+                segmentation_output_folder,
+            ),
+            collect,
+            workers=workers,
+            get_footprints=lookup_cache,
+            **tile_kwargs,
+        )
+    else:
+        for tile_name, energy_filepath in tiles:
+            neighbour_tile_paths = tile_manager.acquire_tiles(neighbour_tiles[tile_name])
+            try:
+                result = extract_tile_energy(
+                    tile_name,
+                    energy_filepath,
+                    *tile_inputs(tile_name),
+                    segmentation_output_folder,
+                    neighbour_tile_paths=dict(
+                        zip(neighbour_tiles[tile_name], neighbour_tile_paths)
+                    ),
+                    footprints=lookup_cache(tile_name, energy_filepath),
+                    raster_pool=raster_pool,
+                    **tile_kwargs,
+                )
+            finally:
+                tile_manager.release_tiles(neighbour_tiles[tile_name])
+            collect(tile_name, result)
+
+    # merged in the order of the tiles
+    return [stats for tile_name in plan.tiles["energy_tile"] for stats in tile_results[tile_name]]
+
+
+def extract_energy_from_buildings(
+    buildings_file: str,
+    cropped_images_folder: str,
+    segmentation_output_folder: str,
+    energy_data_location: str,
+    *,
+    segmentation_threshold: float,
+    efficiency: float = 0.21,
+    max_cache_bytes: int | None = None,
+    raster_pool: RasterDatasetPool | None = None,
+    read_threads: int = 2,
+    compute_threads: int = 2,
+    engine: EnergyEngine = EnergyEngine.WINDOW,
+    potential_cache: PotentialEnergyCache | None = None,
+    sweep_thresholds: Sequence[float] | None = None,
+    sweep_efficiencies: Sequence[float] | None = None,
+    workers: int = 1,
+    energy_dataset: DatasetType = DatasetType.ENERGY_YIELD_50CM,
+    energy_regions: gpd.GeoDataFrame | None = None,
+    raw_cache: RawRasterCache | None = None,
+    remote: bool = False,
+) -> pd.DataFrame:
+    """Energy yield of the buildings, in total and of their solar panel installations.
+
+    Args:
+        buildings_file (str): buildings, see `utils.building_artifact`
+        cropped_images_folder (str): crop store of the image cropper
+        segmentation_output_folder (str): segmentation results (`<crop_id>.bmp`)
+        energy_data_location (str): folder of the energy yield tiles
+        segmentation_threshold (float): threshold of the segmentation result (0..1)
+        efficiency (float, optional): efficiency of the solar panels. Defaults to 0.21.
+        max_cache_bytes (int | None, optional): disk budget of the energy yield tiles.
+            Defaults to None (unbounded).
+        raster_pool (RasterDatasetPool | None, optional): pool of raster handles.
+            Defaults to the shared pool.
+        read_threads (int, optional): reader threads per tile. Defaults to 2.
+        compute_threads (int, optional): compute threads per tile. Defaults to 2.
+        engine (EnergyEngine, optional): computation engine. Defaults to window reads.
+        potential_cache (PotentialEnergyCache | None, optional): cache of the potential
+            energy, requires the zonal engine. Defaults to None.
+        sweep_thresholds (Sequence[float] | None, optional): thresholds of a sweep, see
+            `energy_extractor.sweep`, `segmentation_threshold` is ignored then.
+            Defaults to None (no sweep).
+        sweep_efficiencies (Sequence[float] | None, optional): efficiencies of a sweep.
+            Defaults to `efficiency`.
+        workers (int, optional): number of worker processes, tiles are distributed
+            among them. Defaults to 1 (no worker processes).
+        energy_dataset (DatasetType, optional): energy yield dataset (resolution).
+            Defaults to the 50cm dataset.
+        energy_regions (gpd.GeoDataFrame | None, optional): regions with a `dataset`
+            column, the energy yield dataset of buildings within, see
+            `assign_energy_datasets`. Defaults to None (`energy_dataset` everywhere).
+        raw_cache (RawRasterCache | None, optional): memory-mapped copies of the energy
+            yield tiles, see `utils.raw_raster_cache`. Defaults to None.
+        remote (bool, optional): read windows of the energy yield tiles by HTTP range
+            requests instead of downloading them, see `utils.remote_tiles`.
+            Defaults to False.
+
+    Returns:
+        pd.DataFrame: energy statistics indexed by building id, or the long format table
+            of `energy_extractor.sweep.sweep_energy` for a sweep
+    """
+    engine = EnergyEngine(engine)
+    is_sweep = sweep_thresholds is not None
+    if potential_cache is not None and engine != EnergyEngine.ZONAL:
+        raise ValueError("The potential energy cache requires the zonal engine")
+    if raw_cache is not None and remote:
+        raise ValueError("The raw raster cache requires local energy yield tiles")
+
+    buildings = read_buildings(buildings_file)
+
+    raster_pool = raster_pool if raster_pool is not None else get_default_pool()
+
+    cropped_images_folder = Path(cropped_images_folder)
+
+    # typed index of the crop store, indexed by building_id
+    cropped_images_overview = CropStore(cropped_images_folder).index
+
+    segmentation_output_folder = Path(segmentation_output_folder)
+
+    # the data folder may be shared with the aerial image tiles and their COGs
+    tile_cache = TileCache(
+        energy_data_location,
+        max_bytes=max_cache_bytes,
+        patterns=("*.tif",),
+        exclude=(f"*{COG_SUFFIX}",),
+    )
+    catalog = load_default_catalog()
+
+    # skipped, in case image cropping did not work
+    buildings = buildings[buildings["building_id"].isin(cropped_images_overview.index)]
 
-            area_pixel = 0.5 * 0.5  # in m2, depends on the energy file
-            actual_energy = actual_yield_bitmap.sum() * area_pixel
-            potential_energy = building_yield_bitmap.sum() * area_pixel
-
-            energy_stats.append(
-                {
-                    "building_id": building_id,
-                    "actual_energy_kWh": actual_energy,
-                    "mined_energy_kWh": actual_energy * efficiency,
-                    "potential_energy_kWh": potential_energy,
-                }
+    energy_datasets = assign_energy_datasets(buildings, energy_dataset, energy_regions)
+
+    energy_stats = []
+    progress_bar = tqdm(total=len(buildings))
+
+    for dataset in ENERGY_DATASETS:
+        dataset_buildings = buildings[energy_datasets == dataset]
+        if len(dataset_buildings) == 0:
+            continue
+
+        # the precomputed tile keys of the building artifact refer to the 50cm tiles
+        if dataset != DatasetType.ENERGY_YIELD_50CM:
+            dataset_buildings = dataset_buildings.drop(
+                columns=tile_key_column("energy_tile"), errors="ignore"
             )
 
-    energy_information = pd.DataFrame(energy_stats)
+        tile_manager_energy = catalog.tile_manager(
+            dataset, data_folder=energy_data_location, cache=tile_cache, remote=remote
+        )
+        energy_stats.extend(
+            extract_dataset_energy(
+                tile_manager_energy,
+                dataset_buildings,
+                cropped_images_overview,
+                segmentation_output_folder,
+                potential_cache=potential_cache,
+                raster_pool=raster_pool,
+                workers=workers,
+                progress_bar=progress_bar,
+                segmentation_threshold=segmentation_threshold,
+                efficiency=efficiency,
+                engine=engine,
+                sweep=is_sweep,
+                raw_cache=raw_cache,
+                read_threads=read_threads,
+                compute_threads=compute_threads,
+            )
+        )
+
+    progress_bar.close()
+
+    logger.info(f"Tile cache statistics: {tile_cache.stats}")
+    logger.info(f"Raster pool statistics: {raster_pool.stats}")
+    if potential_cache is not None:
+        logger.info(f"Potential energy cache statistics: {potential_cache.stats}")
+    if raw_cache is not None:
+        logger.info(f"Raw raster cache statistics: {raw_cache.stats}")
+
+    # the order of the buildings file is restored
+    if is_sweep:
+        energy_histograms = pd.DataFrame(
+            energy_stats,
+            columns=["building_order", "building_id", "potential_energy_kWh", "histogram"],
+        ).sort_values("building_order")
+        return sweep_energy(
+            energy_histograms,
+            sweep_thresholds,
+            sweep_efficiencies if sweep_efficiencies is not None else [efficiency],
+        )
+
+    energy_information = pd.DataFrame(
+        energy_stats,
+        columns=[
+            "building_order",
+            "building_id",
+            "actual_energy_kWh",
+            "mined_energy_kWh",
+            "potential_energy_kWh",
+        ],
+    )
+    energy_information = energy_information.sort_values("building_order").drop(
+        columns="building_order"
+    )
     energy_information.set_index("building_id", inplace=True)
     return energy_information
+
+
+def extract_tiles_with_process_pool(
+    tile_manager: TileManager,
+    tiles: Iterable[tuple[str, Path]],
+    neighbour_tiles: dict[str, list[str]],
+    tile_args: Callable[[str, Path], tuple],
+    collect: Callable[[str, TileEnergyResult], None],
+    *,
+    workers: int,
+    get_footprints: Callable[[str, Path], list[YieldFootprint | None] | None],
+    **tile_kwargs,
+):
+    """Distribute the tiles among worker processes, see `extract_tile_energy`.
+
+    Tiles (and their neighbouring tiles) stay pinned in the tile cache until their worker
+    is done. At most two tiles per worker are scheduled ahead. Results are collected in
+    the main process, e.g. to update the potential energy cache.
+
+    Args:
+        tile_manager (TileManager): tile manager of the energy yield
+        tiles (Iterable[tuple[str, Path]]): tile names and paths, e.g. from
+            `iter_tiles_with_prefetch`
+        neighbour_tiles (dict[str, list[str]]): neighbouring tiles per tile name, see
+            `find_energy_neighbour_tiles`
+        tile_args (Callable[[str, Path], tuple]): positional arguments of
+            `extract_tile_energy` for a tile name and path
+        collect (Callable[[str, TileEnergyResult], None]): called with the result of each
+            tile
+        workers (int): number of worker processes
+        get_footprints (Callable[[str, Path], list[YieldFootprint | None] | None]): known
+            footprints of the buildings of a tile
+        **tile_kwargs: see `extract_tile_energy`
+    """
+    pending: dict[Future, str] = dict()
+
+    def collect_done(futures: set[Future]):
+        for future in futures:
+            collect(pending.pop(future), future.result())
+
+    # spawned workers do not inherit the download threads and GDAL state
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        for tile_name, tile_file_path in tiles:
+            # the tile itself is provided by `tiles`, it stays pinned until the worker is done
+            tile_manager.pin_tile(tile_name)
+            neighbour_tile_paths = tile_manager.acquire_tiles(neighbour_tiles[tile_name])
+            future = executor.submit(
+                extract_tile_energy,
+                *tile_args(tile_name, tile_file_path),
+                neighbour_tile_paths=dict(zip(neighbour_tiles[tile_name], neighbour_tile_paths)),
+                footprints=get_footprints(tile_name, tile_file_path),
+                **tile_kwargs,
+            )
+            future.add_done_callback(
+                lambda _, tile_name=tile_name: tile_manager.release_tiles(
+                    [tile_name, *neighbour_tiles[tile_name]]
+                )
+            )
+            pending[future] = tile_name
+
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect_done(done)
+
+        collect_done(wait(pending).done)
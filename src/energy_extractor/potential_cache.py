@@ -0,0 +1,272 @@
+"""
+Persistent cache of the potential energy and the yield footprint of buildings.
+
+The potential energy of a building depends on its outline and the energy yield tile only,
+not on the segmentation. The cache stores it together with the covered energy yield
+pixels (see `energy_extractor.zonal.YieldFootprint`) in a SQLite database, such that
+reruns, e.g. after retraining the segmentation model, skip reading and rasterizing the
+energy yield and only compute what depends on the segmentation.
+
+Entries are keyed by a hash of the outline (UTM32N), the name of the energy yield tile and
+the tile version. Footprints are stored compactly: a bit mask over the bounding box of the
+covered pixels and the float32 energy yield of the covered pixels.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+from energy_extractor.zonal import YieldFootprint
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+# increment when the computation of the footprints changes, older entries are ignored
+FOOTPRINT_FORMAT_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS footprints (
+    geometry_hash TEXT NOT NULL,
+    tile_name TEXT NOT NULL,
+    tile_version TEXT NOT NULL,
+    format_version INTEGER NOT NULL,
+    potential_energy_kWh REAL NOT NULL,
+    origin_x REAL NOT NULL,
+    origin_y REAL NOT NULL,
+    pixel_width REAL NOT NULL,
+    pixel_height REAL NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mask BLOB NOT NULL,
+    pixel_yield BLOB NOT NULL,
+    PRIMARY KEY (geometry_hash, tile_name, tile_version, format_version)
+)
+"""
+
+# SQLite limits the number of variables of a statement
+_MAX_VARIABLES = 900
+
+
+@dataclass
+class PotentialCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+def geometry_hashes(geometries) -> list[str]:
+    """Hashes of building outlines, identical outlines have identical hashes.
+
+    Args:
+        geometries (array-like): building outlines (UTM32N)
+
+    Returns:
+        list[str]: hash per outline
+    """
+    # rounded to millimeters, such that reprojection noise does not change the hash
+    geometries = shapely.set_precision(np.asarray(geometries), 0.001)
+    return [
+        hashlib.blake2b(wkb, digest_size=16).hexdigest()
+        for wkb in shapely.to_wkb(geometries, output_dimension=2)
+    ]
+
+
+def encode_footprint(footprint: YieldFootprint) -> dict:
+    """Compact representation of a footprint, see module description."""
+    pixel_width, pixel_height = footprint.pixel_size
+    if len(footprint) == 0:
+        origin_x, origin_y, cols, rows = 0.0, 0.0, np.empty(0, int), np.empty(0, int)
+    else:
+        # pixel centers lie on a grid, the origin is the upper left pixel center
+        origin_x, origin_y = footprint.xs.min(), footprint.ys.max()
+        cols = np.rint((footprint.xs - origin_x) / pixel_width).astype(int)
+        rows = np.rint((origin_y - footprint.ys) / pixel_height).astype(int)
+
+    width = int(cols.max()) + 1 if len(cols) > 0 else 0
+    height = int(rows.max()) + 1 if len(rows) > 0 else 0
+    mask = np.zeros((height, width), dtype=bool)
+    mask[rows, cols] = True
+
+    # the yield is stored in row-major order of the mask
+    order = np.lexsort((cols, rows))
+
+    return {
+        "origin_x": float(origin_x),
+        "origin_y": float(origin_y),
+        "pixel_width": pixel_width,
+        "pixel_height": pixel_height,
+        "width": width,
+        "height": height,
+        "mask": np.packbits(mask, axis=None).tobytes(),
+        "pixel_yield": footprint.pixel_yield[order].astype(np.float32).tobytes(),
+    }
+
+
+def decode_footprint(record: dict) -> YieldFootprint:
+    """Inverse of `encode_footprint`, the pixels are in row-major order."""
+    height, width = record["height"], record["width"]
+    mask = np.unpackbits(np.frombuffer(record["mask"], dtype=np.uint8), count=height * width)
+    rows, cols = np.nonzero(mask.reshape(height, width).astype(bool))
+
+    return YieldFootprint(
+        xs=record["origin_x"] + cols * record["pixel_width"],
+        ys=record["origin_y"] - rows * record["pixel_height"],
+        pixel_yield=np.frombuffer(record["pixel_yield"], dtype=np.float32).copy(),
+        pixel_size=(record["pixel_width"], record["pixel_height"]),
+    )
+
+
+class PotentialEnergyCache:
+    def __init__(self, path: str | Path):
+        """Open or create the cache database.
+
+        Args:
+            path (str | Path): SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.stats = PotentialCacheStats()
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+    def contains(
+        self, tile_name: str, tile_version: str, geometry_hashes: list[str]
+    ) -> np.ndarray:
+        """Check which buildings of an energy yield tile are cached.
+
+        Args:
+            tile_name (str): name of the energy yield tile
+            tile_version (str): version of the tile
+            geometry_hashes (list[str]): hashes of the building outlines
+
+        Returns:
+            np.ndarray: whether each building is cached
+        """
+        unique_hashes = list(dict.fromkeys(geometry_hashes))
+
+        cached = set()
+        with self._lock:
+            for start in range(0, len(unique_hashes), _MAX_VARIABLES):
+                batch = unique_hashes[start : start + _MAX_VARIABLES]
+                rows = self._connection.execute(
+                    "SELECT geometry_hash FROM footprints "
+                    "WHERE tile_name = ? AND tile_version = ? AND format_version = ? "
+                    f"AND geometry_hash IN ({', '.join('?' * len(batch))})",
+                    [tile_name, tile_version, FOOTPRINT_FORMAT_VERSION, *batch],
+                )
+                cached.update(geometry_hash for (geometry_hash,) in rows)
+
+        return np.array([h in cached for h in geometry_hashes], dtype=bool)
+
+    def get(
+        self, tile_name: str, tile_version: str, geometry_hashes: list[str]
+    ) -> dict[str, tuple[float, YieldFootprint]]:
+        """Look up buildings of an energy yield tile.
+
+        Args:
+            tile_name (str): name of the energy yield tile
+            tile_version (str): version of the tile
+            geometry_hashes (list[str]): hashes of the building outlines
+
+        Returns:
+            dict[str, tuple[float, YieldFootprint]]: potential energy and footprint per
+                cached geometry hash
+        """
+        columns = [
+            "geometry_hash",
+            "potential_energy_kWh",
+            "origin_x",
+            "origin_y",
+            "pixel_width",
+            "pixel_height",
+            "width",
+            "height",
+            "mask",
+            "pixel_yield",
+        ]
+        unique_hashes = list(dict.fromkeys(geometry_hashes))
+
+        cached = dict()
+        with self._lock:
+            for start in range(0, len(unique_hashes), _MAX_VARIABLES):
+                batch = unique_hashes[start : start + _MAX_VARIABLES]
+                rows = self._connection.execute(
+                    f"SELECT {', '.join(columns)} FROM footprints "
+                    "WHERE tile_name = ? AND tile_version = ? AND format_version = ? "
+                    f"AND geometry_hash IN ({', '.join('?' * len(batch))})",
+                    [tile_name, tile_version, FOOTPRINT_FORMAT_VERSION, *batch],
+                )
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    cached[record["geometry_hash"]] = (
+                        record["potential_energy_kWh"],
+                        decode_footprint(record),
+                    )
+
+            self.stats.hits += sum(h in cached for h in geometry_hashes)
+            self.stats.misses += sum(h not in cached for h in geometry_hashes)
+        return cached
+
+    def put(
+        self,
+        tile_name: str,
+        tile_version: str,
+        geometry_hashes: list[str],
+        potential_energy: np.ndarray,
+        footprints: list[YieldFootprint],
+    ):
+        """Store buildings of an energy yield tile.
+
+        Args:
+            tile_name (str): name of the energy yield tile
+            tile_version (str): version of the tile
+            geometry_hashes (list[str]): hashes of the building outlines
+            potential_energy (np.ndarray): potential energy per building in kWh
+            footprints (list[YieldFootprint]): footprint per building
+        """
+        records = [
+            {
+                "geometry_hash": geometry_hash,
+                "tile_name": tile_name,
+                "tile_version": tile_version,
+                "format_version": FOOTPRINT_FORMAT_VERSION,
+                "potential_energy_kWh": float(potential),
+                **encode_footprint(footprint),
+            }
+            for geometry_hash, potential, footprint in zip(
+                geometry_hashes, potential_energy, footprints
+            )
+        ]
+        if len(records) == 0:
+            return
+
+        columns = list(records[0])
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO footprints ({', '.join(columns)}) "
+                f"VALUES ({', '.join(':' + c for c in columns)})",
+                records,
+            )
+            self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "PotentialEnergyCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
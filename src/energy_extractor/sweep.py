@@ -0,0 +1,90 @@
+"""
+Sweep of the segmentation threshold and the solar panel efficiency in a single pass.
+
+Instead of the actual energy for a single threshold, the energy extractor collects per
+building a histogram of the energy yield over the segmentation result (one bin per value
+0..255 of the segmentation bitmaps). The actual energy for any threshold is the sum of the
+bins above the threshold, the mined energy follows from the efficiency. Calibrating the
+threshold and the efficiency thus costs a single run.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+# number of distinct values of a segmentation result
+SEGMENTATION_LEVELS = 256
+
+SWEEP_COLUMNS = [
+    "building_id",
+    "segmentation_threshold",
+    "efficiency",
+    "actual_energy_kWh",
+    "mined_energy_kWh",
+    "potential_energy_kWh",
+]
+
+
+def threshold_masks(thresholds: Sequence[float]) -> np.ndarray:
+    """Histogram bins above each threshold.
+
+    Args:
+        thresholds (Sequence[float]): thresholds of the segmentation result (0..1)
+
+    Returns:
+        np.ndarray: boolean array (thresholds, segmentation levels)
+    """
+    # the same comparison as for a single threshold, see `compute_building_energy`
+    levels = np.arange(SEGMENTATION_LEVELS) / (SEGMENTATION_LEVELS - 1)
+    return levels[None, :] > np.asarray(thresholds, dtype=float)[:, None]
+
+
+def sweep_energy(
+    energy_histograms: pd.DataFrame,
+    thresholds: Sequence[float],
+    efficiencies: Sequence[float],
+) -> pd.DataFrame:
+    """Actual and mined energy per building for all thresholds and efficiencies.
+
+    Args:
+        energy_histograms (pd.DataFrame): columns `building_id`, `potential_energy_kWh`
+            and `histogram` (energy in kWh per segmentation value)
+        thresholds (Sequence[float]): thresholds of the segmentation result (0..1)
+        efficiencies (Sequence[float]): efficiencies of the solar panels
+
+    Returns:
+        pd.DataFrame: long format table with a row per building, threshold and
+            efficiency (in this order)
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    efficiencies = np.asarray(efficiencies, dtype=float)
+    num_buildings = len(energy_histograms)
+    num_combinations = len(thresholds) * len(efficiencies)
+
+    histograms = np.zeros((num_buildings, SEGMENTATION_LEVELS))
+    if num_buildings > 0:
+        histograms = np.stack(energy_histograms["histogram"].to_list())
+
+    # (buildings, thresholds)
+    actual = histograms @ threshold_masks(thresholds).T.astype(float)
+    actual = np.repeat(actual.ravel(), len(efficiencies))
+    efficiency = np.tile(efficiencies, num_buildings * len(thresholds))
+
+    return pd.DataFrame(
+        {
+            "building_id": np.repeat(
+                energy_histograms["building_id"].to_numpy(), num_combinations
+            ),
+            "segmentation_threshold": np.tile(
+                np.repeat(thresholds, len(efficiencies)), num_buildings
+            ),
+            "efficiency": efficiency,
+            "actual_energy_kWh": actual,
+            "mined_energy_kWh": actual * efficiency,
+            "potential_energy_kWh": np.repeat(
+                energy_histograms["potential_energy_kWh"].to_numpy(), num_combinations
+            ),
+        },
+        columns=SWEEP_COLUMNS,
+    )
@@ -0,0 +1,387 @@
+"""
+Zonal statistics of the energy yield, tile by tile.
+
+Instead of reading a window and rasterizing the outline per building, the energy yield
+of a tile is read once and all buildings of the tile are rasterized into one integer
+label raster (pixel value `i + 1` for the i-th building, 0 for background). The potential
+energy of all buildings follows from a single `np.bincount` over the labels weighted by
+the yield, the actual energy from the same labels masked by the segmentation results.
+
+Overlapping outlines cannot share a label raster, they are distributed among several
+label rasters ("layers").
+
+The pixels covered by a building ("footprint") depend on its outline and the energy
+yield tile only, they can be cached across runs, see `energy_extractor.potential_cache`.
+"""
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import affine
+import numpy as np
+import pandas as pd
+import shapely
+from PIL import Image
+from rasterio.features import rasterize
+from rasterio.io import DatasetReader
+from rasterio.windows import Window, from_bounds
+
+from energy_extractor.sweep import SEGMENTATION_LEVELS
+from utils.crop_store import TRANSFORM_COLUMNS
+
+ENERGY_COLUMNS = ["actual_energy_kWh", "mined_energy_kWh", "potential_energy_kWh"]
+
+
+@dataclass
+class YieldFootprint:
+    """Energy yield pixels covered by the outline of a building.
+
+    Attributes:
+        xs: x-coordinates of the pixel centers (UTM32N)
+        ys: y-coordinates of the pixel centers (UTM32N)
+        pixel_yield: energy yield per pixel (kWh/m²), 0 for no data
+        pixel_size: width and height of the pixels in meters
+    """
+
+    xs: np.ndarray
+    ys: np.ndarray
+    pixel_yield: np.ndarray
+    pixel_size: tuple[float, float]
+
+    def __len__(self) -> int:
+        return len(self.pixel_yield)
+
+    @property
+    def pixel_area(self) -> float:
+        """Area of a pixel in m²."""
+        return self.pixel_size[0] * self.pixel_size[1]
+
+
+def read_zonal_area(
+    yield_dataset: DatasetReader, bounds: tuple[float, float, float, float]
+) -> tuple[np.ndarray, affine.Affine]:
+    """Read the energy yield of an area, expanded to whole pixels of the raster.
+
+    Args:
+        yield_dataset (DatasetReader): energy yield tile or mosaic
+        bounds (tuple[float, float, float, float]): area (UTM32N)
+
+    Returns:
+        tuple[np.ndarray, affine.Affine]: energy yield and its transformation
+    """
+    window = from_bounds(*bounds, transform=yield_dataset.transform)
+    col_start, row_start = math.floor(window.col_off), math.floor(window.row_off)
+    col_stop = math.ceil(window.col_off + window.width)
+    row_stop = math.ceil(window.row_off + window.height)
+
+    window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    window = window.intersection(Window(0, 0, yield_dataset.width, yield_dataset.height))
+
+    return yield_dataset.read(1, window=window), yield_dataset.window_transform(window)
+
+
+def assign_layers(geometries: np.ndarray) -> np.ndarray:
+    """Distribute outlines among layers, such that outlines of a layer do not overlap.
+
+    Args:
+        geometries (np.ndarray): building outlines
+
+    Returns:
+        np.ndarray: layer per outline, 0 for most of them
+    """
+    layers = np.zeros(len(geometries), dtype=int)
+
+    tree = shapely.STRtree(geometries)
+    left, right = tree.query(geometries, predicate="intersects")
+
+    # "overlaps" misses nested and identical outlines, touching outlines share a layer
+    shared_area = shapely.area(shapely.intersection(geometries[left], geometries[right]))
+    overlap = (left != right) & (shared_area > 0)
+    left, right = left[overlap], right[overlap]
+    if len(left) == 0:
+        return layers
+
+    overlapping = pd.Series(right).groupby(left).agg(list).to_dict()
+    for i in sorted(overlapping):
+        taken = {layers[j] for j in overlapping[i] if j < i}
+        layers[i] = next(layer for layer in range(len(taken) + 1) if layer not in taken)
+    return layers
+
+
+def label_buildings(
+    geometries: np.ndarray, out_shape: tuple[int, int], transform: affine.Affine
+) -> list[np.ndarray]:
+    """Rasterize the outlines into label rasters, see module description.
+
+    Args:
+        geometries (np.ndarray): building outlines (UTM32N)
+        out_shape (tuple[int, int]): shape of the label rasters
+        transform (affine.Affine): transformation of the label rasters
+
+    Returns:
+        list[np.ndarray]: label raster per layer
+    """
+    layers = assign_layers(geometries)
+
+    label_rasters = []
+    for layer in np.unique(layers):
+        (members,) = np.nonzero(layers == layer)
+        label_rasters.append(
+            rasterize(
+                zip(geometries[members], members + 1),
+                out_shape=out_shape,
+                transform=transform,
+                fill=0,
+                dtype=np.int32,
+            )
+        )
+    return label_rasters
+
+
+def resample_segmentation(
+    segmentation_mask: np.ndarray, crop_info: pd.Series, pixel_size: tuple[float, float]
+) -> np.ndarray:
+    """Resample the segmentation result of a crop to the resolution of the energy yield.
+
+    Args:
+        segmentation_mask (np.ndarray): segmentation result of the crop (0..255)
+        crop_info (pd.Series): crop store index row of the crop
+        pixel_size (tuple[float, float]): pixel width and height of the energy yield
+
+    Returns:
+        np.ndarray: segmentation result with about one pixel per energy yield pixel
+    """
+    crop_width = crop_info["width"] * abs(crop_info["transform_a"])
+    crop_height = crop_info["height"] * abs(crop_info["transform_e"])
+
+    # rounded as rasterio rounds the shape of a window read
+    size = (
+        max(math.floor(crop_width / pixel_size[0] + 0.5), 1),
+        max(math.floor(crop_height / pixel_size[1] + 0.5), 1),
+    )
+    return np.array(Image.fromarray(segmentation_mask).resize(size))
+
+
+def sample_segmentation(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    crop_info: pd.Series,
+    segmentation_mask: np.ndarray,
+) -> np.ndarray:
+    """Sample the segmentation result of a crop at UTM coordinates (nearest neighbour).
+
+    Args:
+        xs (np.ndarray): x-coordinates (UTM32N)
+        ys (np.ndarray): y-coordinates (UTM32N)
+        crop_info (pd.Series): crop store index row of the crop
+        segmentation_mask (np.ndarray): segmentation result of the crop, of any size
+
+    Returns:
+        np.ndarray: segmentation result per coordinate
+    """
+    trafo_px_to_geo = affine.Affine(*crop_info[TRANSFORM_COLUMNS].to_numpy(float))
+    crop_cols, crop_rows = ~trafo_px_to_geo * (xs, ys)
+
+    mask_height, mask_width = segmentation_mask.shape
+    mask_cols = np.floor(crop_cols * mask_width / crop_info["width"]).astype(int)
+    mask_rows = np.floor(crop_rows * mask_height / crop_info["height"]).astype(int)
+
+    return segmentation_mask[
+        np.clip(mask_rows, 0, mask_height - 1), np.clip(mask_cols, 0, mask_width - 1)
+    ]
+
+
+def compute_footprints(
+    geometries: np.ndarray,
+    yield_data: np.ndarray,
+    yield_transform: affine.Affine,
+    no_data_value: float | None,
+) -> list[YieldFootprint]:
+    """Energy yield pixels covered by the outlines of buildings.
+
+    Args:
+        geometries (np.ndarray): building outlines (UTM32N)
+        yield_data (np.ndarray): energy yield of the area (kWh/m² per pixel)
+        yield_transform (affine.Affine): transformation of `yield_data`
+        no_data_value (float | None): no data value of the energy yield
+
+    Returns:
+        list[YieldFootprint]: footprint per building
+    """
+    pixel_size = (abs(yield_transform.a), abs(yield_transform.e))
+
+    # we assume the energy output is 0kWh/m^2 for no data pixels
+    yield_data = np.where(yield_data == no_data_value, 0, yield_data).astype(np.float32)
+
+    building_index, rows, cols = [], [], []
+    for labels in label_buildings(geometries, yield_data.shape, yield_transform):
+        layer_rows, layer_cols = np.nonzero(labels)
+        building_index.append(labels[layer_rows, layer_cols] - 1)
+        rows.append(layer_rows)
+        cols.append(layer_cols)
+
+    building_index = np.concatenate([np.empty(0, dtype=np.int32), *building_index])
+    rows = np.concatenate([np.empty(0, dtype=int), *rows])
+    cols = np.concatenate([np.empty(0, dtype=int), *cols])
+
+    xs, ys = yield_transform * (cols + 0.5, rows + 0.5)
+    pixel_yield = yield_data[rows, cols]
+
+    # pixels sorted by building, row-major within a building
+    order = np.argsort(building_index, kind="stable")
+    boundaries = np.searchsorted(building_index[order], np.arange(1, len(geometries)))
+
+    return [
+        YieldFootprint(xs[pixels], ys[pixels], pixel_yield[pixels], pixel_size)
+        for pixels in np.split(order, boundaries)
+    ]
+
+
+def _concatenate(footprints: list[YieldFootprint]) -> tuple[np.ndarray, ...]:
+    # building position, coordinates and yield of the pixels of all footprints
+    building_index = np.repeat(np.arange(len(footprints)), [len(f) for f in footprints])
+    xs = np.concatenate([np.empty(0), *(f.xs for f in footprints)])
+    ys = np.concatenate([np.empty(0), *(f.ys for f in footprints)])
+    pixel_yield = np.concatenate([np.empty(0, np.float32), *(f.pixel_yield for f in footprints)])
+    return building_index, xs, ys, pixel_yield
+
+
+def segment_footprints(
+    building_ids: np.ndarray,
+    footprints: list[YieldFootprint],
+    crops: pd.DataFrame,
+    load_segmentation: Callable[[int], np.ndarray],
+) -> np.ndarray:
+    """Segmentation result at the footprint pixels of buildings.
+
+    Args:
+        building_ids (np.ndarray): building identifiers
+        footprints (list[YieldFootprint]): footprint per building
+        crops (pd.DataFrame): crop store index rows of the buildings (indexed by
+            `building_id`)
+        load_segmentation (Callable[[int], np.ndarray]): loads the segmentation result
+            (0..255) of a crop id
+
+    Returns:
+        np.ndarray: segmentation result (0..255) per pixel of the concatenated footprints
+    """
+    building_crops = crops.loc[building_ids]
+    building_index, xs, ys, _ = _concatenate(footprints)
+
+    # pixels grouped by the crop of their building
+    crop_codes, crop_ids = pd.factorize(building_crops["crop_id"])
+    pixel_crops = crop_codes[building_index]
+    order = np.argsort(pixel_crops, kind="stable")
+    boundaries = np.flatnonzero(np.diff(pixel_crops[order])) + 1
+
+    segmentation = np.zeros(len(building_index), dtype=np.uint8)
+    for pixels in np.split(order, boundaries):
+        if len(pixels) == 0:
+            continue
+        crop_code = pixel_crops[pixels[0]]
+        crop_info = building_crops.iloc[np.argmax(crop_codes == crop_code)]
+
+        # buildings sharing a canvas share its segmentation result
+        segmentation_mask = resample_segmentation(
+            load_segmentation(crop_ids[crop_code]),
+            crop_info,
+            footprints[building_index[pixels[0]]].pixel_size,
+        )
+        segmentation[pixels] = sample_segmentation(
+            xs[pixels], ys[pixels], crop_info, segmentation_mask
+        )
+    return segmentation
+
+
+def compute_energy(
+    building_ids: np.ndarray,
+    footprints: list[YieldFootprint],
+    crops: pd.DataFrame,
+    load_segmentation: Callable[[int], np.ndarray],
+    *,
+    segmentation_threshold: float,
+    efficiency: float,
+) -> pd.DataFrame:
+    """Energy yield of buildings, in total and of their solar panels.
+
+    Args:
+        building_ids (np.ndarray): building identifiers
+        footprints (list[YieldFootprint]): footprint per building
+        crops (pd.DataFrame): crop store index rows of the buildings (indexed by
+            `building_id`)
+        load_segmentation (Callable[[int], np.ndarray]): loads the segmentation result
+            (0..255) of a crop id
+        segmentation_threshold (float): threshold of the segmentation result (0..1)
+        efficiency (float): efficiency of the solar panels
+
+    Returns:
+        pd.DataFrame: energy statistics per building, in the order of `building_ids`
+    """
+    num_buildings = len(building_ids)
+    building_index, _, _, pixel_yield = _concatenate(footprints)
+
+    potential = np.bincount(building_index, weights=pixel_yield, minlength=num_buildings)
+
+    segmentation = segment_footprints(building_ids, footprints, crops, load_segmentation)
+    has_solar_panel = segmentation / 255 > segmentation_threshold
+
+    actual = np.bincount(
+        building_index[has_solar_panel],
+        weights=pixel_yield[has_solar_panel],
+        minlength=num_buildings,
+    )
+
+    # in m2, per building as the resolution of the energy yield may differ
+    area_pixel = np.array([footprint.pixel_area for footprint in footprints], dtype=float)
+    return pd.DataFrame(
+        {
+            "building_id": building_ids,
+            "actual_energy_kWh": actual * area_pixel,
+            "mined_energy_kWh": actual * area_pixel * efficiency,
+            "potential_energy_kWh": potential * area_pixel,
+        }
+    )
+
+
+def compute_histograms(
+    building_ids: np.ndarray,
+    footprints: list[YieldFootprint],
+    crops: pd.DataFrame,
+    load_segmentation: Callable[[int], np.ndarray],
+) -> pd.DataFrame:
+    """Potential energy of buildings and its histogram over the segmentation result.
+
+    Args:
+        building_ids (np.ndarray): building identifiers
+        footprints (list[YieldFootprint]): footprint per building
+        crops (pd.DataFrame): crop store index rows of the buildings (indexed by
+            `building_id`)
+        load_segmentation (Callable[[int], np.ndarray]): loads the segmentation result
+            (0..255) of a crop id
+
+    Returns:
+        pd.DataFrame: columns `building_id`, `potential_energy_kWh` and `histogram`,
+            see `energy_extractor.sweep`
+    """
+    num_buildings = len(building_ids)
+    building_index, _, _, pixel_yield = _concatenate(footprints)
+
+    potential = np.bincount(building_index, weights=pixel_yield, minlength=num_buildings)
+
+    segmentation = segment_footprints(building_ids, footprints, crops, load_segmentation)
+    histograms = np.bincount(
+        building_index * SEGMENTATION_LEVELS + segmentation,
+        weights=pixel_yield,
+        minlength=num_buildings * SEGMENTATION_LEVELS,
+    ).reshape(num_buildings, SEGMENTATION_LEVELS)
+
+    # in m2, per building as the resolution of the energy yield may differ
+    area_pixel = np.array([footprint.pixel_area for footprint in footprints], dtype=float)
+    return pd.DataFrame(
+        {
+            "building_id": building_ids,
+            "potential_energy_kWh": potential * area_pixel,
+            "histogram": list(histograms * area_pixel[:, None]),
+        }
+    )
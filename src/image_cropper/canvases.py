@@ -0,0 +1,139 @@
+"""
+Shared canvases for clusters of adjacent buildings.
+
+Crops of terraced and semi-detached houses overlap to a large extent, the same roof
+pixels would be decoded, stored and segmented once per building. Instead, buildings
+close to each other are grouped into a single square canvas (up to a maximum edge
+length), which is cropped and segmented once. The energy extractor splits the result of
+a canvas back to the buildings using their outlines.
+"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from utils.building_artifact import CROP_BOX_COLUMNS
+
+
+def _square_around(bounds: np.ndarray) -> np.ndarray:
+    center = (bounds[:2] + bounds[2:]) / 2
+    half_side = np.max(bounds[2:] - bounds[:2]) / 2
+    return np.concatenate([center - half_side, center + half_side])
+
+
+def _union(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.minimum(a[:2], b[:2]), np.maximum(a[2:], b[2:])])
+
+
+def cluster_buildings(
+    geometries: np.ndarray,
+    crop_boxes: np.ndarray,
+    max_canvas_size: float,
+    max_gap: float = 1.0,
+) -> np.ndarray:
+    """Group buildings which touch or are close to each other.
+
+    Pairs of buildings are merged closest first, as long as the square canvas around the
+    crop boxes of the merged cluster does not exceed `max_canvas_size`.
+
+    Args:
+        geometries (np.ndarray): building outlines (UTM32N)
+        crop_boxes (np.ndarray): crop boxes of the buildings (n, 4)
+        max_canvas_size (float): maximum edge length of a canvas in meters
+        max_gap (float, optional): maximum distance in meters between the outlines of
+            adjacent buildings. Defaults to 1.0.
+
+    Returns:
+        np.ndarray: cluster label per building, the position of its first member
+    """
+    parents = np.arange(len(geometries))
+    cluster_bounds = {i: np.asarray(box, dtype=float) for i, box in enumerate(crop_boxes)}
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    tree = shapely.STRtree(geometries)
+    left, right = tree.query(geometries, predicate="dwithin", distance=max_gap)
+    is_pair = left < right
+    left, right = left[is_pair], right[is_pair]
+
+    distances = shapely.distance(geometries[left], geometries[right])
+    for i, j in zip(*(a[np.argsort(distances, kind="stable")] for a in (left, right))):
+        root_i, root_j = find(i), find(j)
+        if root_i == root_j:
+            continue
+
+        merged = _union(cluster_bounds[root_i], cluster_bounds[root_j])
+        if np.max(merged[2:] - merged[:2]) > max_canvas_size:
+            continue
+
+        # the first building is the root, its building identifier becomes the crop id
+        root, child = min(root_i, root_j), max(root_i, root_j)
+        parents[child] = root
+        cluster_bounds[root] = merged
+        del cluster_bounds[child]
+
+    return np.array([find(i) for i in range(len(geometries))], dtype=int)
+
+
+def create_crops(
+    buildings: gpd.GeoDataFrame,
+    max_canvas_size: float | None = None,
+    max_gap: float = 1.0,
+) -> pd.DataFrame:
+    """Determine the crops of the buildings within a tile.
+
+    Without `max_canvas_size`, every building gets its own crop. Otherwise adjacent
+    buildings share a canvas, see `cluster_buildings`.
+
+    Args:
+        buildings (gpd.GeoDataFrame): buildings with crop boxes, see
+            `utils.building_artifact`
+        max_canvas_size (float | None, optional): maximum edge length of a shared canvas
+            in meters. Defaults to None (no shared canvases).
+        max_gap (float, optional): see `cluster_buildings`. Defaults to 1.0.
+
+    Returns:
+        pd.DataFrame: columns `crop_id`, `building_ids` (list) and the crop box columns,
+            in the order of the buildings
+    """
+    building_ids = buildings["building_id"].to_numpy()
+    crop_boxes = buildings[CROP_BOX_COLUMNS].to_numpy()
+
+    if max_canvas_size is None or len(buildings) == 0:
+        crops = pd.DataFrame(crop_boxes, columns=CROP_BOX_COLUMNS)
+        crops.insert(0, "crop_id", building_ids)
+        crops.insert(1, "building_ids", [[building_id] for building_id in building_ids])
+        return crops
+
+    labels = cluster_buildings(
+        buildings.geometry.values, crop_boxes, max_canvas_size, max_gap=max_gap
+    )
+
+    records = []
+    for label in pd.unique(labels):
+        members = np.flatnonzero(labels == label)
+        if len(members) == 1:
+            # the crop box of a single building is kept as is
+            crop_box = crop_boxes[label]
+        else:
+            crop_box = crop_boxes[members[0]]
+            for member in members[1:]:
+                crop_box = _union(crop_box, crop_boxes[member])
+            crop_box = _square_around(crop_box)
+
+        records.append(
+            {
+                "crop_id": building_ids[label],
+                "building_ids": building_ids[members].tolist(),
+                **dict(zip(CROP_BOX_COLUMNS, crop_box)),
+            }
+        )
+
+    return pd.DataFrame.from_records(
+        records, columns=["crop_id", "building_ids", *CROP_BOX_COLUMNS]
+    )
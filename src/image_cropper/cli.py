@@ -3,6 +3,7 @@ from pathlib import Path
 import click
 
 from image_cropper.crop_images import crop_images_from_buildings
+from utils.crop_store import CropStore
 from utils.logging import get_client_logger
 
 logger = get_client_logger()
@@ -11,12 +12,73 @@ logger = get_client_logger()
 @click.command()
 @click.argument("buildings_file", type=click.Path(exists=True))
 @click.argument("output_folder", type=click.Path())
-def image_cropper_cli(buildings_file: str, output_folder: str):
+@click.option(
+    "--max-cache-gb",
+    default=None,
+    type=click.FLOAT,
+    help="Disk budget for downloaded aerial image tiles, least recently used tiles are evicted.",
+)
+@click.option(
+    "--cog",
+    is_flag=True,
+    default=False,
+    help="Transcode downloaded aerial image tiles into Cloud-Optimized GeoTIFFs for faster reads.",
+)
+@click.option(
+    "--target-size",
+    default=None,
+    type=click.INT,
+    help="Edge length in pixels of the crops, larger windows are decoded at reduced resolution.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of worker processes, the tiles are distributed among them.",
+)
+@click.option(
+    "--max-canvas-size",
+    default=None,
+    type=click.FLOAT,
+    help="Group adjacent buildings into shared canvases up to this edge length in meters.",
+)
+@click.option(
+    "--max-canvas-gap",
+    default=1.0,
+    type=click.FLOAT,
+    show_default=True,
+    help="Maximum distance in meters between buildings sharing a canvas.",
+)
+@click.option(
+    "--remote",
+    is_flag=True,
+    default=False,
+    help="Read windows of the aerial image tiles by HTTP range requests instead of "
+    "downloading whole tiles.",
+)
+def image_cropper_cli(
+    buildings_file: str,
+    output_folder: str,
+    max_cache_gb: float | None,
+    cog: bool,
+    target_size: int | None,
+    workers: int,
+    max_canvas_size: float | None,
+    max_canvas_gap: float,
+    remote: bool,
+):
     """Extract a square-shaped image for each of the buildings in the BUILDINGS_FILE (gpkg).
 
     Args:
         buildings_file (str): GeoPackage file with buildings
         output_folder (str): output folder where images shall be extracted
+        max_cache_gb (float | None): disk budget for the tile data in GB
+        cog (bool): whether to transcode the aerial image tiles into COGs
+        target_size (int | None): edge length of the crops in pixels, e.g. the model input
+        workers (int): number of worker processes
+        max_canvas_size (float | None): maximum edge length of shared canvases in meters
+        max_canvas_gap (float): maximum distance between buildings sharing a canvas
+        remote (bool): whether to read the aerial image tiles remotely
     """
     click.echo(f"Processing buildings from: {buildings_file}")
     click.echo(f"Saving cropped images to: {output_folder}")
@@ -25,9 +87,45 @@ def image_cropper_cli(buildings_file: str, output_folder: str):
     output_folder.mkdir(parents=True, exist_ok=True)
 
     image_data_location = "data"
-    crop_images_from_buildings(buildings_file, image_data_location, output_folder)
+    crop_images_from_buildings(
+        buildings_file,
+        image_data_location,
+        output_folder,
+        max_cache_bytes=int(max_cache_gb * 1024**3) if max_cache_gb is not None else None,
+        transcode_to_cog=cog,
+        target_size=target_size,
+        workers=workers,
+        max_canvas_size=max_canvas_size,
+        max_canvas_gap=max_canvas_gap,
+        remote=remote,
+    )
     logger.info("Processing complete!")
 
 
+@click.command()
+@click.argument("crops_folder", type=click.Path(exists=True, dir_okay=True, file_okay=False))
+@click.argument("output_folder", type=click.Path())
+@click.option(
+    "-b",
+    "--building-id",
+    "building_ids",
+    multiple=True,
+    type=click.INT,
+    help="Building to export, can be repeated. Defaults to all buildings.",
+)
+def export_crops_cli(crops_folder: str, output_folder: str, building_ids: tuple[int, ...]):
+    """Export the crops of the crop store in CROPS_FOLDER as PNG files into OUTPUT_FOLDER.
+
+    Args:
+        crops_folder (str): crop store folder, output of `image-cropper`
+        output_folder (str): output folder for `<crop_id>.png` files, shared canvases are
+            exported once
+        building_ids (tuple[int, ...]): buildings to export
+    """
+    crop_store = CropStore(crops_folder)
+    crop_store.export_png(output_folder, building_ids if len(building_ids) > 0 else None)
+    logger.info("Export complete!")
+
+
 if __name__ == "__main__":
     image_cropper_cli()
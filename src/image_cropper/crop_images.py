@@ -1,118 +1,648 @@
+import multiprocessing
+import os
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
 
 import affine
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import rasterio
 import rasterio.windows
 import shapely
+from PIL import Image
+from rasterio.enums import Resampling
+from rasterio.errors import WindowError
+from rasterio.io import DatasetReader
+from rasterio.windows import Window
 from rasterio.windows import transform as window_transform
 from tqdm import tqdm
 
-from utils import TileManager, transform_wgs84_to_utm32N
+from image_cropper.canvases import create_crops
+from utils.building_artifact import CROP_BOX_COLUMNS, read_buildings
+from utils.cog import COG_SUFFIX
+from utils.crop_store import CropStoreWriter, merge_index_parts
 from utils.logging import get_library_logger
+from utils.mosaic import open_mosaic
 from utils.opengeodata_nrw import DatasetType
+from utils.pipeline import Pipeline, Stage
+from utils.raster_pool import RasterDatasetPool, get_default_pool
+from utils.tile_cache import TileCache
+from utils.tile_catalog import load_default_catalog
+from utils.tile_management import TileManager
+from utils.tile_prefetch import iter_tiles_with_prefetch, plan_tiles
+from utils.window_planning import plan_coalesced_reads, slice_window, window_pixel_extent
 
 logger = get_library_logger(__name__)
 
 
 def crop_images_from_buildings(
-    buildings_gpkg_path: str, image_data_location: str, output_location: str
+    buildings_gpkg_path: str,
+    image_data_location: str,
+    output_location: str,
+    *,
+    max_cache_bytes: int | None = None,
+    transcode_to_cog: bool = False,
+    target_size: int | None = None,
+    num_decode_threads: str = "ALL_CPUS",
+    raster_pool: RasterDatasetPool | None = None,
+    workers: int = 1,
+    max_canvas_size: float | None = None,
+    max_canvas_gap: float = 1.0,
+    read_threads: int = 2,
+    compute_threads: int = 2,
+    remote: bool = False,
 ):
+    """Crop a square-shaped aerial image around each of the buildings.
+
+    Args:
+        buildings_gpkg_path (str): GeoPackage file with buildings, see
+            `utils.building_artifact`
+        image_data_location (str): folder with the aerial image tiles
+        output_location (str): output folder of the crop store, see `utils.crop_store`
+        max_cache_bytes (int | None, optional): disk budget for the aerial image tiles.
+            Defaults to None (unbounded).
+        transcode_to_cog (bool, optional): transcode the tiles into COGs after download.
+            Defaults to False.
+        target_size (int | None, optional): edge length in pixels of the crops. Larger
+            windows are decoded at reduced resolution (from JPEG2000 resolution levels or
+            COG overviews where available), smaller ones are kept at full resolution.
+            Defaults to None (full resolution).
+        num_decode_threads (str, optional): GDAL decoding threads. Defaults to "ALL_CPUS".
+        raster_pool (RasterDatasetPool | None, optional): pool of open tile handles.
+            Defaults to the pool shared within the process.
+        workers (int, optional): number of worker processes, tiles are distributed
+            among them. Defaults to 1 (processing in the calling process).
+        max_canvas_size (float | None, optional): group adjacent buildings into shared
+            canvases up to this edge length in meters, see `image_cropper.canvases`.
+            Defaults to None (one crop per building).
+        max_canvas_gap (float, optional): maximum distance in meters between buildings
+            sharing a canvas. Defaults to 1.0.
+        read_threads (int, optional): threads reading from a tile. Defaults to 2.
+        compute_threads (int, optional): threads extracting the crops. Defaults to 2.
+        remote (bool, optional): read windows of the aerial image tiles by HTTP range
+            requests instead of downloading them, see `utils.remote_tiles`.
+            Defaults to False.
+    """
+    raster_pool = raster_pool if raster_pool is not None else get_default_pool()
+
     output_location = Path(output_location)
     output_location.mkdir(parents=True, exist_ok=True)
 
-    buildings = gpd.read_file(buildings_gpkg_path)
+    buildings = read_buildings(buildings_gpkg_path)
 
-    manager_aerial_images = TileManager.from_html_extraction_result(
-        "data/aerial_images.csv",
+    # the data folder may be shared with the energy yield tiles, see `energy_extractor`
+    tile_cache = TileCache(
+        image_data_location, max_bytes=max_cache_bytes, patterns=("*.jp2", f"*{COG_SUFFIX}")
+    )
+    manager_aerial_images = load_default_catalog().tile_manager(
+        DatasetType.AERIAL_IMAGE,
         data_folder=image_data_location,
-        tile_type=DatasetType.AERIAL_IMAGE,
+        cache=tile_cache,
+        transcode_to_cog=transcode_to_cog,
+        remote=remote,
     )
 
-    overview_data = list()
+    # plan all required tiles up front, the buildings are processed tile by tile
+    plan = plan_tiles(buildings, {"aerial_tile": manager_aerial_images})
+    buildings_by_tile = plan.buildings_by_tile("aerial_tile")
+
+    crops_by_tile = {
+        tile_name: create_crops(tile_buildings, max_canvas_size, max_gap=max_canvas_gap)
+        for tile_name, tile_buildings in buildings_by_tile.items()
+    }
+    num_crops = sum(len(tile_crops) for tile_crops in crops_by_tile.values())
+    logger.info(f"Cropping {len(plan.buildings)} buildings into {num_crops} crops")
+
+    # crops close to a tile edge are read from a mosaic with the neighbours
+    neighbour_tiles = {
+        tile_name: find_neighbour_tiles(tile_crops, manager_aerial_images, tile_name)
+        for tile_name, tile_crops in crops_by_tile.items()
+    }
+
+    progress_bar = tqdm(total=len(plan.buildings))
+
+    # the next tiles are downloaded while the current one is processed
+    tiles = iter_tiles_with_prefetch(manager_aerial_images, plan.tiles["aerial_tile"])
+
+    if workers > 1:
+        # do not oversubscribe the cores with decoding threads
+        if num_decode_threads == "ALL_CPUS":
+            num_decode_threads = str(max((os.cpu_count() or 1) // workers, 1))
+
+        index_part_paths = crop_tiles_with_process_pool(
+            manager_aerial_images,
+            tiles,
+            crops_by_tile,
+            neighbour_tiles,
+            output_location,
+            workers=workers,
+            progress_bar=progress_bar,
+            target_size=target_size,
+            num_decode_threads=num_decode_threads,
+            read_threads=read_threads,
+            compute_threads=compute_threads,
+        )
+    else:
+        index_part_paths = dict()
+        for tile_name, tile_file_path in tiles:
+            tile_crops = crops_by_tile[tile_name]
+            neighbour_tile_paths = manager_aerial_images.acquire_tiles(neighbour_tiles[tile_name])
+            try:
+                index_part_paths[tile_name] = crop_tile(
+                    tile_name,
+                    tile_file_path,
+                    tile_crops,
+                    output_location,
+                    neighbour_tile_paths=neighbour_tile_paths,
+                    target_size=target_size,
+                    num_decode_threads=num_decode_threads,
+                    raster_pool=raster_pool,
+                    read_threads=read_threads,
+                    compute_threads=compute_threads,
+                )
+            finally:
+                manager_aerial_images.release_tiles(neighbour_tiles[tile_name])
+            progress_bar.update(len(buildings_by_tile[tile_name]))
+
+    progress_bar.close()
+
+    # index parts are merged in the order of the tiles, the same for parallel processing
+    merge_index_parts(
+        output_location,
+        [index_part_paths[tile_name] for tile_name in plan.tiles["aerial_tile"]],
+    )
 
-    for _, building in tqdm(buildings.iterrows(), total=len(buildings)):
-        building_id = building["building_id"]
-        building_gps_polygon = building["geometry"]
+    logger.info(f"Tile cache statistics: {tile_cache.stats}")
+    logger.info(f"Raster pool statistics: {raster_pool.stats}")
+
+
+def crop_tile(
+    tile_name: str,
+    tile_file_path: Path,
+    tile_crops: pd.DataFrame,
+    output_location: Path,
+    *,
+    neighbour_tile_paths: Sequence[Path] = (),
+    target_size: int | None = None,
+    num_decode_threads: str = "ALL_CPUS",
+    raster_pool: RasterDatasetPool | None = None,
+    read_threads: int = 2,
+    compute_threads: int = 2,
+) -> Path:
+    """Crop the images of a single tile into the crop store.
+
+    The crops are written into shards of the crop store prefixed with the tile name,
+    the returned index part is merged into the index of the store later. Reading,
+    extracting and writing of the crops overlap, see `utils.pipeline`.
 
-        building_polygon = transform_wgs84_to_utm32N(building_gps_polygon)
-        building_geometry_centroid = building_polygon.centroid
+    Args:
+        tile_name (str): aerial image tile name
+        tile_file_path (Path): aerial image tile
+        tile_crops (pd.DataFrame): crops within the tile, see `create_crops`
+        output_location (Path): crop store folder
+        neighbour_tile_paths (Sequence[Path], optional): neighbouring tiles, crops
+            crossing the tile edge are read from a mosaic with them. Defaults to ().
+        target_size (int | None, optional): see `crop_images_from_buildings`.
+        num_decode_threads (str, optional): GDAL decoding threads. Defaults to "ALL_CPUS".
+        raster_pool (RasterDatasetPool | None, optional): pool of open tile handles.
+            Defaults to the pool shared within the process.
+        read_threads (int, optional): threads reading from the tile. Defaults to 2.
+        compute_threads (int, optional): threads extracting the crops. Defaults to 2.
 
-        tile_name = manager_aerial_images.get_tile_name_from_point(
-            building_geometry_centroid.x,
-            building_geometry_centroid.y,
-            with_extension=False,
+    Returns:
+        Path: index part of the tile
+    """
+    raster_pool = raster_pool if raster_pool is not None else get_default_pool()
+
+    crop_store_writer = CropStoreWriter(output_location, prefix=tile_name)
+
+    def save_crops(
+        read: Callable[[ReadTask], np.ndarray],
+        read_tasks: list[ReadTask],
+        tile_transform: affine.Affine,
+        read_threads: int,
+    ):
+        def extract(
+            read_result: tuple[ReadTask, np.ndarray],
+        ) -> list[tuple[CropJob, np.ndarray, affine.Affine]]:
+            crops = []
+            for crop_job, image_matrix in extract_crops(*read_result):
+                # we store the transformation matrix for later use
+                transform_cropped_px_to_geo = create_transform_for_scaled_crop(
+                    tile_transform, crop_job.crop_window, crop_job.size
+                )
+                image_matrix = np.ascontiguousarray(np.moveaxis(image_matrix, 0, -1))
+                crops.append((crop_job, image_matrix, transform_cropped_px_to_geo))
+            return crops
+
+        def write(crops: list[tuple[CropJob, np.ndarray, affine.Affine]]):
+            for crop_job, image_matrix, transform_cropped_px_to_geo in crops:
+                crop_store_writer.append(
+                    crop_job.crop_id,
+                    image_matrix,
+                    transform_cropped_px_to_geo,
+                    building_ids=tile_crops["building_ids"].iloc[crop_job.position],
+                )
+
+        pipeline = Pipeline(
+            [
+                Stage(lambda task: (task, read(task)), workers=read_threads, name="read"),
+                Stage(extract, workers=compute_threads, name="extract"),
+                Stage(write, ordered=True, name="write"),
+            ]
         )
+        for _ in pipeline.run(read_tasks):
+            pass
+        logger.debug(f"Pipeline statistics of {tile_name}: {pipeline.stats}")
+
+    def read_from_tile(read_task: ReadTask) -> np.ndarray:
+        # each reader thread borrows its own handle of the tile
+        with rasterio.Env(GDAL_NUM_THREADS=num_decode_threads):
+            with raster_pool.open(tile_file_path) as image_data:
+                return read_task_data(image_data, read_task)
+
+    with rasterio.Env(GDAL_NUM_THREADS=num_decode_threads), crop_store_writer:
+        with raster_pool.open(tile_file_path) as image_data:
+            crop_jobs, outside_positions = plan_crop_jobs(tile_crops, image_data, target_size)
+            # full resolution crops are sliced from coalesced reads, reduced resolution
+            # crops are decoded window by window from the resolution levels of the tile
+            read_tasks = plan_read_tasks(image_data, crop_jobs, coalesce=target_size is None)
+            tile_transform = image_data.transform
+        save_crops(read_from_tile, read_tasks, tile_transform, read_threads)
+
+        if len(outside_positions) > 0 and len(neighbour_tile_paths) > 0:
+            with open_mosaic([tile_file_path, *neighbour_tile_paths]) as mosaic:
+                crop_jobs, outside_positions = plan_crop_jobs(
+                    tile_crops.iloc[outside_positions],
+                    mosaic,
+                    target_size,
+                    positions=outside_positions,
+                )
+                # integer-aligned reads, fractional windows are not exact across tiles
+                read_tasks = plan_read_tasks(mosaic, crop_jobs, coalesce=True)
+                # the mosaic handle is not shared between threads, a single reader
+                save_crops(
+                    lambda read_task: read_task_data(mosaic, read_task),
+                    read_tasks,
+                    mosaic.transform,
+                    read_threads=1,
+                )
+
+    if len(outside_positions) > 0:
+        logger.warning(
+            f"Skipped {len(outside_positions)} crops of {Path(tile_file_path).name}, "
+            "their crops are not covered by the available tiles"
+        )
+
+    return crop_store_writer.index_part_path
+
 
-        if not manager_aerial_images.check_if_tile_exists(tile_name):
-            logger.info(f"Downloading tile data for {tile_name}")
-            manager_aerial_images.download_tile(tile_name)
-            logger.info("Download complete!")
+def find_neighbour_tiles(
+    tile_crops: pd.DataFrame,
+    tile_manager: TileManager,
+    tile_name: str,
+    tolerance: float = 1.0,
+) -> list[str]:
+    """Find the neighbouring tiles which the crops of a tile extend into.
 
-        file_extension = manager_aerial_images.file_extension
-        tile_filename = f"{tile_name}.{file_extension}"
+    Args:
+        tile_crops (pd.DataFrame): crops (or buildings) within the tile, with crop boxes
+            (see `utils.building_artifact`)
+        tile_manager (TileManager): tile manager of the aerial images
+        tile_name (str): tile of the crops
+        tolerance (float, optional): buffer of the crop boxes in meters. Defaults to 1.0.
+
+    Returns:
+        list[str]: neighbouring tile names
+    """
+    # crop boxes, with some tolerance
+    crop_boxes = tile_crops[CROP_BOX_COLUMNS].to_numpy()
+    boxes = shapely.box(
+        crop_boxes[:, 0] - tolerance,
+        crop_boxes[:, 1] - tolerance,
+        crop_boxes[:, 2] + tolerance,
+        crop_boxes[:, 3] + tolerance,
+    )
+
+    outside = ~shapely.contains(tile_manager.get_tile_geometry(tile_name), boxes)
+    if not outside.any():
+        return []
+
+    neighbour_tiles = set()
+    for box in boxes[outside]:
+        neighbour_tiles.update(tile_manager.get_tiles_intersecting(box))
+    neighbour_tiles.discard(tile_name)
 
-        tile_file_path = f"{image_data_location}/{tile_filename}"
+    return sorted(neighbour_tiles)
 
-        with rasterio.open(tile_file_path) as image_data:
-            affine_transform_px_to_geo = image_data.transform
 
-            # res_x, res_y = image_data.res
+def crop_tiles_with_process_pool(
+    tile_manager: TileManager,
+    tiles: Iterable[tuple[str, Path]],
+    crops_by_tile: dict[str, pd.DataFrame],
+    neighbour_tiles: dict[str, list[str]],
+    output_location: Path,
+    *,
+    workers: int,
+    progress_bar: tqdm | None = None,
+    **crop_kwargs,
+) -> dict[str, Path]:
+    """Distribute the tiles among worker processes, each tile results in an index part of
+    the crop store.
 
-            bounding_box = create_squared_box_around(building_polygon, margin_around_building=5.0)
+    Tiles (and their neighbouring tiles) stay pinned in the tile cache until their worker
+    is done. At most two tiles per worker are scheduled ahead.
 
-            crop_window = rasterio.windows.from_bounds(
-                *bounding_box.bounds,
-                transform=affine_transform_px_to_geo,
+    Args:
+        tile_manager (TileManager): tile manager of the aerial images
+        tiles (Iterable[tuple[str, Path]]): tile names and paths, e.g. from
+            `iter_tiles_with_prefetch`
+        crops_by_tile (dict[str, pd.DataFrame]): crops per tile name, see `create_crops`
+        neighbour_tiles (dict[str, list[str]]): neighbouring tiles per tile name, see
+            `find_neighbour_tiles`
+        output_location (Path): crop store folder
+        workers (int): number of worker processes
+        progress_bar (tqdm | None, optional): progress bar updated per building
+        **crop_kwargs: see `crop_tile`
+
+    Returns:
+        dict[str, Path]: index part per tile name
+    """
+    index_part_paths = dict()
+    pending: dict[Future, str] = dict()
+
+    def collect(futures: set[Future]):
+        for future in futures:
+            tile_name = pending.pop(future)
+            index_part_paths[tile_name] = future.result()
+            if progress_bar is not None:
+                num_buildings = crops_by_tile[tile_name]["building_ids"].map(len).sum()
+                progress_bar.update(num_buildings)
+
+    # spawned workers do not inherit the download threads and GDAL state
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        for tile_name, tile_file_path in tiles:
+            # the tile itself is provided by `tiles`, it stays pinned until the worker is done
+            tile_manager.pin_tile(tile_name)
+            neighbour_tile_paths = tile_manager.acquire_tiles(neighbour_tiles[tile_name])
+            future = executor.submit(
+                crop_tile,
+                tile_name,
+                tile_file_path,
+                crops_by_tile[tile_name],
+                output_location,
+                neighbour_tile_paths=neighbour_tile_paths,
+                **crop_kwargs,
+            )
+            future.add_done_callback(
+                lambda _, tile_name=tile_name: tile_manager.release_tiles(
+                    [tile_name, *neighbour_tiles[tile_name]]
+                )
             )
+            pending[future] = tile_name
+
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
 
-            image_matrix = image_data.read(window=crop_window)
+        collect(wait(pending).done)
 
-            image_matrix = image_matrix[:3, ...]
-            image_matrix = np.moveaxis(image_matrix, 0, -1)
+    return index_part_paths
 
-            # crop window is partly outside the image
-            if image_matrix.shape[0] != image_matrix.shape[1]:
-                # TODO: logic to combine data from neighboring tiles
-                continue
 
-            building_image_filename = f"{building_id}.png"
+@dataclass
+class CropJob:
+    """Crop of a single building (or shared canvas) within a tile.
+
+    Attributes:
+        position: position of the crop within the crops of the tile
+        crop_id: crop identifier
+        crop_window: square crop window in tile pixels
+        read_window: part of the crop window within the tile
+        size: edge length of the crop in pixels
+    """
+
+    position: int
+    crop_id: int
+    crop_window: Window
+    read_window: Window
+    size: int
+
+
+def plan_crop_jobs(
+    crops: pd.DataFrame,
+    image_data: DatasetReader,
+    target_size: int | None = None,
+    positions: Sequence[int] | None = None,
+) -> tuple[list[CropJob], list[int]]:
+    """Determine the crop windows within a tile (or mosaic).
+
+    Args:
+        crops (pd.DataFrame): crops within the tile, see `create_crops`
+        image_data (DatasetReader): tile or mosaic
+        target_size (int | None, optional): edge length of the crops, see
+            `crop_images_from_buildings`. Defaults to None.
+        positions (Sequence[int] | None, optional): positions of the crops within the
+            crops of the tile. Defaults to 0, 1, 2, ...
+
+    Returns:
+        tuple[list[CropJob], list[int]]: crops to read and the positions of the crops
+            whose window is (partly) outside of `image_data`
+    """
+    positions = positions if positions is not None else range(len(crops))
+    tile_window = Window(0, 0, image_data.width, image_data.height)
+
+    crop_jobs = []
+    outside_positions = []
+    for position, crop_id, crop_box in zip(
+        positions, crops["crop_id"], crops[CROP_BOX_COLUMNS].to_numpy()
+    ):
+        crop_window = rasterio.windows.from_bounds(
+            *crop_box,
+            transform=image_data.transform,
+        )
+
+        # crop window is (partly) outside the image
+        try:
+            read_window = crop_window.intersection(tile_window)
+        except WindowError:
+            outside_positions.append(position)
+            continue
+        if (round(read_window.width), round(read_window.height)) != (
+            round(crop_window.width),
+            round(crop_window.height),
+        ):
+            outside_positions.append(position)
+            continue
+
+        crop_jobs.append(
+            CropJob(
+                position=position,
+                crop_id=crop_id,
+                crop_window=crop_window,
+                read_window=read_window,
+                size=get_crop_size(round(read_window.width), target_size),
+            )
+        )
+
+    return crop_jobs, outside_positions
+
+
+@dataclass
+class ReadTask:
+    """Single raster read, the crops of one or more crop jobs are extracted from its data.
+
+    Attributes:
+        window: window to read
+        crop_jobs: crops within the window
+        out_shape: output shape (height, width) of a resampled read, None for a full
+            resolution read
+    """
+
+    window: Window
+    crop_jobs: list[CropJob]
+    out_shape: tuple[int, int] | None = None
+
+
+def plan_read_tasks(
+    image_data: DatasetReader,
+    crop_jobs: list[CropJob],
+    coalesce: bool = True,
+    max_read_pixels: int = 4096 * 4096,
+) -> list[ReadTask]:
+    """Determine the reads of the crops within a tile.
+
+    With `coalesce`, overlapping crop windows are merged into block-aligned super-windows
+    which are decoded once, the full resolution crops are sliced from them (and
+    downsampled, if smaller). Otherwise each crop is read on its own, resampled to its
+    size.
+
+    Args:
+        image_data (DatasetReader): tile
+        crop_jobs (list[CropJob]): crops within the tile
+        coalesce (bool, optional): whether to coalesce reads. Defaults to True.
+        max_read_pixels (int, optional): maximum size of a super-window.
+            Defaults to 4096 * 4096.
 
-            plt.imsave(
-                output_location / building_image_filename,
-                arr=image_matrix,
-                dpi=200,
+    Returns:
+        list[ReadTask]: reads
+    """
+    if not coalesce:
+        return [
+            ReadTask(
+                window=crop_job.crop_window,
+                crop_jobs=[crop_job],
+                out_shape=(crop_job.size, crop_job.size),
             )
+            for crop_job in crop_jobs
+        ]
+
+    read_plan = plan_coalesced_reads(
+        [
+            window_pixel_extent(crop_job.read_window, _full_resolution_shape(crop_job))
+            for crop_job in crop_jobs
+        ],
+        block_shape=image_data.block_shapes[0],
+        raster_shape=image_data.shape,
+        max_pixels=max_read_pixels,
+    )
+    logger.debug(f"Reading {len(crop_jobs)} crops from {len(read_plan.windows)} windows")
+
+    return [
+        ReadTask(
+            window=super_window,
+            crop_jobs=[crop_jobs[j] for j in np.flatnonzero(read_plan.assignment == i)],
+        )
+        for i, super_window in enumerate(read_plan.windows)
+    ]
+
+
+def _full_resolution_shape(crop_job: CropJob) -> tuple[int, int]:
+    return round(crop_job.read_window.height), round(crop_job.read_window.width)
+
+
+def read_task_data(image_data: DatasetReader, read_task: ReadTask) -> np.ndarray:
+    """Read the RGB data of a read task (3, height, width)."""
+    if read_task.out_shape is None:
+        return image_data.read(indexes=[1, 2, 3], window=read_task.window)
+
+    return image_data.read(
+        indexes=[1, 2, 3],
+        window=read_task.window,
+        out_shape=(3, *read_task.out_shape),
+        resampling=Resampling.average,
+    )
+
 
-            # # uncomment for DEBUG
-            # img = Image.fromarray(image_matrix)
-            # d = ImageDraw.Draw(img)
-            # d.polygon(
-            #     xy=building_polygon_px_image.exterior.coords[:], outline="red"
-            # )
-            # img.show()
-
-        # we store the transformation matrix for later use
-        transform_cropped_px_to_geo = window_transform(
-            crop_window, affine_transform_px_to_geo
-        ).to_shapely()
-        transform_cropped_px_to_geo_arr = np.array(transform_cropped_px_to_geo)
-
-        overview_data.append(
-            {
-                "building_id": building_id,
-                "image_filename": building_image_filename,
-                "image_shape_width": image_matrix.shape[1],
-                "image_shape_height": image_matrix.shape[0],
-                "transform_px_to_geo": tuple(transform_cropped_px_to_geo_arr.tolist()),
-            }
+def extract_crops(read_task: ReadTask, data: np.ndarray) -> list[tuple[CropJob, np.ndarray]]:
+    """Extract the crops of a read task from its data, see `read_task_data`.
+
+    Args:
+        read_task (ReadTask): read
+        data (np.ndarray): data of the read
+
+    Returns:
+        list[tuple[CropJob, np.ndarray]]: crops and their data (3, size, size)
+    """
+    if read_task.out_shape is not None:
+        return [(read_task.crop_jobs[0], data)]
+
+    crops = []
+    for crop_job in read_task.crop_jobs:
+        image_matrix = slice_window(
+            data, read_task.window, crop_job.read_window, _full_resolution_shape(crop_job)
         )
+        if image_matrix.shape[1:] != (crop_job.size, crop_job.size):
+            image = Image.fromarray(np.moveaxis(image_matrix, 0, -1))
+            image = image.resize((crop_job.size, crop_job.size), Image.Resampling.BOX)
+            image_matrix = np.moveaxis(np.asarray(image), -1, 0)
+        crops.append((crop_job, image_matrix))
+    return crops
+
+
+def get_crop_size(window_size: int, target_size: int | None = None) -> int:
+    """Edge length of a crop, windows are only ever downsampled to `target_size`.
 
-    overview_df = pd.DataFrame(overview_data)
-    overview_df.to_csv(output_location / "overview.csv", index=False)
+    Args:
+        window_size (int): edge length of the crop window at full resolution
+        target_size (int | None, optional): desired edge length. Defaults to None.
+
+    Returns:
+        int: edge length in pixels
+    """
+    if target_size is None:
+        return window_size
+    return min(window_size, target_size)
+
+
+def create_transform_for_scaled_crop(
+    affine_transform_px_to_geo: affine.Affine,
+    crop_window: rasterio.windows.Window,
+    crop_size: int,
+) -> affine.Affine:
+    """Transformation from the pixels of a (possibly downsampled) crop to UTM coordinates.
+
+    Args:
+        affine_transform_px_to_geo (affine.Affine): transformation of the tile
+        crop_window (rasterio.windows.Window): crop window in tile pixels
+        crop_size (int): edge length of the crop in pixels
+
+    Returns:
+        affine.Affine: transformation of the crop
+    """
+    transform_cropped_px_to_geo = window_transform(crop_window, affine_transform_px_to_geo)
+
+    # full resolution crop
+    if crop_size == round(crop_window.width):
+        return transform_cropped_px_to_geo
+
+    # the (fractional) window is resampled onto `crop_size` x `crop_size` pixels
+    scale = affine.Affine.scale(crop_window.width / crop_size, crop_window.height / crop_size)
+    return transform_cropped_px_to_geo * scale
 
 
 def create_transform_for_cropped_image(
@@ -136,40 +666,3 @@ def create_transform_for_cropped_image(
     transform_cropped_px_to_geo_arr[4] += x_offset_m
     transform_cropped_px_to_geo_arr[5] += y_offset_m
     return tuple(transform_cropped_px_to_geo_arr.tolist())
-
-
-def create_squared_box_around(
-    building_polygon: shapely.Polygon, margin_around_building: float = 5.0
-) -> shapely.Polygon:
-    """Create a squared bounding box around a building outline polygon.
-
-    Args:
-        building_polygon (shapely.Polygon): building outline
-        margin_around_building (float, optional): Margin in meters. Defaults to 5.0.
-
-    Returns:
-        shapely.Polygon: squared bounding box
-    """
-    building_polygon_with_margin = building_polygon.buffer(margin_around_building)
-
-    building_buffered_box = building_polygon_with_margin.envelope
-
-    # Calculate the maximum dimension (width or height) of the rectangle
-    width = building_buffered_box.bounds[2] - building_buffered_box.bounds[0]
-    height = building_buffered_box.bounds[3] - building_buffered_box.bounds[1]
-    max_dimension = max(width, height)
-
-    # Determine the centroid of the original rectangle
-    centroid = building_buffered_box.centroid
-
-    half_side = max_dimension / 2
-    buffered_box_square = shapely.Polygon(
-        [
-            (centroid.x - half_side, centroid.y - half_side),
-            (centroid.x + half_side, centroid.y - half_side),
-            (centroid.x + half_side, centroid.y + half_side),
-            (centroid.x - half_side, centroid.y + half_side),
-        ]
-    )
-
-    return buffered_box_square
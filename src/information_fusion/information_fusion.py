@@ -6,6 +6,7 @@ from pathlib import Path
 import geopandas as gpd
 import pandas as pd
 
+from utils.building_artifact import PRECOMPUTED_COLUMNS
 from utils.logging import get_library_logger
 
 logger = get_library_logger(__name__)
@@ -50,5 +51,10 @@ def combine_information(
     final_df = final_df.merge(buildings, on="building_id", how="left")
 
     # to geodataframe, to have the geometries of the buildings
-    final_gdf = gpd.GeoDataFrame(final_df, geometry="geometry")
+    final_gdf = gpd.GeoDataFrame(final_df, geometry="geometry", crs=buildings.crs)
+    final_gdf = final_gdf.drop(columns=PRECOMPUTED_COLUMNS, errors="ignore")
+
+    # the building artifact is UTM-native, the final result stays in WGS84
+    if final_gdf.crs is not None:
+        final_gdf = final_gdf.to_crs("EPSG:4326")
     return final_gdf
@@ -0,0 +1,169 @@
+"""
+Export of the segmentation model and selectable inference backends.
+
+The model is exported with the input normalization and the sigmoid baked in, i.e. all
+backends map B x 3 x H x W images (0..1) to B x 1 x H x W solar panel probabilities. The
+batch and spatial axes are dynamic, such that the size buckets of the inference share one
+exported model. The exports are stored next to the network in the model folder:
+
+    <model folder>/
+        config.json, ...                # network, see `PvSegmentationModel.save_model`
+        model.torchscript.pt            # frozen TorchScript module
+        model.onnx                      # ONNX graph, run by ONNX Runtime
+"""
+
+from enum import StrEnum
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from segmentation_model.inference import SegmentationPredictor
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+TORCHSCRIPT_FILENAME = "model.torchscript.pt"
+ONNX_FILENAME = "model.onnx"
+
+# shape of the example input used for tracing, the exports accept other shapes as well
+SAMPLE_SHAPE = (1, 3, 256, 256)
+
+
+class InferenceBackend(StrEnum):
+    EAGER = "eager"
+    TORCHSCRIPT = "torchscript"
+    ONNX = "onnx"
+
+
+def export_torchscript(predictor: SegmentationPredictor, file_path: str | Path) -> Path:
+    """Trace and freeze a predictor (batch norms are folded into the convolutions).
+
+    Args:
+        predictor (SegmentationPredictor): predictor to export
+        file_path (str | Path): output file
+
+    Returns:
+        Path: written file
+    """
+    predictor = predictor.cpu().eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(predictor, torch.rand(SAMPLE_SHAPE))
+        frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, str(file_path))
+    logger.info(f"Exported TorchScript module to {file_path}")
+    return Path(file_path)
+
+
+def export_onnx(
+    predictor: SegmentationPredictor, file_path: str | Path, opset_version: int = 17
+) -> Path:
+    """Export a predictor as ONNX graph with dynamic batch, height and width axes.
+
+    Args:
+        predictor (SegmentationPredictor): predictor to export
+        file_path (str | Path): output file
+        opset_version (int, optional): ONNX opset. Defaults to 17.
+
+    Returns:
+        Path: written file
+    """
+    predictor = predictor.cpu().eval()
+    dynamic_axes = {0: "batch", 2: "height", 3: "width"}
+    with torch.no_grad():
+        torch.onnx.export(
+            predictor,
+            (torch.rand(SAMPLE_SHAPE),),
+            str(file_path),
+            input_names=["image"],
+            output_names=["probability"],
+            dynamic_axes={"image": dynamic_axes, "probability": dynamic_axes},
+            opset_version=opset_version,
+            dynamo=False,
+        )
+    logger.info(f"Exported ONNX graph to {file_path}")
+    return Path(file_path)
+
+
+class OnnxPredictor:
+    def __init__(self, file_path: str | Path, num_threads: int | None = None):
+        """Predictor running an exported ONNX graph with ONNX Runtime on the CPU.
+
+        Args:
+            file_path (str | Path): ONNX graph, see `export_onnx`
+            num_threads (int | None, optional): intra-op threads. Defaults to the choice
+                of ONNX Runtime (physical cores).
+        """
+        # ONNX Runtime is only needed for this backend
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            str(file_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, image: torch.Tensor) -> torch.Tensor:
+        """Predict solar panel probabilities, see `SegmentationPredictor.forward`."""
+        (probability,) = self.session.run(None, {"image": np.ascontiguousarray(image.numpy())})
+        return torch.from_numpy(probability)
+
+
+def load_predictor(
+    model_folder: str | Path,
+    backend: InferenceBackend = InferenceBackend.EAGER,
+    *,
+    num_threads: int | None = None,
+) -> SegmentationPredictor | torch.jit.ScriptModule | OnnxPredictor:
+    """Load the predictor of a model folder for the given backend.
+
+    Args:
+        model_folder (str | Path): model stored with `PvSegmentationModel.save_model`
+        backend (InferenceBackend, optional): inference backend, the TorchScript and ONNX
+            backends require the exports (see `export_model`). Defaults to eager PyTorch.
+        num_threads (int | None, optional): intra-op threads (ONNX backend only).
+            Defaults to None.
+
+    Raises:
+        FileNotFoundError: in case the export of the backend does not exist
+
+    Returns:
+        SegmentationPredictor | torch.jit.ScriptModule | OnnxPredictor: callable mapping
+            images to probabilities
+    """
+    model_folder = Path(model_folder)
+
+    if backend == InferenceBackend.EAGER:
+        return SegmentationPredictor.from_pretrained(model_folder)
+
+    file_name = TORCHSCRIPT_FILENAME if backend == InferenceBackend.TORCHSCRIPT else ONNX_FILENAME
+    file_path = model_folder / file_name
+    if not file_path.exists():
+        raise FileNotFoundError(
+            f"No {backend} export found in {model_folder}, run `export-segmentation-model`"
+        )
+
+    if backend == InferenceBackend.TORCHSCRIPT:
+        return torch.jit.load(str(file_path), map_location="cpu")
+    return OnnxPredictor(file_path, num_threads=num_threads)
+
+
+def export_model(model_folder: str | Path) -> list[Path]:
+    """Export the network of a model folder as TorchScript module and ONNX graph into
+    the same folder.
+
+    Args:
+        model_folder (str | Path): model stored with `PvSegmentationModel.save_model`
+
+    Returns:
+        list[Path]: written files
+    """
+    model_folder = Path(model_folder)
+    predictor = SegmentationPredictor.from_pretrained(model_folder)
+    return [
+        export_torchscript(predictor, model_folder / TORCHSCRIPT_FILENAME),
+        export_onnx(predictor, model_folder / ONNX_FILENAME),
+    ]
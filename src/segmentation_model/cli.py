@@ -0,0 +1,93 @@
+import click
+
+from segmentation_model.backends import InferenceBackend, export_model, load_predictor
+from segmentation_model.inference import INPUT_SIZE, default_num_threads, segment_crops
+from utils.logging import get_client_logger
+
+logger = get_client_logger()
+
+
+@click.command()
+@click.argument("crops_folder", type=click.Path(exists=True, dir_okay=True, file_okay=False))
+@click.argument("model_folder", type=click.Path(exists=True, dir_okay=True, file_okay=False))
+@click.argument("output_folder", type=click.Path())
+@click.option("-b", "--batch-size", default=16, show_default=True, help="Crops per batch.")
+@click.option(
+    "-w",
+    "--num-workers",
+    default=2,
+    show_default=True,
+    help="Data loader worker processes reading the crops.",
+)
+@click.option(
+    "--num-threads",
+    default=None,
+    type=click.INT,
+    help="Intra-op threads of the model. Defaults to the cores not used by the workers.",
+)
+@click.option(
+    "--input-size",
+    default=INPUT_SIZE,
+    show_default=True,
+    help="Edge length of the model input, the longer side of the crops is resized to it.",
+)
+@click.option(
+    "--backend",
+    default=InferenceBackend.EAGER.value,
+    type=click.Choice([b.value for b in InferenceBackend]),
+    show_default=True,
+    help="Eager PyTorch or an export of the model, see `export-segmentation-model`.",
+)
+def segment_buildings_cli(
+    crops_folder: str,
+    model_folder: str,
+    output_folder: str,
+    batch_size: int,
+    num_workers: int,
+    num_threads: int | None,
+    input_size: int,
+    backend: str,
+):
+    """Segment solar panels in the crops of the crop store in CROPS_FOLDER with the model
+    in MODEL_FOLDER and write the masks into OUTPUT_FOLDER.
+
+    Args:
+        crops_folder (str): crop store folder, output of `image-cropper`
+        model_folder (str): model stored by the training (`stored_model`)
+        output_folder (str): output folder for `<crop_id>.bmp` masks, the input of
+            `energy-extractor`
+        batch_size (int): maximum number of crops per batch
+        num_workers (int): data loader worker processes
+        num_threads (int | None): intra-op threads of the model
+        input_size (int): edge length of the model input, the training input size
+        backend (str): inference backend
+    """
+    num_threads = num_threads or default_num_threads(num_workers)
+    predictor = load_predictor(model_folder, InferenceBackend(backend), num_threads=num_threads)
+    segment_crops(
+        predictor,
+        crops_folder,
+        output_folder,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        num_threads=num_threads,
+        input_size=input_size,
+    )
+    logger.info("Segmentation complete!")
+
+
+@click.command()
+@click.argument("model_folder", type=click.Path(exists=True, dir_okay=True, file_okay=False))
+def export_segmentation_model_cli(model_folder: str):
+    """Export the model in MODEL_FOLDER as TorchScript module and ONNX graph into the same
+    folder, for the `--backend` option of `segment-buildings`.
+
+    Args:
+        model_folder (str): model stored by the training (`stored_model`)
+    """
+    export_model(model_folder)
+    logger.info("Export complete!")
+
+
+if __name__ == "__main__":
+    segment_buildings_cli()
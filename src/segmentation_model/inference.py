@@ -0,0 +1,298 @@
+"""
+Batched CPU inference of the segmentation model on the crops of a crop store.
+
+The crops differ in size (they follow the size of the buildings). As during training (see
+`segmentation_model.dataset`), each crop is resized to the training input size, keeping
+its aspect ratio: the longer side is scaled to `input_size`. The model expects inputs whose
+height and width are multiples of 32, so the shorter side is padded to the next multiple
+of 32 and crops of equal padded shape are batched together (size buckets). Square crops are
+fed exactly as the training images.
+
+The masks are written as `<crop_id>.bmp` (grayscale, 0..255 probability of a solar panel)
+in the size of the crop, as read by the energy extractor.
+"""
+
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import segmentation_models_pytorch as smp
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+from utils.crop_store import CropStore
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+# encoder and decoder are connected by skip connections over 5 downsampling stages
+SIZE_MULTIPLE = 32
+
+# edge length of the training images, see `PvSegmentationDataset`
+INPUT_SIZE = 256
+
+
+@dataclass
+class InferenceStats:
+    images: int = 0
+    batches: int = 0
+    buckets: int = 0
+    seconds: float = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.seconds if self.seconds > 0 else 0.0
+
+
+def input_shape(height: int, width: int, input_size: int = INPUT_SIZE) -> tuple[int, int]:
+    """Shape of a crop fed into the model, the longer side is scaled to `input_size`
+    (keeping the aspect ratio).
+
+    Args:
+        height (int): crop height
+        width (int): crop width
+        input_size (int, optional): edge length of the model input. Defaults to the
+            training input size.
+
+    Returns:
+        tuple[int, int]: height and width
+    """
+    scale = input_size / max(height, width)
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def bucket_shape(height: int, width: int) -> tuple[int, int]:
+    """Padded shape of an input, the next multiples of `SIZE_MULTIPLE`."""
+    return (
+        math.ceil(height / SIZE_MULTIPLE) * SIZE_MULTIPLE,
+        math.ceil(width / SIZE_MULTIPLE) * SIZE_MULTIPLE,
+    )
+
+
+class SizeBucketBatchSampler(Sampler[list[int]]):
+    def __init__(self, buckets: list[tuple[int, int]], batch_size: int):
+        """Batch sampler yielding batches of samples of the same bucket.
+
+        Args:
+            buckets (list[tuple[int, int]]): bucket (padded shape) of each sample
+            batch_size (int): maximum number of samples per batch
+        """
+        self.batch_size = batch_size
+
+        self._buckets: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for i, bucket in enumerate(buckets):
+            self._buckets[bucket].append(i)
+
+    @property
+    def num_buckets(self) -> int:
+        return len(self._buckets)
+
+    def __iter__(self) -> Iterator[list[int]]:
+        for indices in self._buckets.values():
+            for start in range(0, len(indices), self.batch_size):
+                yield indices[start : start + self.batch_size]
+
+    def __len__(self) -> int:
+        return sum(math.ceil(len(indices) / self.batch_size) for indices in self._buckets.values())
+
+
+class CropInferenceDataset(Dataset):
+    def __init__(self, crop_store_folder: str | Path, input_size: int = INPUT_SIZE):
+        """Crops of a crop store (shared canvases once), as model inputs padded to their
+        bucket shape.
+
+        Args:
+            crop_store_folder (str | Path): crop store folder, output of `image-cropper`
+            input_size (int, optional): edge length of the model input, see `input_shape`.
+                Defaults to the training input size.
+        """
+        self.crop_store_folder = Path(crop_store_folder)
+        self.input_size = input_size
+
+        # the memory-mapped shards are opened in each data loader worker
+        self._crop_store: CropStore | None = None
+        self.crops = self.crop_store.index.drop_duplicates("crop_id")
+
+        self.input_shapes = [
+            input_shape(height, width, input_size)
+            for height, width in zip(self.crops["height"], self.crops["width"])
+        ]
+        self.buckets = [bucket_shape(*shape) for shape in self.input_shapes]
+
+    @property
+    def crop_store(self) -> CropStore:
+        if self._crop_store is None:
+            self._crop_store = CropStore(self.crop_store_folder)
+        return self._crop_store
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_crop_store": None}
+
+    def __len__(self) -> int:
+        return len(self.crops)
+
+    def __getitem__(self, i: int) -> tuple[torch.Tensor, int]:
+        image = self.crop_store.get_image(self.crops.index[i])[..., :3]
+
+        height, width = self.input_shapes[i]
+        if (height, width) != image.shape[:2]:
+            image = np.asarray(Image.fromarray(image).resize((width, height), Image.BILINEAR))
+
+        # replicate the border instead of zeros, which the model would see as dark roofs
+        bucket_height, bucket_width = self.buckets[i]
+        image = np.pad(
+            image, ((0, bucket_height - height), (0, bucket_width - width), (0, 0)), mode="edge"
+        )
+
+        # C x H x W in 0..1, as during training
+        return torch.from_numpy(image).permute(2, 0, 1).float().div_(255), i
+
+
+class SegmentationPredictor(torch.nn.Module):
+    def __init__(self, model: torch.nn.Module, mean: torch.Tensor, std: torch.Tensor):
+        """Segmentation network with the input normalization it was trained with,
+        predicting solar panel probabilities.
+
+        Args:
+            model (torch.nn.Module): segmentation network returning logits, e.g.
+                `PvSegmentationModel.model`
+            mean (torch.Tensor): per channel mean of the input normalization, e.g.
+                `PvSegmentationModel.mean`
+            std (torch.Tensor): per channel standard deviation of the input
+                normalization, e.g. `PvSegmentationModel.std`
+        """
+        super().__init__()
+        self.model = model
+        self.register_buffer("std", std.detach().clone().view(1, 3, 1, 1))
+        self.register_buffer("mean", mean.detach().clone().view(1, 3, 1, 1))
+
+    @classmethod
+    def from_pretrained(cls, model_path: str | Path) -> "SegmentationPredictor":
+        """Load a network stored with `PvSegmentationModel.save_model`, the input
+        normalization follows from the encoder in its stored config."""
+        params = smp.encoders.get_preprocessing_params(stored_encoder_name(model_path))
+        return cls(
+            smp.from_pretrained(str(model_path)),
+            mean=torch.tensor(params["mean"]),
+            std=torch.tensor(params["std"]),
+        )
+
+    def forward(self, image: torch.Tensor) -> torch.Tensor:
+        """Predict solar panel probabilities.
+
+        Args:
+            image (torch.Tensor): input image(s) in B x C x H x W format (0..1).
+
+        Returns:
+            torch.Tensor: B x 1 x H x W probabilities for a pixel to belong to a solar panel.
+        """
+        return self.model((image - self.mean) / self.std).sigmoid()
+
+
+def stored_encoder_name(model_path: str | Path) -> str:
+    """Encoder of a network stored with `PvSegmentationModel.save_model`.
+
+    Args:
+        model_path (str | Path): model folder
+
+    Raises:
+        ValueError: in case the stored config does not name the encoder
+
+    Returns:
+        str: encoder name, e.g. "resnet34"
+    """
+    config_path = Path(model_path) / "config.json"
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+    if "encoder_name" not in config:
+        raise ValueError(f"{config_path} does not name the encoder of the model")
+    return config["encoder_name"]
+
+
+def default_num_threads(num_workers: int) -> int:
+    """Intra-op threads of the model, the cores not occupied by the data loader workers."""
+    return max(1, (os.cpu_count() or 1) - num_workers)
+
+
+def segment_crops(
+    predictor: Callable[[torch.Tensor], torch.Tensor],
+    crop_store_folder: str | Path,
+    output_folder: str | Path,
+    *,
+    batch_size: int = 16,
+    num_workers: int = 2,
+    num_threads: int | None = None,
+    input_size: int = INPUT_SIZE,
+) -> InferenceStats:
+    """Segment the crops of a crop store on the CPU and write the masks `<crop_id>.bmp`.
+
+    Args:
+        predictor (Callable[[torch.Tensor], torch.Tensor]): segmentation model mapping
+            images to probabilities, a `SegmentationPredictor` or an exported model (see
+            `backends.load_predictor`)
+        crop_store_folder (str | Path): crop store folder, output of `image-cropper`
+        output_folder (str | Path): output folder of the masks
+        batch_size (int, optional): maximum number of crops per batch. Defaults to 16.
+        num_workers (int, optional): data loader worker processes reading and padding the
+            crops. Defaults to 2.
+        num_threads (int | None, optional): intra-op threads of the model. Defaults to the
+            cores not used by the data loader workers.
+        input_size (int, optional): edge length of the model input, see `input_shape`.
+            Defaults to the training input size.
+
+    Returns:
+        InferenceStats: number of images and batches, throughput
+    """
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    torch.set_num_threads(num_threads or default_num_threads(num_workers))
+
+    dataset = CropInferenceDataset(crop_store_folder, input_size=input_size)
+    sampler = SizeBucketBatchSampler(dataset.buckets, batch_size)
+    loader = DataLoader(dataset, batch_sampler=sampler, num_workers=num_workers)
+
+    # channels-last convolutions are faster on CPUs (oneDNN), ONNX Runtime expects NCHW
+    channels_last = isinstance(predictor, torch.nn.Module)
+    if channels_last:
+        predictor = predictor.eval().to(memory_format=torch.channels_last)
+
+    stats = InferenceStats(buckets=sampler.num_buckets)
+    logger.info(
+        f"Segmenting {len(dataset)} crops in {len(sampler)} batches ({stats.buckets} sizes) "
+        f"with {torch.get_num_threads()} threads"
+    )
+
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for images, positions in loader:
+            if channels_last:
+                images = images.contiguous(memory_format=torch.channels_last)
+            masks = predictor(images)[:, 0].mul_(255).round_().to(torch.uint8).numpy()
+
+            for mask, i in zip(masks, positions.tolist()):
+                height, width = dataset.input_shapes[i]
+                crop = dataset.crops.iloc[i]
+                mask_image = Image.fromarray(mask[:height, :width])
+                if (height, width) != (crop["height"], crop["width"]):
+                    mask_image = mask_image.resize(
+                        (int(crop["width"]), int(crop["height"])), Image.BILINEAR
+                    )
+                mask_image.save(output_folder / f"{int(crop['crop_id'])}.bmp")
+
+            stats.images += len(masks)
+            stats.batches += 1
+
+    stats.seconds = time.perf_counter() - start
+    logger.info(
+        f"Segmented {stats.images} crops in {stats.seconds:.1f}s "
+        f"({stats.images_per_second:.1f} images/s)"
+    )
+    return stats
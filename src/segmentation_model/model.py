@@ -1,10 +1,13 @@
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import lightning as pl
 import segmentation_models_pytorch as smp
 import torch
 from torch.optim import lr_scheduler
 
+if TYPE_CHECKING:
+    from segmentation_model.inference import SegmentationPredictor
+
 type StageType = Literal["train", "valid", "test"]
 
 
@@ -22,6 +25,7 @@ class PvSegmentationModel(pl.LightningModule):
         **kwargs,
     ):
         super().__init__()
+        self._encoder_name = encoder_name
         self.model = smp.UnetPlusPlus(
             encoder_name=encoder_name,
             encoder_weights="imagenet",
@@ -209,3 +213,28 @@ class PvSegmentationModel(pl.LightningModule):
         Load the model from the specified path.
         """
         self.model = smp.from_pretrained(file_path)
+
+    def predictor(self) -> "SegmentationPredictor":
+        """
+        Network with the input normalization, predicting probabilities (see `inference`).
+        """
+        from segmentation_model.inference import SegmentationPredictor
+
+        return SegmentationPredictor(self.model, mean=self.mean, std=self.std)
+
+    def export_torchscript(self, file_path: str):
+        """
+        Export the model as frozen TorchScript module (normalization and sigmoid included).
+        """
+        from segmentation_model.backends import export_torchscript
+
+        export_torchscript(self.predictor(), file_path)
+
+    def export_onnx(self, file_path: str):
+        """
+        Export the model as ONNX graph with dynamic batch and image axes (normalization and
+        sigmoid included).
+        """
+        from segmentation_model.backends import export_onnx
+
+        export_onnx(self.predictor(), file_path)
@@ -0,0 +1,130 @@
+"""
+UTM-native building artifact written by the `building-selector`.
+
+The buildings are reprojected to UTM32N (EPSG:25832) once, together with the per-building
+columns required by the later stages, which are computed in one vectorized pass:
+
+    geometry                                        # building outline in UTM32N
+    centroid_x, centroid_y                          # centroid of the outline
+    crop_min_x, crop_min_y, crop_max_x, crop_max_y  # square crop box around the building
+    aerial_tile_key, energy_tile_key                # tiles of the centroid, see
+                                                    # `encode_tile_key` (-1: no tile)
+
+The later stages read these columns instead of reprojecting and deriving them building by
+building. Older building files (WGS84, without the columns) are converted on reading.
+"""
+
+from collections.abc import Mapping
+
+import geopandas as gpd
+import numpy as np
+import pyproj
+import shapely
+
+from utils.logging import get_library_logger
+from utils.tile_management import TileManager
+from utils.transform import UTM_EPSG
+
+logger = get_library_logger(__name__)
+
+CENTROID_COLUMNS = ["centroid_x", "centroid_y"]
+CROP_BOX_COLUMNS = ["crop_min_x", "crop_min_y", "crop_max_x", "crop_max_y"]
+TILE_KEY_COLUMNS = ["aerial_tile_key", "energy_tile_key"]
+
+# columns which are only used within the pipeline
+PRECOMPUTED_COLUMNS = CENTROID_COLUMNS + CROP_BOX_COLUMNS + TILE_KEY_COLUMNS
+
+# margin in meters between the building and the edge of its crop
+DEFAULT_CROP_MARGIN = 5.0
+
+
+def tile_key_column(tile_column: str) -> str:
+    """Name of the tile key column of a tile column, e.g. `aerial_tile_key`."""
+    return f"{tile_column}_key"
+
+
+def squared_crop_boxes(
+    geometries: np.ndarray, margin_around_building: float = DEFAULT_CROP_MARGIN
+) -> np.ndarray:
+    """Square boxes around building outlines, vectorized over all buildings.
+
+    The box is centered on the envelope of the buffered outline, its edge length is the
+    larger side of that envelope.
+
+    Args:
+        geometries (np.ndarray): building outlines (UTM32N)
+        margin_around_building (float, optional): margin in meters. Defaults to 5.0.
+
+    Returns:
+        np.ndarray: boxes (min_x, min_y, max_x, max_y) of shape (n, 4)
+    """
+    # same segments per quarter circle as `BaseGeometry.buffer`
+    buffered = shapely.buffer(geometries, margin_around_building, quad_segs=16)
+    envelopes = shapely.envelope(buffered)
+
+    bounds = shapely.bounds(envelopes)
+    half_sides = np.max(bounds[:, 2:] - bounds[:, :2], axis=1) / 2
+    centers = shapely.get_coordinates(shapely.centroid(envelopes))
+
+    return np.column_stack([centers - half_sides[:, None], centers + half_sides[:, None]])
+
+
+def add_building_columns(
+    buildings: gpd.GeoDataFrame,
+    tile_managers: Mapping[str, TileManager] | None = None,
+    margin_around_building: float = DEFAULT_CROP_MARGIN,
+) -> gpd.GeoDataFrame:
+    """Reproject the buildings to UTM32N and add the precomputed columns.
+
+    Args:
+        buildings (gpd.GeoDataFrame): buildings, WGS84 in case no CRS is set
+        tile_managers (Mapping[str, TileManager] | None, optional): tile manager per tile
+            column, e.g. `{"aerial_tile": ..., "energy_tile": ...}`, a key column is
+            added per tile column. Defaults to None (no tile keys).
+        margin_around_building (float, optional): margin of the crop boxes in meters.
+            Defaults to 5.0.
+
+    Returns:
+        gpd.GeoDataFrame: buildings in UTM32N with the precomputed columns
+    """
+    if buildings.crs is None:
+        buildings = buildings.set_crs("EPSG:4326")
+    buildings = buildings.to_crs(UTM_EPSG)
+
+    geometries = buildings.geometry.values
+    centroids = shapely.get_coordinates(shapely.centroid(geometries))
+    buildings[CENTROID_COLUMNS] = centroids
+    buildings[CROP_BOX_COLUMNS] = squared_crop_boxes(geometries, margin_around_building)
+
+    for tile_column, tile_manager in (tile_managers or {}).items():
+        lookup = tile_manager.get_tile_names_for_points(centroids[:, 0], centroids[:, 1])
+        buildings[tile_key_column(tile_column)] = lookup.tile_keys
+
+    return buildings
+
+
+def read_buildings(
+    buildings_file: str, margin_around_building: float = DEFAULT_CROP_MARGIN
+) -> gpd.GeoDataFrame:
+    """Read a building file as UTM-native artifact.
+
+    Files without the precomputed columns (or not in UTM32N) are converted, see
+    `add_building_columns`.
+
+    Args:
+        buildings_file (str): building file, e.g. the `building-selector` output
+        margin_around_building (float, optional): margin of the crop boxes in meters, in
+            case they have to be computed. Defaults to 5.0.
+
+    Returns:
+        gpd.GeoDataFrame: buildings in UTM32N with the precomputed columns
+    """
+    buildings = gpd.read_file(buildings_file)
+
+    is_utm = buildings.crs is not None and buildings.crs == pyproj.CRS(UTM_EPSG)
+    has_columns = set(CENTROID_COLUMNS + CROP_BOX_COLUMNS).issubset(buildings.columns)
+    if not (is_utm and has_columns):
+        logger.info(f"Computing the building columns of {buildings_file}")
+        buildings = add_building_columns(buildings, None, margin_around_building)
+
+    return buildings
@@ -0,0 +1,66 @@
+"""
+Transcoding of raster tiles into internally tiled Cloud-Optimized GeoTIFFs (COG).
+
+Windowed reads from JPEG2000 tiles require decoding large parts of the code stream,
+a COG with a fast lossless codec and overviews serves random windows at a fraction of
+the cost. Tiles are transcoded once, directly after the download.
+"""
+
+import os
+from pathlib import Path
+
+import rasterio
+import rasterio.shutil
+
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+COG_SUFFIX = ".cog.tif"
+
+
+def transcode_to_cog(
+    src_path: str | Path,
+    dst_path: str | Path,
+    *,
+    compress: str = "ZSTD",
+    blocksize: int = 512,
+    overviews: bool = True,
+    num_threads: str = "ALL_CPUS",
+) -> Path:
+    """Transcode a raster file into a Cloud-Optimized GeoTIFF.
+
+    The COG is written into a temporary file first, which is renamed to `dst_path`
+    when complete.
+
+    Args:
+        src_path (str | Path): source raster, e.g. a DOP10 JPEG2000 tile
+        dst_path (str | Path): destination path of the COG
+        compress (str, optional): GDAL compression codec. Defaults to "ZSTD".
+        blocksize (int, optional): internal tile size in pixels. Defaults to 512.
+        overviews (bool, optional): whether to create overviews. Defaults to True.
+        num_threads (str, optional): threads for decoding/compression.
+            Defaults to "ALL_CPUS".
+
+    Returns:
+        Path: destination path
+    """
+    dst_path = Path(dst_path)
+    tmp_path = dst_path.with_name(f"{dst_path.name}.tmp")
+
+    logger.info(f"Transcoding {Path(src_path).name} to a COG")
+
+    with rasterio.Env(GDAL_NUM_THREADS=num_threads):
+        rasterio.shutil.copy(
+            str(src_path),
+            str(tmp_path),
+            driver="COG",
+            COMPRESS=compress,
+            PREDICTOR="YES",
+            BLOCKSIZE=blocksize,
+            OVERVIEWS="AUTO" if overviews else "NONE",
+            NUM_THREADS=num_threads,
+        )
+
+    os.replace(tmp_path, dst_path)
+    return dst_path
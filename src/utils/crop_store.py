@@ -0,0 +1,283 @@
+"""
+Sharded storage of building crops.
+
+Instead of one image file per building, the crops are appended as raw uint8 arrays to
+a few large shard files. A typed index (Feather) holds the location, shape and
+affine transformation (pixel to UTM32N) of each crop:
+
+    <folder>/
+        <prefix>-00000.bin      # concatenated crops (row-major, height x width x channels)
+        index.feather           # building_id, crop_id, shard, offset, height, width,
+                                # channels, transform_a, ..., transform_f
+
+A crop is usually the image of a single building (`crop_id == building_id`). Adjacent
+buildings may share a canvas, which is stored once and referenced by one index row per
+building with the same `crop_id`.
+
+Crops are read zero-copy from memory-mapped shards. Several writers (e.g. one per
+tile or worker process) write their own shards and index parts, which are merged into
+the index afterwards.
+"""
+
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import affine
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+from PIL import Image
+
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+INDEX_FILENAME = "index.feather"
+INDEX_PART_SUFFIX = ".index.feather"
+SHARD_SUFFIX = ".bin"
+
+# coefficients of `affine.Affine`, x = a * col + b * row + c, y = d * col + e * row + f
+TRANSFORM_COLUMNS = [f"transform_{c}" for c in "abcdef"]
+
+INDEX_SCHEMA = pa.schema(
+    [
+        ("building_id", pa.int64()),
+        ("crop_id", pa.int64()),
+        ("shard", pa.string()),
+        ("offset", pa.int64()),
+        ("height", pa.int32()),
+        ("width", pa.int32()),
+        ("channels", pa.int32()),
+        *[(column, pa.float64()) for column in TRANSFORM_COLUMNS],
+    ]
+)
+
+
+class CropStoreWriter:
+    def __init__(self, folder: str | Path, prefix: str, max_shard_bytes: int = 256 * 1024**2):
+        """Initialize a writer, crops are appended to shards `<prefix>-<n>.bin`.
+
+        Args:
+            folder (str | Path): crop store folder
+            prefix (str): file name prefix of the shards and the index part, must be
+                unique among the writers of a store
+            max_shard_bytes (int, optional): size after which a new shard is started.
+                Defaults to 256 MiB.
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_shard_bytes = max_shard_bytes
+
+        self._records: list[dict] = []
+        self._shard_number = -1
+        self._shard_file = None
+        self._shard_name = None
+        self._offset = 0
+
+    @property
+    def index_part_path(self) -> Path:
+        return self.folder / f"{self.prefix}{INDEX_PART_SUFFIX}"
+
+    def _close_shard(self):
+        if self._shard_file is not None:
+            self._shard_file.close()
+            self._shard_file = None
+
+    def _start_shard(self):
+        self._close_shard()
+        self._shard_number += 1
+        self._shard_name = f"{self.prefix}-{self._shard_number:05d}{SHARD_SUFFIX}"
+        self._shard_file = open(self.folder / self._shard_name, "wb")
+        self._offset = 0
+
+    def append(
+        self,
+        crop_id: int,
+        image: np.ndarray,
+        transform: affine.Affine,
+        building_ids: Sequence[int] | None = None,
+    ):
+        """Append a crop.
+
+        Args:
+            crop_id (int): crop identifier, the building identifier for single buildings
+            image (np.ndarray): uint8 image (height, width, channels)
+            transform (affine.Affine): transformation from crop pixels to UTM32N
+            building_ids (Sequence[int] | None, optional): buildings sharing the crop.
+                Defaults to `[crop_id]`.
+        """
+        building_ids = building_ids if building_ids is not None else [crop_id]
+
+        if image.dtype != np.uint8 or image.ndim != 3:
+            raise ValueError("Crops must be uint8 arrays of shape (height, width, channels)")
+
+        is_full = self._offset > 0 and self._offset + image.nbytes > self.max_shard_bytes
+        if self._shard_file is None or is_full:
+            self._start_shard()
+
+        self._shard_file.write(np.ascontiguousarray(image).tobytes())
+
+        height, width, channels = image.shape
+        for building_id in building_ids:
+            self._records.append(
+                {
+                    "building_id": int(building_id),
+                    "crop_id": int(crop_id),
+                    "shard": self._shard_name,
+                    "offset": self._offset,
+                    "height": height,
+                    "width": width,
+                    "channels": channels,
+                    **dict(zip(TRANSFORM_COLUMNS, tuple(transform)[:6])),
+                }
+            )
+        self._offset += image.nbytes
+
+    def close(self) -> Path:
+        """Close the current shard and write the index part of this writer.
+
+        Returns:
+            Path: index part
+        """
+        self._close_shard()
+
+        table = pa.Table.from_pylist(self._records, schema=INDEX_SCHEMA)
+        feather.write_feather(table, self.index_part_path, compression="uncompressed")
+        return self.index_part_path
+
+    def __enter__(self) -> "CropStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # an incomplete index part must not be merged into the store
+        if exc_type is not None:
+            self._close_shard()
+            return
+        self.close()
+
+
+def merge_index_parts(folder: str | Path, index_part_paths: Iterable[Path]) -> Path:
+    """Concatenate index parts (in the given order) into the index of a store, the parts
+    are deleted afterwards.
+
+    Args:
+        folder (str | Path): crop store folder
+        index_part_paths (Iterable[Path]): index parts, see `CropStoreWriter.close`
+
+    Returns:
+        Path: index file
+    """
+    folder = Path(folder)
+    index_part_paths = list(index_part_paths)
+
+    tables = [feather.read_table(path) for path in index_part_paths]
+    table = pa.concat_tables(tables) if tables else INDEX_SCHEMA.empty_table()
+
+    index_path = folder / INDEX_FILENAME
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp")
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    tmp_path.replace(index_path)
+
+    for path in index_part_paths:
+        path.unlink()
+
+    return index_path
+
+
+class CropStore:
+    def __init__(self, folder: str | Path):
+        """Open a crop store for reading.
+
+        Args:
+            folder (str | Path): crop store folder
+
+        Raises:
+            FileNotFoundError: in case the folder does not contain an index
+        """
+        self.folder = Path(folder)
+
+        index_path = self.folder / INDEX_FILENAME
+        if not index_path.exists():
+            raise FileNotFoundError(f"No crop store index found in {self.folder}")
+
+        table = feather.read_table(index_path, memory_map=True)
+        self.index = table.to_pandas().set_index("building_id")
+
+        # stores written before shared canvases hold one crop per building
+        if "crop_id" not in self.index:
+            self.index.insert(0, "crop_id", self.index.index.to_numpy())
+
+        self._shards: dict[str, np.memmap] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, building_id: int) -> bool:
+        return building_id in self.index.index
+
+    @property
+    def building_ids(self) -> np.ndarray:
+        return self.index.index.to_numpy()
+
+    @property
+    def crop_ids(self) -> np.ndarray:
+        """Unique crop identifiers, in the order of the index."""
+        return self.index["crop_id"].unique()
+
+    def _shard(self, shard_name: str) -> np.memmap:
+        if shard_name not in self._shards:
+            self._shards[shard_name] = np.memmap(
+                self.folder / shard_name, dtype=np.uint8, mode="r"
+            )
+        return self._shards[shard_name]
+
+    def get_image(self, building_id: int) -> np.ndarray:
+        """Get the crop of a building (possibly shared with adjacent buildings), a
+        read-only view into the memory-mapped shard.
+
+        Args:
+            building_id (int): building identifier
+
+        Returns:
+            np.ndarray: uint8 image (height, width, channels)
+        """
+        record = self.index.loc[building_id]
+        shape = (int(record["height"]), int(record["width"]), int(record["channels"]))
+        offset = int(record["offset"])
+        return self._shard(record["shard"])[offset : offset + int(np.prod(shape))].reshape(shape)
+
+    def get_transform(self, building_id: int) -> affine.Affine:
+        """Get the transformation from the crop pixels of a building to UTM32N."""
+        return affine.Affine(*self.index.loc[building_id, TRANSFORM_COLUMNS].to_numpy(float))
+
+    def export_png(
+        self, output_folder: str | Path, building_ids: Iterable[int] | None = None
+    ) -> list[Path]:
+        """Write crops as PNG files `<crop_id>.png`, e.g. as input of the segmentation.
+        Shared canvases are written once.
+
+        Args:
+            output_folder (str | Path): output folder
+            building_ids (Iterable[int] | None, optional): buildings whose crops are
+                exported. Defaults to all crops.
+
+        Returns:
+            list[Path]: written files
+        """
+        output_folder = Path(output_folder)
+        output_folder.mkdir(parents=True, exist_ok=True)
+
+        if building_ids is None:
+            crops = self.index.drop_duplicates("crop_id")
+        else:
+            crops = self.index.loc[list(building_ids)].drop_duplicates("crop_id")
+
+        paths = []
+        for building_id, crop_id in zip(crops.index, crops["crop_id"]):
+            path = output_folder / f"{crop_id}.png"
+            Image.fromarray(self.get_image(building_id)).save(path)
+            paths.append(path)
+
+        logger.info(f"Exported {len(paths)} crops to {output_folder}")
+        return paths
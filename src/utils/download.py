@@ -0,0 +1,186 @@
+"""
+Concurrent, resumable download of (large) files.
+
+Files are downloaded into a `<name>.part` file next to the destination, an interrupted
+download is resumed with an HTTP Range request. Only completely downloaded files, whose
+size matches the expected size, are renamed to the destination path.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import requests
+
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+PARTIAL_SUFFIX = ".part"
+
+
+@dataclass
+class DownloadJob:
+    url: str
+    destination: Path
+    expected_size: int | None = None
+
+
+class TileDownloader:
+    def __init__(
+        self,
+        max_workers: int = 4,
+        *,
+        chunk_size: int = 1024 * 1024,
+        max_retries: int = 3,
+        timeout: float = 60.0,
+    ):
+        """Initialize the downloader
+
+        Args:
+            max_workers (int, optional): number of parallel downloads. Defaults to 4.
+            chunk_size (int, optional): bytes written per chunk. Defaults to 1 MiB.
+            max_retries (int, optional): attempts per file, an attempt resumes the
+                previous one. Defaults to 3.
+            timeout (float, optional): connect/read timeout in seconds. Defaults to 60.
+        """
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        # sessions are not thread-safe, every worker thread gets its own
+        self._local = threading.local()
+
+    @property
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def download(
+        self, url: str, destination: str | Path, expected_size: int | None = None
+    ) -> Path:
+        """Download a single file, resume a previous partial download if available.
+
+        Args:
+            url (str): file URL
+            destination (str | Path): local file path
+            expected_size (int | None, optional): expected file size in bytes, e.g.
+                from `parse_download_links`. Defaults to None (use the size reported
+                by the server).
+
+        Raises:
+            IOError: in case the file could not be downloaded completely
+
+        Returns:
+            Path: destination path
+        """
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = destination.with_name(destination.name + PARTIAL_SUFFIX)
+
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._download_to_partial(url, partial_path, expected_size)
+                break
+            except (OSError, requests.RequestException) as e:
+                last_error = e
+                logger.warning(f"Download of {url} failed (attempt {attempt}): {e}")
+        else:
+            raise OSError(f"Download of {url} failed: {last_error}") from last_error
+
+        os.replace(partial_path, destination)
+        return destination
+
+    def _download_to_partial(self, url: str, partial_path: Path, expected_size: int | None):
+        offset = partial_path.stat().st_size if partial_path.exists() else 0
+
+        if expected_size is not None and offset > expected_size:
+            # corrupt partial download, start from scratch
+            offset = 0
+            partial_path.unlink()
+
+        if expected_size is not None and offset == expected_size:
+            return
+
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+        with self._session.get(url, stream=True, headers=headers, timeout=self.timeout) as r:
+            if r.status_code == 416:
+                # the requested range starts behind the end of the file
+                total_size = _parse_total_size(r.headers.get("Content-Range"))
+                if total_size is not None and total_size == offset:
+                    _verify_size(partial_path, expected_size)
+                    return
+                partial_path.unlink()
+                raise OSError(f"Invalid partial download of {url}, restarting")
+
+            r.raise_for_status()
+
+            if r.status_code == 206:
+                mode = "ab"
+                total_size = _parse_total_size(r.headers.get("Content-Range"))
+            else:
+                # server ignored the range header, the complete file is sent
+                mode = "wb"
+                offset = 0
+                content_length = r.headers.get("Content-Length")
+                total_size = int(content_length) if content_length is not None else None
+
+            with open(partial_path, mode) as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+
+        _verify_size(partial_path, expected_size if expected_size is not None else total_size)
+
+    def download_many(self, jobs: list[DownloadJob]) -> list[Path]:
+        """Download several files concurrently.
+
+        Args:
+            jobs (list[DownloadJob]): files to download
+
+        Raises:
+            IOError: in case at least one download failed, after all others finished
+
+        Returns:
+            list[Path]: destination paths, in the order of `jobs`
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.download, job.url, job.destination, job.expected_size)
+                for job in jobs
+            ]
+
+        failed = []
+        for job, future in zip(jobs, futures):
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Download of {job.url} failed: {error}")
+                failed.append(job.url)
+
+        if failed:
+            raise OSError(f"{len(failed)} of {len(jobs)} downloads failed: {failed}")
+
+        return [future.result() for future in futures]
+
+
+def _parse_total_size(content_range: str | None) -> int | None:
+    # e.g. "bytes 100-199/200" or "bytes */200"
+    if content_range is None or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def _verify_size(path: Path, expected_size: int | None):
+    if expected_size is None:
+        return
+
+    size = path.stat().st_size
+    if size != expected_size:
+        if size > expected_size:
+            path.unlink()
+        raise OSError(f"Size of {path} is {size} bytes, expected {expected_size} bytes")
@@ -0,0 +1,143 @@
+"""
+Virtual mosaics of neighbouring tiles.
+
+Crop windows of buildings close to a tile edge extend into the neighbouring tiles. The
+tiles are combined into a GDAL VRT (an XML document referencing the tile files, no
+pixel data is copied), which is read like a single raster. Since the tiles of a
+dataset share a pixel grid, a window read from the mosaic is identical to a window
+read from one large raster.
+"""
+
+from collections.abc import Iterator, Sequence
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import rasterio.dtypes
+from rasterio.io import DatasetReader, MemoryFile
+
+from utils.remote_tiles import is_remote_path, open_raster
+
+# maximum deviation (in pixels) of a tile from the common pixel grid
+_GRID_TOLERANCE = 1e-6
+
+
+def _gdal_typename(dtype: str) -> str:
+    return rasterio.dtypes.typename_fwd[rasterio.dtypes.dtype_rev[dtype]]
+
+
+def _grid_offset(offset_px: float, name: str) -> int:
+    rounded = round(offset_px)
+    if abs(offset_px - rounded) > _GRID_TOLERANCE:
+        raise ValueError(f"Tile {name} is not aligned to the pixel grid of the mosaic")
+    return int(rounded)
+
+
+def _resolve(paths: Sequence[str | Path]) -> list[Path]:
+    if len(paths) == 0:
+        raise ValueError("At least one tile is required for a mosaic")
+    # remote paths are GDAL paths, not files
+    return [Path(path) if is_remote_path(path) else Path(path).resolve() for path in paths]
+
+
+def build_mosaic_vrt(paths: Sequence[str | Path]) -> str:
+    """Create a VRT document which mosaics tiles sharing a pixel grid.
+
+    Args:
+        paths (Sequence[str | Path]): tile files with the same CRS, resolution, number of
+            bands and data types
+
+    Raises:
+        ValueError: in case the tiles cannot be combined
+
+    Returns:
+        str: VRT XML document
+    """
+    with ExitStack() as stack:
+        return _mosaic_vrt([stack.enter_context(open_raster(path)) for path in _resolve(paths)])
+
+
+def _mosaic_vrt(datasets: Sequence[DatasetReader]) -> str:
+    # the sources are referenced by the names GDAL opened them with
+    paths = [Path(dataset.name) for dataset in datasets]
+    source_names = [dataset.name for dataset in datasets]
+
+    profiles = []
+    for dataset in datasets:
+        profiles.append(
+            {
+                "bounds": dataset.bounds,
+                "res": dataset.res,
+                "crs": dataset.crs,
+                "width": dataset.width,
+                "height": dataset.height,
+                "dtypes": dataset.dtypes,
+                "nodata": dataset.nodata,
+            }
+        )
+
+    reference = profiles[0]
+    for path, profile in zip(paths, profiles):
+        for key in ("res", "crs", "dtypes"):
+            if profile[key] != reference[key]:
+                raise ValueError(f"Tile {path.name} differs in {key} from {paths[0].name}")
+
+    res_x, res_y = reference["res"]
+    left = min(profile["bounds"].left for profile in profiles)
+    top = max(profile["bounds"].top for profile in profiles)
+    right = max(profile["bounds"].right for profile in profiles)
+    bottom = min(profile["bounds"].bottom for profile in profiles)
+
+    width = _grid_offset((right - left) / res_x, paths[0].name)
+    height = _grid_offset((top - bottom) / res_y, paths[0].name)
+
+    bands = []
+    for band_index, dtype in enumerate(reference["dtypes"], start=1):
+        sources = []
+        for path, source_name, profile in zip(paths, source_names, profiles):
+            col_off = _grid_offset((profile["bounds"].left - left) / res_x, path.name)
+            row_off = _grid_offset((top - profile["bounds"].top) / res_y, path.name)
+            sources.append(
+                "<SimpleSource>"
+                f'<SourceFilename relativeToVRT="0">{escape(source_name)}</SourceFilename>'
+                f"<SourceBand>{band_index}</SourceBand>"
+                f'<SrcRect xOff="0" yOff="0" xSize="{profile["width"]}" '
+                f'ySize="{profile["height"]}"/>'
+                f'<DstRect xOff="{col_off}" yOff="{row_off}" xSize="{profile["width"]}" '
+                f'ySize="{profile["height"]}"/>'
+                "</SimpleSource>"
+            )
+
+        nodata = reference["nodata"]
+        nodata_element = f"<NoDataValue>{nodata!r}</NoDataValue>" if nodata is not None else ""
+        bands.append(
+            f'<VRTRasterBand dataType="{_gdal_typename(dtype)}" band="{band_index}">'
+            f"{nodata_element}{''.join(sources)}</VRTRasterBand>"
+        )
+
+    return (
+        f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">'
+        f"<SRS>{escape(reference['crs'].to_wkt())}</SRS>"
+        f"<GeoTransform>{left!r}, {res_x!r}, 0.0, {top!r}, 0.0, {-res_y!r}</GeoTransform>"
+        f"{''.join(bands)}</VRTDataset>"
+    )
+
+
+@contextmanager
+def open_mosaic(paths: Sequence[str | Path]) -> Iterator[DatasetReader]:
+    """Open a virtual mosaic of tiles, see `build_mosaic_vrt`.
+
+    Args:
+        paths (Sequence[str | Path]): tile files
+
+    Yields:
+        DatasetReader: mosaic dataset
+    """
+    with ExitStack() as stack:
+        # the tiles are kept open while the mosaic is read, remote tiles read through the
+        # disk cache are only accessible to GDAL while they are open
+        datasets = [stack.enter_context(open_raster(path)) for path in _resolve(paths)]
+        memory_file = stack.enter_context(
+            MemoryFile(_mosaic_vrt(datasets).encode("utf-8"), ext=".vrt")
+        )
+        yield stack.enter_context(memory_file.open())
@@ -0,0 +1,233 @@
+"""
+Staged producer/consumer pipeline with bounded queues.
+
+Per-item work like "read a raster window, compute on it, write the result" keeps either
+the disk or the CPU idle when done serially. A `Pipeline` runs each stage in its own
+thread pool, connected by bounded queues, such that reading, computing and writing of
+different items overlap. GDAL, NumPy and PIL release the GIL for the heavy lifting.
+
+The number of items in flight is capped, which caps the memory of the pipeline. Results
+are yielded in the order of the input items.
+"""
+
+import heapq
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+# interval in seconds in which blocked threads check for cancellation
+_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Stage:
+    """Step of a pipeline.
+
+    Attributes:
+        function: applied to each item, its result is passed to the next stage
+        workers: number of threads of the stage
+        ordered: process the items in input order, e.g. for writing into a file, which
+            requires a single worker
+        name: name of the stage, used for thread names and statistics
+    """
+
+    function: Callable[[Any], Any]
+    workers: int = 1
+    ordered: bool = False
+    name: str = "stage"
+
+    def __post_init__(self):
+        if self.workers < 1:
+            raise ValueError(f"Stage {self.name} requires at least one worker")
+        if self.ordered and self.workers != 1:
+            raise ValueError(f"Ordered stage {self.name} requires a single worker")
+
+
+@dataclass
+class PipelineStats:
+    """Busy time in seconds per stage (summed over its workers) and the number of items."""
+
+    busy_seconds: dict[str, float] = field(default_factory=dict)
+    items: int = 0
+
+
+class _Cancelled(Exception):
+    pass
+
+
+_DONE = object()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        queue_size: int = 4,
+        max_in_flight: int | None = None,
+    ):
+        """Initialize a pipeline.
+
+        Args:
+            stages (Sequence[Stage]): stages, e.g. reading, computing and writing
+            queue_size (int, optional): capacity of the queues between the stages.
+                Defaults to 4.
+            max_in_flight (int | None, optional): maximum number of items between input
+                and output. Defaults to the capacity of all queues and workers.
+        """
+        if len(stages) == 0:
+            raise ValueError("A pipeline requires at least one stage")
+
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.max_in_flight = (
+            max_in_flight
+            if max_in_flight is not None
+            else queue_size * (len(self.stages) + 1) + sum(s.workers for s in self.stages)
+        )
+        self.stats = PipelineStats(busy_seconds={stage.name: 0.0 for stage in self.stages})
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Pass the items through the stages.
+
+        Exceptions raised within a stage cancel the pipeline and are re-raised here.
+
+        Args:
+            items (Iterable[Any]): input items, consumed lazily
+
+        Yields:
+            Any: result of the last stage per item, in input order
+        """
+        cancelled = threading.Event()
+        errors: list[BaseException] = []
+        in_flight = threading.Semaphore(self.max_in_flight)
+        stats_lock = threading.Lock()
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        def put(q: queue.Queue, entry):
+            while True:
+                if cancelled.is_set():
+                    raise _Cancelled()
+                try:
+                    q.put(entry, timeout=_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    pass
+
+        def get(q: queue.Queue):
+            while True:
+                if cancelled.is_set():
+                    raise _Cancelled()
+                try:
+                    return q.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    pass
+
+        def fail(error: BaseException):
+            if not cancelled.is_set():
+                errors.append(error)
+            cancelled.set()
+
+        def feed():
+            try:
+                for sequence_number, item in enumerate(items):
+                    while not in_flight.acquire(timeout=_POLL_INTERVAL):
+                        if cancelled.is_set():
+                            raise _Cancelled()
+                    put(queues[0], (sequence_number, item))
+                for _ in range(self.stages[0].workers):
+                    put(queues[0], _DONE)
+            except _Cancelled:
+                pass
+            except BaseException as e:
+                fail(e)
+
+        def work(i: int, stage: Stage, remaining: list[int], lock: threading.Lock):
+            # in ordered stages, early items wait in a heap for their predecessors
+            pending: list[tuple[int, Any]] = []
+            next_sequence_number = 0
+            num_successors = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+
+            def process(sequence_number: int, item: Any):
+                start = time.perf_counter()
+                result = stage.function(item)
+                with stats_lock:
+                    self.stats.busy_seconds[stage.name] += time.perf_counter() - start
+                put(queues[i + 1], (sequence_number, result))
+
+            try:
+                while True:
+                    entry = get(queues[i])
+                    if entry is _DONE:
+                        break
+
+                    if not stage.ordered:
+                        process(*entry)
+                        continue
+
+                    heapq.heappush(pending, entry)
+                    while pending and pending[0][0] == next_sequence_number:
+                        process(*heapq.heappop(pending))
+                        next_sequence_number += 1
+
+                # the last worker of a stage signals the end to the next stage
+                with lock:
+                    remaining[0] -= 1
+                    is_last = remaining[0] == 0
+                if is_last:
+                    for _ in range(num_successors):
+                        put(queues[i + 1], _DONE)
+            except _Cancelled:
+                pass
+            except BaseException as e:
+                fail(e)
+
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining, lock = [stage.workers], threading.Lock()
+            for w in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=work,
+                        args=(i, stage, remaining, lock),
+                        name=f"pipeline-{stage.name}-{w}",
+                        daemon=True,
+                    )
+                )
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            pending: list[tuple[int, Any]] = []
+            next_sequence_number = 0
+            while True:
+                try:
+                    entry = get(queues[-1])
+                except _Cancelled:
+                    break
+                if entry is _DONE:
+                    break
+
+                heapq.heappush(pending, entry)
+                while pending and pending[0][0] == next_sequence_number:
+                    _, result = heapq.heappop(pending)
+                    next_sequence_number += 1
+                    self.stats.items += 1
+                    in_flight.release()
+                    yield result
+        finally:
+            # stop the threads in case the consumer stopped early or a stage failed
+            cancelled.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
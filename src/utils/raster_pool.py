@@ -0,0 +1,133 @@
+"""
+Size-bounded pool of open raster dataset handles.
+
+Opening a tile re-parses its headers and starts with an empty GDAL block cache, so
+handles are kept open and shared between the processing stages. A dataset handle must
+not be used by several threads at the same time, hence handles are kept per thread.
+"""
+
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from rasterio.io import DatasetReader
+
+from utils.logging import get_library_logger
+from utils.remote_tiles import open_raster
+
+logger = get_library_logger(__name__)
+
+
+@dataclass
+class RasterPoolStats:
+    opens: int = 0
+    hits: int = 0
+    closes: int = 0
+
+
+class RasterDatasetPool:
+    def __init__(self, max_open: int = 16):
+        """Initialize an empty pool.
+
+        Args:
+            max_open (int, optional): maximum number of open handles, least recently used
+                handles which are not in use are closed. Defaults to 16.
+        """
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1")
+
+        self.max_open = max_open
+        self.stats = RasterPoolStats()
+
+        self._lock = threading.Lock()
+
+        # (file path, thread id) -> handle, least recently used first
+        self._handles: OrderedDict[tuple[Path, int], DatasetReader] = OrderedDict()
+        self._in_use = Counter()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._handles)
+
+    @contextmanager
+    def open(self, path: str | Path) -> Iterator[DatasetReader]:
+        """Borrow an open (read-only) handle of a raster file for the calling thread.
+
+        Args:
+            path (str | Path): raster file
+
+        Yields:
+            DatasetReader: open dataset, must not be closed by the caller
+        """
+        key = (Path(path).resolve(), threading.get_ident())
+
+        with self._lock:
+            dataset = self._handles.get(key)
+            if dataset is not None:
+                self.stats.hits += 1
+                self._handles.move_to_end(key)
+            self._in_use[key] += 1
+
+        if dataset is None:
+            try:
+                dataset = open_raster(key[0])
+            except Exception:
+                with self._lock:
+                    self._release(key)
+                raise
+
+            with self._lock:
+                self.stats.opens += 1
+                self._handles[key] = dataset
+                self._close_unused()
+
+        try:
+            yield dataset
+        finally:
+            with self._lock:
+                self._release(key)
+                self._close_unused()
+
+    def invalidate(self, path: str | Path):
+        """Close all unused handles of a file, e.g. after it was deleted or replaced."""
+        path = Path(path).resolve()
+        with self._lock:
+            for key in [key for key in self._handles if key[0] == path]:
+                if self._in_use[key] == 0:
+                    self._close(key)
+
+    def close(self):
+        """Close all unused handles."""
+        with self._lock:
+            for key in [key for key in self._handles if self._in_use[key] == 0]:
+                self._close(key)
+
+    def _release(self, key: tuple[Path, int]):
+        self._in_use[key] -= 1
+        if self._in_use[key] <= 0:
+            del self._in_use[key]
+
+    def _close_unused(self):
+        excess = len(self._handles) - self.max_open
+        for key in list(self._handles):
+            if excess <= 0:
+                break
+            if self._in_use[key] > 0:
+                continue
+            self._close(key)
+            excess -= 1
+
+    def _close(self, key: tuple[Path, int]):
+        self._handles.pop(key).close()
+        self.stats.closes += 1
+
+
+_default_pool = RasterDatasetPool()
+
+
+def get_default_pool() -> RasterDatasetPool:
+    """Pool shared by the processing stages of this process."""
+    return _default_pool
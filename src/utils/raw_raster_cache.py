@@ -0,0 +1,260 @@
+"""
+Cache of single band rasters as uncompressed, memory-mapped arrays.
+
+The energy yield tiles are static, compressed GeoTIFFs, each window read decompresses
+the blocks it touches again. The cache decompresses a tile once into a raw float32 file
+(no data values replaced by 0) with a JSON sidecar holding the georeferencing. Reads
+from the cached tile slice the memory-mapped array, there is neither decoding nor
+copying, and the pages are shared by all threads and processes reading the tile.
+
+Cached tiles are keyed by the file name and size of the source tile.
+"""
+
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import affine
+import numpy as np
+import rasterio
+from rasterio.coords import BoundingBox
+from rasterio.transform import array_bounds
+from rasterio.windows import Window
+from rasterio.windows import transform as window_transform
+
+from utils.logging import get_library_logger
+from utils.remote_tiles import is_remote_path
+
+logger = get_library_logger(__name__)
+
+# increment when the layout of the cached files changes, older files are converted again
+RAW_FORMAT_VERSION = 1
+
+# rows decompressed at once while converting a tile
+_CONVERSION_ROWS = 1024
+
+
+@dataclass
+class RawCacheStats:
+    hits: int = 0
+    conversions: int = 0
+    converted_bytes: int = 0
+
+
+class RawRaster:
+    def __init__(self, data: np.ndarray, transform: affine.Affine, crs: str | None = None):
+        """Read-only raster backed by an array, with the reading interface of a
+        `rasterio.io.DatasetReader` used by the energy extractor.
+
+        Args:
+            data (np.ndarray): raster data (height, width), typically memory-mapped
+            transform (affine.Affine): transformation of the raster
+            crs (str | None, optional): coordinate reference system. Defaults to None.
+        """
+        self.data = data
+        self.transform = transform
+        self.crs = crs
+
+    @property
+    def width(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def indexes(self) -> tuple[int]:
+        return (1,)
+
+    @property
+    def dtypes(self) -> tuple[str]:
+        return (self.data.dtype.name,)
+
+    @property
+    def nodata(self) -> None:
+        # no data values were replaced by 0
+        return None
+
+    @property
+    def profile(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "count": 1,
+            "dtype": self.dtypes[0],
+            "transform": self.transform,
+            "crs": self.crs,
+            "nodata": self.nodata,
+        }
+
+    @property
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(*array_bounds(self.height, self.width, self.transform))
+
+    def window_transform(self, window: Window) -> affine.Affine:
+        return window_transform(window, self.transform)
+
+    def read(self, indexes: int | list[int] | None = None, window: Window | None = None):
+        """View of the data of an integer window.
+
+        Args:
+            indexes (int | list[int] | None, optional): band 1, as integer for a 2D or as
+                list for a 3D result. Defaults to all bands (3D).
+            window (Window | None, optional): integer window within the raster. Defaults
+                to the whole raster.
+
+        Raises:
+            ValueError: in case of another band, a fractional window or a window
+                exceeding the raster
+
+        Returns:
+            np.ndarray: view of the data, (height, width) or (1, height, width)
+        """
+        band_list = [indexes] if isinstance(indexes, int) else list(indexes or [1])
+        if band_list != [1]:
+            raise ValueError(f"Raw rasters have a single band, got {indexes}")
+
+        window = window if window is not None else Window(0, 0, self.width, self.height)
+        offsets = (window.row_off, window.col_off, window.height, window.width)
+        if any(value != int(value) for value in offsets):
+            raise ValueError(f"Raw rasters are read by integer windows, got {window}")
+
+        row_off, col_off, height, width = (int(value) for value in offsets)
+        if (
+            row_off < 0
+            or col_off < 0
+            or row_off + height > self.height
+            or col_off + width > self.width
+        ):
+            raise ValueError(f"Window {window} exceeds the raster")
+
+        data = self.data[row_off : row_off + height, col_off : col_off + width]
+        return data if isinstance(indexes, int) else data[None, ...]
+
+
+class RawRasterCache:
+    def __init__(self, folder: str | Path):
+        """Initialize the cache, tiles converted by earlier runs are reused.
+
+        Args:
+            folder (str | Path): folder of the raw files and their sidecars
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.stats = RawCacheStats()
+
+        self._lock = threading.Lock()
+        self._path_locks: dict[Path, threading.Lock] = dict()
+
+        # source path -> opened raw raster
+        self._rasters: dict[Path, RawRaster] = dict()
+
+    def __getstate__(self) -> dict:
+        # worker processes open the cached tiles themselves
+        return {"folder": self.folder}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["folder"])
+
+    def _paths(self, source: Path) -> tuple[Path, Path]:
+        if is_remote_path(source):
+            raise ValueError(f"Raw rasters are created from local tiles, got {source}")
+        stem = f"{source.stem}-{source.stat().st_size}"
+        return self.folder / f"{stem}.f32", self.folder / f"{stem}.json"
+
+    def open(self, path: str | Path) -> RawRaster:
+        """Memory-mapped raw raster of a tile, converted on first use.
+
+        Args:
+            path (str | Path): single band raster file, e.g. an energy yield tile
+
+        Returns:
+            RawRaster: read-only raster, safe to share between threads
+        """
+        path = Path(path)
+        with self._lock:
+            if path in self._rasters:
+                self.stats.hits += 1
+                return self._rasters[path]
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+
+        # tiles are converted at most once, other tiles are opened meanwhile
+        with path_lock:
+            with self._lock:
+                if path in self._rasters:
+                    self.stats.hits += 1
+                    return self._rasters[path]
+
+            raw_path, sidecar_path = self._paths(path)
+            sidecar = _read_sidecar(sidecar_path)
+            if sidecar is None:
+                sidecar = self._convert(path, raw_path, sidecar_path)
+            else:
+                with self._lock:
+                    self.stats.hits += 1
+
+            data = np.memmap(
+                raw_path, dtype=np.float32, mode="r", shape=(sidecar["height"], sidecar["width"])
+            )
+            raster = RawRaster(data, affine.Affine(*sidecar["transform"]), sidecar["crs"])
+            with self._lock:
+                self._rasters[path] = raster
+            return raster
+
+    def _convert(self, path: Path, raw_path: Path, sidecar_path: Path) -> dict:
+        logger.debug(f"Converting {path.name} to a raw raster")
+
+        # written under temporary names, concurrent conversions (e.g. by other
+        # processes) do not see partial files
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        raw_tmp = raw_path.with_name(raw_path.name + suffix)
+        sidecar_tmp = sidecar_path.with_name(sidecar_path.name + suffix)
+
+        with rasterio.open(path) as dataset:
+            if dataset.count != 1:
+                raise ValueError(f"{path.name} has {dataset.count} bands, expected a single band")
+
+            data = np.memmap(raw_tmp, dtype=np.float32, mode="w+", shape=dataset.shape)
+            for row_start in range(0, dataset.height, _CONVERSION_ROWS):
+                window = Window(
+                    0, row_start, dataset.width, min(_CONVERSION_ROWS, dataset.height - row_start)
+                )
+                rows = dataset.read(1, window=window, out_dtype=np.float32)
+                if dataset.nodata is not None:
+                    # we assume the energy output is 0kWh/m^2 for no data pixels
+                    rows[rows == dataset.nodata] = 0
+                data[row_start : row_start + rows.shape[0]] = rows
+            data.flush()
+            del data
+
+            sidecar = {
+                "format_version": RAW_FORMAT_VERSION,
+                "width": dataset.width,
+                "height": dataset.height,
+                "transform": list(dataset.transform)[:6],
+                "crs": dataset.crs.to_string() if dataset.crs is not None else None,
+                "source_nodata": dataset.nodata,
+            }
+
+        sidecar_tmp.write_text(json.dumps(sidecar))
+        # the sidecar is moved last, it marks the raw file as complete
+        os.replace(raw_tmp, raw_path)
+        os.replace(sidecar_tmp, sidecar_path)
+
+        with self._lock:
+            self.stats.conversions += 1
+            self.stats.converted_bytes += raw_path.stat().st_size
+        return sidecar
+
+
+def _read_sidecar(sidecar_path: Path) -> dict | None:
+    if not sidecar_path.exists():
+        return None
+    sidecar = json.loads(sidecar_path.read_text())
+    if sidecar.get("format_version") != RAW_FORMAT_VERSION:
+        return None
+    return sidecar
@@ -0,0 +1,151 @@
+"""
+Windowed reads of remote tiles through HTTP range requests.
+
+Instead of downloading whole tiles, GDAL's `/vsicurl/` file system fetches the byte ranges
+a read touches (the header first, then the blocks of the window). Fetched ranges are kept
+in GDAL's process-wide cache, shared by all handles of a tile, so repeated and
+overlapping windows are served locally. Small jobs thus transfer a fraction of a tile.
+
+With a cache folder, fetched blocks are additionally stored on disk (an fsspec
+`blockcache` of sparse files), where they survive the process and are shared by the
+worker processes and later runs. GDAL then reads the tiles through `open_raster`, which
+passes the cached file system to `rasterio.open` as opener.
+
+Remote paths are ordinary GDAL paths, they can be opened with `open_raster` and combined
+into mosaics like local tiles.
+"""
+
+import io
+import os
+from functools import cache
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode
+
+import fsspec
+import rasterio
+from rasterio.abc import FileContainer
+from rasterio.io import DatasetReader
+
+# prefix of the remote paths, see `remote_tile_path`
+VSICURL_PREFIX = "/vsicurl?"
+
+# default size of the cache of fetched byte ranges (per process)
+DEFAULT_RANGE_CACHE_BYTES = 256 * 1024**2
+
+# environment variable holding the folder of the disk cache, inherited by worker processes
+RANGE_CACHE_FOLDER_ENV = "PV_RANGE_CACHE_FOLDER"
+
+# size of the blocks fetched into the disk cache, small enough to keep windowed reads cheap
+RANGE_CACHE_BLOCK_BYTES = 256 * 1024
+
+
+def remote_tile_path(url: str) -> Path:
+    """GDAL path reading a tile by HTTP range requests.
+
+    The URL is passed in encoded form, such that the path survives `pathlib` (which
+    collapses the double slash of the URL scheme).
+
+    Args:
+        url (str): URL of the tile
+
+    Returns:
+        Path: `/vsicurl?` path of the tile
+    """
+    # sidecar files (.aux.xml, .msk, ...) do not exist on the server, they are not probed
+    return Path(VSICURL_PREFIX + urlencode({"empty_dir": "yes", "url": url}))
+
+
+def is_remote_path(path: str | Path) -> bool:
+    """Check whether a path refers to a remote tile, see `remote_tile_path`."""
+    return str(path).startswith(VSICURL_PREFIX)
+
+
+def remote_url(path: str | Path) -> str:
+    """URL of a remote tile, the inverse of `remote_tile_path`."""
+    return parse_qs(str(path).removeprefix(VSICURL_PREFIX))["url"][0]
+
+
+def configure_range_cache(
+    max_bytes: int = DEFAULT_RANGE_CACHE_BYTES, cache_folder: str | Path | None = None
+):
+    """Configure the cache of fetched byte ranges of this process and of worker processes
+    started later on. Explicit settings of the environment take precedence.
+
+    Args:
+        max_bytes (int, optional): size of the in-memory cache in bytes. Defaults to 256MB.
+        cache_folder (str | Path | None, optional): folder of the disk cache. Defaults to
+            None (fetched ranges are only kept in memory).
+    """
+    # GDAL falls back to environment variables for configuration options, which unlike
+    # `rasterio.Env` also applies to all threads
+    os.environ.setdefault("CPL_VSIL_CURL_CACHE_SIZE", str(max_bytes))
+    os.environ.setdefault("GDAL_HTTP_MAX_RETRY", "3")
+    os.environ.setdefault("GDAL_HTTP_RETRY_DELAY", "1")
+
+    if cache_folder is not None:
+        os.environ.setdefault(RANGE_CACHE_FOLDER_ENV, str(Path(cache_folder).resolve()))
+        # tiles opened by `open_raster` bypass `/vsicurl/` and its `empty_dir` option
+        os.environ.setdefault("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+
+
+class _RangeCacheContainer(FileContainer):
+    """Remote tiles read through an fsspec `blockcache`, see `rasterio.abc.FileContainer`."""
+
+    def __init__(self, cache_folder: str):
+        self._filesystem = fsspec.filesystem(
+            "blockcache",
+            target_protocol="http",
+            target_options={"block_size": RANGE_CACHE_BLOCK_BYTES},
+            cache_storage=cache_folder,
+            skip_instance_cache=True,
+        )
+
+    def open(self, path: str, mode: str = "rb", **kwds) -> io.BufferedReader:
+        # rasterio tracks the open files in a dict, fsspec files of the same URL compare
+        # equal though (e.g. a tile and the same tile as source of a mosaic)
+        return io.BufferedReader(self._filesystem.open(path, "rb"))
+
+    def size(self, path: str) -> int:
+        # the size of cached files is known without a request
+        with self._filesystem.open(path, "rb") as f:
+            return f.size
+
+    # GDAL only opens the tiles themselves, directories are not read (`EMPTY_DIR`)
+    def isfile(self, path: str) -> bool:
+        return True
+
+    def isdir(self, path: str) -> bool:
+        return False
+
+    def ls(self, path: str) -> list[str]:
+        return []
+
+    def mtime(self, path: str) -> int:
+        return 0
+
+    def rm(self, path: str):
+        raise PermissionError("Remote tiles are read-only")
+
+
+@cache
+def _range_cache_container(cache_folder: str) -> _RangeCacheContainer:
+    return _RangeCacheContainer(cache_folder)
+
+
+def open_raster(path: str | Path) -> DatasetReader:
+    """Open a raster for reading, remote tiles are read through the disk cache if one is
+    configured, see `configure_range_cache`.
+
+    GDAL can access a tile read through the disk cache by the name of the returned dataset
+    (e.g. as source of a VRT) as long as the dataset is open.
+
+    Args:
+        path (str | Path): raster file or remote path, see `remote_tile_path`
+
+    Returns:
+        DatasetReader: open dataset
+    """
+    cache_folder = os.environ.get(RANGE_CACHE_FOLDER_ENV)
+    if not is_remote_path(path) or not cache_folder:
+        return rasterio.open(path)
+    return rasterio.open(remote_url(path), opener=_range_cache_container(cache_folder))
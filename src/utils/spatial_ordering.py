@@ -0,0 +1,120 @@
+"""
+Spatial ordering of buildings along space-filling curves.
+
+Buildings from OpenStreetMap come in an order unrelated to their position on the raster,
+consecutive window reads jump across the tile and evict each other's blocks from the GDAL
+block cache. Sorting the buildings by the position of their centroid along a Hilbert curve
+(or Z-order curve) keeps consecutive buildings close to each other.
+"""
+
+from enum import StrEnum
+
+import numpy as np
+
+
+class SpatialOrdering(StrEnum):
+    HILBERT = "hilbert"
+    Z_ORDER = "z_order"
+
+
+def _to_grid(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    bounds: tuple[float, float, float, float] | None,
+    order: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # integer cell coordinates on a 2^order x 2^order grid over the bounds
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+
+    if bounds is None:
+        if len(xs) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        bounds = (xs.min(), ys.min(), xs.max(), ys.max())
+    min_x, min_y, max_x, max_y = bounds
+
+    n = 1 << order
+    extent = max(max_x - min_x, max_y - min_y, np.finfo(np.float64).tiny)
+    cells_x = np.clip(np.floor((xs - min_x) / extent * n), 0, n - 1).astype(np.int64)
+    cells_y = np.clip(np.floor((ys - min_y) / extent * n), 0, n - 1).astype(np.int64)
+    return cells_x, cells_y
+
+
+def hilbert_keys(
+    xs,
+    ys,
+    bounds: tuple[float, float, float, float] | None = None,
+    order: int = 16,
+) -> np.ndarray:
+    """Position of points along a Hilbert curve.
+
+    Args:
+        xs (array-like): x-coordinates
+        ys (array-like): y-coordinates
+        bounds (tuple[float, float, float, float] | None, optional): area covered by the
+            curve (min_x, min_y, max_x, max_y). Defaults to the bounds of the points.
+        order (int, optional): the curve runs through 2^order x 2^order cells.
+            Defaults to 16.
+
+    Returns:
+        np.ndarray: integer key per point
+    """
+    x, y = _to_grid(xs, ys, bounds, order)
+    n = 1 << order
+
+    keys = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        keys += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+
+        # rotate the quadrant, such that the curve is continuous
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+
+        s >>= 1
+
+    return keys
+
+
+def z_order_keys(
+    xs,
+    ys,
+    bounds: tuple[float, float, float, float] | None = None,
+    order: int = 16,
+) -> np.ndarray:
+    """Position of points along a Z-order (Morton) curve, see `hilbert_keys`."""
+    x, y = _to_grid(xs, ys, bounds, order)
+
+    keys = np.zeros(len(x), dtype=np.int64)
+    for bit in range(order):
+        keys |= ((x >> bit) & 1) << (2 * bit)
+        keys |= ((y >> bit) & 1) << (2 * bit + 1)
+    return keys
+
+
+def spatial_keys(
+    xs,
+    ys,
+    ordering: SpatialOrdering = SpatialOrdering.HILBERT,
+    bounds: tuple[float, float, float, float] | None = None,
+) -> np.ndarray:
+    """Sort keys of points along the space-filling curve of `ordering`.
+
+    Args:
+        xs (array-like): x-coordinates
+        ys (array-like): y-coordinates
+        ordering (SpatialOrdering, optional): curve. Defaults to Hilbert.
+        bounds (tuple[float, float, float, float] | None, optional): area covered by the
+            curve. Defaults to the bounds of the points.
+
+    Returns:
+        np.ndarray: integer key per point
+    """
+    ordering = SpatialOrdering(ordering)
+    if ordering == SpatialOrdering.HILBERT:
+        return hilbert_keys(xs, ys, bounds)
+    return z_order_keys(xs, ys, bounds)
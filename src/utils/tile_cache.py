@@ -0,0 +1,161 @@
+"""
+Disk-budgeted LRU cache for downloaded tiles.
+
+The last access of a tile is persisted as the modification time of its file, so the
+LRU order survives between runs. Tiles in use by a processing stage can be pinned,
+pinned tiles are never evicted.
+"""
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.logging import get_library_logger
+
+logger = get_library_logger(__name__)
+
+
+@dataclass
+class TileCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    evicted_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class TileCache:
+    def __init__(
+        self,
+        folder: str | Path,
+        max_bytes: int | None = None,
+        patterns: tuple[str, ...] = ("*.jp2", "*.tif"),
+        exclude: tuple[str, ...] = (),
+    ):
+        """Initialize the cache, tiles already present in `folder` are registered.
+
+        Args:
+            folder (str | Path): folder with the tiles
+            max_bytes (int | None, optional): disk budget. Defaults to None (unbounded).
+            patterns (tuple[str, ...], optional): glob patterns of the files managed by
+                the cache, other files in the folder are never touched. Caches sharing a
+                folder must use disjoint patterns, they would evict each other's tiles.
+            exclude (tuple[str, ...], optional): glob patterns of files which are not
+                managed even if they match `patterns`. Defaults to ().
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = TileCacheStats()
+
+        self._lock = threading.RLock()
+        self._pins = Counter()
+
+        # file path -> size in bytes, least recently used first
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+
+        files = {
+            f
+            for pattern in patterns
+            for f in self.folder.glob(pattern)
+            if f.is_file() and not any(f.match(excluded) for excluded in exclude)
+        }
+        for f in sorted(files, key=lambda f: f.stat().st_mtime):
+            self._entries[f] = f.stat().st_size
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(self._entries.values())
+
+    def __contains__(self, path: str | Path) -> bool:
+        with self._lock:
+            return Path(path) in self._entries
+
+    def record_hit(self, path: str | Path):
+        """Mark a cached tile as (most recently) used."""
+        path = Path(path)
+        with self._lock:
+            self.stats.hits += 1
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        os.utime(path)
+
+    def record_miss(self):
+        with self._lock:
+            self.stats.misses += 1
+
+    def reserve(self, num_bytes: int):
+        """Evict least recently used, unpinned tiles until `num_bytes` fit into the budget.
+
+        Args:
+            num_bytes (int): bytes required for a new tile
+        """
+        if self.max_bytes is None:
+            return
+
+        with self._lock:
+            used_bytes = self.used_bytes
+            for path in list(self._entries):
+                if used_bytes + num_bytes <= self.max_bytes:
+                    break
+                if self._pins[path] > 0:
+                    continue
+                used_bytes -= self._evict(path)
+
+            if used_bytes + num_bytes > self.max_bytes:
+                logger.warning(
+                    f"Tile cache budget of {self.max_bytes} bytes exceeded, "
+                    "all remaining tiles are pinned"
+                )
+
+    def add(self, path: str | Path):
+        """Register a new tile (e.g. after a download) as most recently used."""
+        path = Path(path)
+        size = path.stat().st_size
+        with self._lock:
+            self._entries.pop(path, None)
+            self.reserve(size)
+            self._entries[path] = size
+
+    def remove(self, path: str | Path):
+        """Delete a tile which is not needed anymore (not counted as eviction)."""
+        path = Path(path)
+        with self._lock:
+            self._entries.pop(path, None)
+        path.unlink(missing_ok=True)
+
+    def _evict(self, path: Path) -> int:
+        size = self._entries.pop(path)
+        path.unlink(missing_ok=True)
+        self.stats.evictions += 1
+        self.stats.evicted_bytes += size
+        logger.info(f"Evicted {path.name} from the tile cache")
+        return size
+
+    def pin(self, path: str | Path):
+        with self._lock:
+            self._pins[Path(path)] += 1
+
+    def unpin(self, path: str | Path):
+        path = Path(path)
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] <= 0:
+                del self._pins[path]
+
+    @contextmanager
+    def pinned(self, path: str | Path):
+        """Pin a tile for the duration of the context."""
+        self.pin(path)
+        try:
+            yield Path(path)
+        finally:
+            self.unpin(path)
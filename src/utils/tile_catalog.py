@@ -0,0 +1,334 @@
+"""
+Normalized tile catalog of the OpenGeodata.NRW datasets.
+
+The catalog is parsed once from the overview files (`dop_nw.csv`, HTML extraction
+results or `parse_download_links` output) and persisted as an uncompressed Feather
+file, which later runs memory-map instead of parsing the CSV files again.
+"""
+
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from utils.logging import get_library_logger
+from utils.opengeodata_nrw import DatasetType
+from utils.tile_management import (
+    TileManager,
+    encode_tile_key,
+    parse_tile_extents,
+    read_html_extraction_file,
+    read_tile_overview_file,
+)
+
+logger = get_library_logger(__name__)
+
+DEFAULT_CATALOG_PATH = "data/tile_catalog.feather"
+
+# overview files of the datasets, as used by the CLI tools
+DEFAULT_TILE_SOURCES = {
+    DatasetType.AERIAL_IMAGE: "data/aerial_images.csv",
+    DatasetType.ENERGY_YIELD_50CM: "data/Strahlungsenergie-0.5x0.5.csv",
+    DatasetType.ENERGY_YIELD_100CM: "data/Strahlungsenergie-1x1.csv",
+}
+
+# prefix of the columns with the keys of the tiles covering an aerial image tile
+COVER_COLUMN_PREFIX = "cover_"
+
+
+def tiles_from_download_links(download_links: pd.DataFrame) -> pd.DataFrame:
+    """Normalize the output of `utils.opengeodata_nrw.parse_download_links`.
+
+    Args:
+        download_links (pd.DataFrame): dataframe with columns `name`, `size`
+
+    Returns:
+        pd.DataFrame: columns `tile_name`, `min_x`, `min_y`, `extent`, `size`
+    """
+    tile_info = download_links[["name", "size"]].rename(columns={"name": "tile_name"})
+
+    # the listing contains additional files like metadata
+    is_tile = tile_info["tile_name"].str.contains(r"_32_?\d+_\d+_\d+", regex=True)
+    tile_info = tile_info[is_tile].reset_index(drop=True)
+
+    return pd.concat([tile_info, parse_tile_extents(tile_info["tile_name"])], axis=1)
+
+
+def read_tile_source(fp: str | Path) -> pd.DataFrame:
+    """Read one of the supported overview files, the format is detected from the header.
+
+    Args:
+        fp (str | Path): `dop_nw.csv`-like overview file or HTML extraction result
+
+    Returns:
+        pd.DataFrame: columns `tile_name`, `min_x`, `min_y`, `extent`, `version`
+    """
+    with open(fp, encoding="utf-8") as f:
+        first_line = f.readline()
+
+    if first_line.startswith("File"):
+        return read_html_extraction_file(fp)
+    return read_tile_overview_file(fp)
+
+
+class TileCatalog:
+    # columns of the persisted catalog
+    columns = ["dataset", "tile_name", "tile_key", "min_x", "min_y", "extent", "size", "version"]
+
+    def __init__(self, tiles: pd.DataFrame | pa.Table):
+        """Initialize the catalog
+
+        Args:
+            tiles (pd.DataFrame | pa.Table): normalized catalog, see `TileCatalog.build`.
+                A (memory-mapped) Arrow table is converted only partially, for the
+                datasets and columns which are used.
+        """
+        self._tiles = tiles if isinstance(tiles, pd.DataFrame) else None
+        self._table = tiles if isinstance(tiles, pa.Table) else None
+
+    @property
+    def tiles(self) -> pd.DataFrame:
+        """The whole catalog, converted from the Arrow table on first access."""
+        if self._tiles is None:
+            self._tiles = self._table.to_pandas()
+            self._table = None
+        return self._tiles
+
+    @property
+    def column_names(self) -> list[str]:
+        if self._table is not None:
+            return self._table.column_names
+        return self._tiles.columns.tolist()
+
+    def _select(self, dataset_type: DatasetType, columns: list[str]) -> pd.DataFrame:
+        """Columns of the tiles of a single dataset."""
+        if self._table is None:
+            mask = (self._tiles["dataset"] == dataset_type).to_numpy()
+            return self._tiles.loc[mask, columns].reset_index(drop=True)
+
+        mask = pc.equal(self._table["dataset"], str(dataset_type))
+        return self._table.select(columns).filter(mask).to_pandas()
+
+    @classmethod
+    def build(cls, sources: Mapping[DatasetType, pd.DataFrame]) -> "TileCatalog":
+        """Build the catalog from tile information of several datasets.
+
+        For each aerial image tile the keys of the energy yield tiles covering it
+        are precomputed and stored in `cover_<dataset>` columns (-1 if not covered).
+
+        Args:
+            sources (Mapping[DatasetType, pd.DataFrame]): tile information per dataset
+                with columns `tile_name`, `min_x`, `min_y`, `extent` and optional `size`
+                and `version`
+
+        Returns:
+            TileCatalog: catalog
+        """
+        if not sources:
+            raise ValueError("At least one tile source is required")
+
+        frames = []
+        for dataset_type, tile_info in sources.items():
+            frame = pd.DataFrame(
+                {
+                    "dataset": str(dataset_type),
+                    "tile_name": tile_info["tile_name"].to_numpy(dtype=object),
+                    "tile_key": encode_tile_key(
+                        tile_info["min_x"].to_numpy(), tile_info["min_y"].to_numpy()
+                    ),
+                    "min_x": tile_info["min_x"].to_numpy(dtype=np.int64),
+                    "min_y": tile_info["min_y"].to_numpy(dtype=np.int64),
+                    "extent": tile_info["extent"].to_numpy(dtype=np.int64),
+                    "size": pd.array(
+                        tile_info["size"] if "size" in tile_info else [pd.NA] * len(tile_info),
+                        dtype="Int64",
+                    ),
+                    "version": pd.array(
+                        tile_info["version"].astype(object)
+                        if "version" in tile_info
+                        else [pd.NA] * len(tile_info),
+                        dtype="string",
+                    ),
+                }
+            )
+            frames.append(frame)
+
+        tiles = pd.concat(frames, ignore_index=True)
+        tiles["dataset"] = tiles["dataset"].astype("category")
+
+        catalog = cls(tiles)
+        catalog._add_cover_columns()
+        return catalog
+
+    def _add_cover_columns(self):
+        is_aerial = (self.tiles["dataset"] == DatasetType.AERIAL_IMAGE).to_numpy()
+        aerial_tiles = self.tiles[is_aerial]
+
+        # the center of an aerial image tile identifies the covering tile of a coarser grid
+        center_x = aerial_tiles["min_x"] + aerial_tiles["extent"] / 2
+        center_y = aerial_tiles["min_y"] + aerial_tiles["extent"] / 2
+
+        for dataset_type in self.datasets:
+            if dataset_type == DatasetType.AERIAL_IMAGE:
+                continue
+
+            cover_keys = np.full(len(self.tiles), -1, dtype=np.int64)
+            if is_aerial.any():
+                lookup = self.tile_manager(dataset_type).get_tile_names_for_points(
+                    center_x, center_y
+                )
+                cover_keys[is_aerial] = lookup.tile_keys
+            self.tiles[f"{COVER_COLUMN_PREFIX}{dataset_type}"] = cover_keys
+
+    @property
+    def datasets(self) -> list[DatasetType]:
+        if self._table is not None:
+            datasets = pc.unique(self._table["dataset"]).dictionary_decode().to_pylist()
+            return [DatasetType(d) for d in datasets]
+        return [DatasetType(d) for d in self.tiles["dataset"].unique()]
+
+    def get_tile_info(self, dataset_type: DatasetType) -> pd.DataFrame:
+        """Get the tiles of a single dataset.
+
+        Args:
+            dataset_type (DatasetType): dataset
+
+        Raises:
+            ValueError: in case the dataset is not part of the catalog
+
+        Returns:
+            pd.DataFrame: columns `tile_name`, `tile_key`, `min_x`, `min_y`, `extent`, `size`,
+                `version`
+        """
+        tile_info = self._select(dataset_type, self.columns[1:])
+        if len(tile_info) == 0:
+            raise ValueError(f"Dataset {dataset_type} is not part of the tile catalog")
+        return tile_info
+
+    def tile_manager(
+        self, dataset_type: DatasetType, data_folder: str | Path | None = None, **kwargs
+    ) -> TileManager:
+        """Create a `TileManager` for one of the datasets in the catalog.
+
+        Args:
+            dataset_type (DatasetType): dataset
+            data_folder (str | Path | None, optional): folder with the tile data.
+            **kwargs: further keyword arguments of `TileManager`
+
+        Returns:
+            TileManager: tile manager instance
+        """
+        return TileManager(
+            self.get_tile_info(dataset_type),
+            data_folder=data_folder,
+            tile_type=dataset_type,
+            **kwargs,
+        )
+
+    def covering_tiles(self, dataset_type: DatasetType) -> pd.Series:
+        """Get the tiles of `dataset_type` which cover the aerial image tiles.
+
+        Args:
+            dataset_type (DatasetType): dataset of the covering tiles, e.g. energy yield
+
+        Returns:
+            pd.Series: covering tile name (None if not covered), indexed by aerial tile name
+        """
+        cover_column = f"{COVER_COLUMN_PREFIX}{dataset_type}"
+        if cover_column not in self.column_names:
+            raise ValueError(f"Dataset {dataset_type} is not part of the tile catalog")
+
+        aerial_tiles = self._select(DatasetType.AERIAL_IMAGE, ["tile_name", cover_column])
+        covering = self.get_tile_info(dataset_type)
+        key_to_name = dict(zip(covering["tile_key"], covering["tile_name"]))
+
+        cover_names = [key_to_name.get(key) for key in aerial_tiles[cover_column]]
+        return pd.Series(
+            cover_names,
+            index=pd.Index(aerial_tiles["tile_name"], name="tile_name"),
+            name=cover_column,
+            dtype=object,
+        )
+
+    def write(self, path: str | Path):
+        """Persist the catalog as an uncompressed Feather file, which can be memory-mapped.
+
+        Args:
+            path (str | Path): file path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        feather.write_feather(self.tiles, tmp_path, compression="uncompressed")
+        tmp_path.replace(path)
+
+    @classmethod
+    def read(cls, path: str | Path) -> "TileCatalog":
+        """Read a persisted catalog, the file is memory-mapped. Only the tiles of the
+        datasets in use are converted into data frames, see `get_tile_info`.
+
+        Args:
+            path (str | Path): file path
+
+        Returns:
+            TileCatalog: catalog
+        """
+        return cls(feather.read_table(str(path), memory_map=True))
+
+    @classmethod
+    def load_or_build(
+        cls,
+        path: str | Path,
+        source_files: Mapping[DatasetType, str | Path],
+    ) -> "TileCatalog":
+        """Read the persisted catalog, or build and persist it in case it does not exist
+        or is older than one of the source files.
+
+        Args:
+            path (str | Path): file path of the persisted catalog
+            source_files (Mapping[DatasetType, str | Path]): overview file per dataset
+
+        Returns:
+            TileCatalog: catalog
+        """
+        path = Path(path)
+        source_files = {k: Path(v) for k, v in source_files.items()}
+
+        if path.exists():
+            catalog_mtime = path.stat().st_mtime
+            is_stale = any(fp.stat().st_mtime > catalog_mtime for fp in source_files.values())
+            if not is_stale:
+                catalog = cls.read(path)
+                # catalogs written by older versions lack columns
+                is_complete = set(cls.columns).issubset(catalog.column_names)
+                if is_complete and set(catalog.datasets) == set(source_files):
+                    return catalog
+
+        logger.info(f"Building the tile catalog {path}")
+        catalog = cls.build({k: read_tile_source(fp) for k, fp in source_files.items()})
+        catalog.write(path)
+        return catalog
+
+
+def load_default_catalog(
+    path: str | Path = DEFAULT_CATALOG_PATH,
+    source_files: Mapping[DatasetType, str | Path] = DEFAULT_TILE_SOURCES,
+) -> TileCatalog:
+    """Load the catalog of the datasets with an overview file available locally.
+
+    Args:
+        path (str | Path, optional): file path of the persisted catalog.
+        source_files (Mapping[DatasetType, str | Path], optional): overview file per dataset.
+
+    Returns:
+        TileCatalog: catalog
+    """
+    available = {k: fp for k, fp in source_files.items() if Path(fp).exists()}
+    if not available:
+        raise FileNotFoundError(f"No tile overview files found: {list(source_files.values())}")
+    return TileCatalog.load_or_build(path, available)
@@ -1,16 +1,87 @@
+import threading
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 from pathlib import Path
 from urllib.parse import urljoin
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-import requests
 import shapely
 
+from utils.cog import COG_SUFFIX, transcode_to_cog
+from utils.download import DownloadJob, TileDownloader
+from utils.logging import get_library_logger
 from utils.opengeodata_nrw import (
     DOWNLOAD_BASE_URL,
     FILE_EXTENSIONS,
     DatasetType,
 )
+from utils.remote_tiles import DEFAULT_RANGE_CACHE_BYTES, configure_range_cache, remote_tile_path
+from utils.tile_cache import TileCache
+
+logger = get_library_logger(__name__)
+
+# subfolder of the data folder holding the disk cache of remote tiles
+RANGE_CACHE_FOLDER = "range_cache"
+
+# number of bits reserved for the northing in a tile key
+_TILE_KEY_SHIFT = 32
+
+
+def encode_tile_key(min_x, min_y):
+    """Encode the lower left corner of a tile (UTM32N, meters) into an integer key.
+
+    The key packs the corner coordinates in km, e.g. the corner (478000, 5740000)
+    is encoded as `478 << 32 | 5740`. Works on scalars and NumPy arrays.
+
+    Args:
+        min_x: easting of the lower left corner in meters
+        min_y: northing of the lower left corner in meters
+
+    Returns:
+        integer tile key(s)
+    """
+    x_km = np.floor_divide(min_x, 1000).astype(np.int64)
+    y_km = np.floor_divide(min_y, 1000).astype(np.int64)
+    return (x_km << _TILE_KEY_SHIFT) | y_km
+
+
+def decode_tile_key(tile_key):
+    """Inverse of `encode_tile_key`.
+
+    Args:
+        tile_key: integer tile key(s)
+
+    Returns:
+        tuple with the easting and northing of the lower left corner in meters
+    """
+    tile_key = np.asarray(tile_key, dtype=np.int64)
+    x_km = tile_key >> _TILE_KEY_SHIFT
+    y_km = tile_key & ((1 << _TILE_KEY_SHIFT) - 1)
+    return x_km * 1000, y_km * 1000
+
+
+@dataclass
+class TileLookupResult:
+    """Result of a batched point to tile lookup.
+
+    Attributes:
+        tile_names: tile name per point, `None` for unresolved points
+        tile_keys: tile key per point, -1 for unresolved points
+        missing: indices of points which are not covered by any tile
+        ambiguous: indices of points which are covered by several tiles
+    """
+
+    tile_names: np.ndarray
+    tile_keys: np.ndarray
+    missing: np.ndarray
+    ambiguous: np.ndarray
+
+    @property
+    def resolved(self) -> np.ndarray:
+        """Boolean mask of points with exactly one tile."""
+        return self.tile_keys >= 0
 
 
 class TileManager:
@@ -22,24 +93,47 @@ class TileManager:
         tile_info: pd.DataFrame,
         data_folder: str | Path | None = None,
         tile_type: DatasetType | None = None,
+        *,
+        downloader: TileDownloader | None = None,
+        base_url: str | None = None,
+        cache: TileCache | None = None,
+        transcode_to_cog: bool = False,
+        remote: bool = False,
+        range_cache_bytes: int = DEFAULT_RANGE_CACHE_BYTES,
     ):
         """Initialize the TileManager
 
         Args:
             tile_info (pd.DataFrame): dataframe with
-                columns `tile_name`, `min_x`, `min_y`, `extent`
+                columns `tile_name`, `min_x`, `min_y`, `extent` and optionally `size`
+                (file size in bytes, used to verify downloads) and `version` (e.g. the
+                publication date, identifies the content of a tile)
+            downloader (TileDownloader | None, optional): downloader for missing tiles.
+                Defaults to a `TileDownloader` with default settings.
+            base_url (str | None, optional): download URL of the tiles. Defaults to the
+                OpenGeodata.NRW URL of `tile_type`.
+            cache (TileCache | None, optional): disk-budgeted cache of the data folder.
+                Defaults to None (tiles are kept forever).
+            transcode_to_cog (bool, optional): transcode downloaded tiles into
+                Cloud-Optimized GeoTIFFs and serve those instead, the original file is
+                removed afterwards. Defaults to False.
+            remote (bool, optional): serve remote paths of the tiles instead of
+                downloading them, windows are read by HTTP range requests, see
+                `utils.remote_tiles`. The fetched byte ranges are cached on disk in the
+                `range_cache` subfolder of the data folder. Defaults to False.
+            range_cache_bytes (int, optional): size of the in-memory cache of fetched byte
+                ranges in remote mode. Defaults to 256MB.
         """
+        if remote and transcode_to_cog:
+            raise ValueError("Remote tiles cannot be transcoded into COGs")
+
+        tile_info = tile_info.reset_index(drop=True)
 
         # extract the geometries
-        tile_geometries = [
-            shapely.box(
-                row["min_x"],
-                row["min_y"],
-                row["min_x"] + row["extent"],
-                row["min_y"] + row["extent"],
-            )
-            for _, row in tile_info.iterrows()
-        ]
+        min_x = tile_info["min_x"].to_numpy(dtype=np.float64)
+        min_y = tile_info["min_y"].to_numpy(dtype=np.float64)
+        extent = tile_info["extent"].to_numpy(dtype=np.float64)
+        tile_geometries = shapely.box(min_x, min_y, min_x + extent, min_y + extent)
         tile_info = gpd.GeoDataFrame(tile_info, geometry=tile_geometries)
 
         self.tile_info = tile_info
@@ -47,6 +141,196 @@ class TileManager:
         self._data_folder = Path(data_folder) if isinstance(data_folder, str) else data_folder
         self._tile_type = tile_type
 
+        self._tile_names = np.array(
+            [self._strip_extension(name) for name in tile_info["tile_name"]], dtype=object
+        )
+        self._tile_keys = encode_tile_key(min_x, min_y)
+        self._build_index(min_x, min_y, extent)
+
+        self._tile_sizes = {}
+        if "size" in tile_info:
+            sizes = pd.to_numeric(tile_info["size"], errors="coerce")
+            self._tile_sizes = {
+                name: int(size) for name, size in zip(self._tile_names, sizes) if not pd.isna(size)
+            }
+
+        self._tile_versions = {}
+        if "version" in tile_info:
+            self._tile_versions = {
+                name: str(version)
+                for name, version in zip(self._tile_names, tile_info["version"])
+                if not pd.isna(version)
+            }
+
+        # the prefetching and the neighbour tiles may request the same tile concurrently
+        self._lock = threading.Lock()
+        self._tile_locks: dict[str, threading.Lock] = dict()
+
+        self._downloader = downloader if downloader is not None else TileDownloader()
+        self._base_url = base_url
+        self._cache = cache
+        self._transcode_to_cog = transcode_to_cog
+        self._remote = remote
+        if remote:
+            configure_range_cache(
+                range_cache_bytes,
+                self._data_folder / RANGE_CACHE_FOLDER if self._data_folder is not None else None,
+            )
+
+    def _strip_extension(self, tile_name: str) -> str:
+        if self._tile_type is None:
+            return tile_name
+        extension = FILE_EXTENSIONS[self._tile_type]
+        if tile_name.endswith(f".{extension}"):
+            tile_name = tile_name.split(f".{extension}")[0]
+        return tile_name
+
+    def _build_index(self, min_x: np.ndarray, min_y: np.ndarray, extent: np.ndarray):
+        """Build the point lookup index.
+
+        Catalogs of OpenGeodata.NRW are regular grids (all tiles have the same extent
+        and are aligned to it), a point can be mapped to its grid cell arithmetically
+        and looked up in a sorted array of cell keys. Irregular catalogs fall back to
+        an STRtree over the tile geometries.
+        """
+        self._grid_extent = None
+        self._grid_cell_keys = None
+        self._grid_tile_positions = None
+        self._grid_tile_counts = None
+        self._tree = None
+
+        is_regular = (
+            len(extent) > 0
+            and np.all(extent == extent[0])
+            and extent[0] > 0
+            and np.all(np.mod(min_x, extent[0]) == 0)
+            and np.all(np.mod(min_y, extent[0]) == 0)
+        )
+
+        if is_regular:
+            self._grid_extent = float(extent[0])
+            cell_keys = self._encode_cell(min_x // self._grid_extent, min_y // self._grid_extent)
+
+            # sorted cell keys with the first tile position and the number of tiles per cell
+            order = np.argsort(cell_keys, kind="stable")
+            unique_keys, first_idx, counts = np.unique(
+                cell_keys[order], return_index=True, return_counts=True
+            )
+            self._grid_cell_keys = unique_keys
+            self._grid_tile_positions = order[first_idx]
+            self._grid_tile_counts = counts
+        else:
+            self._tree = shapely.STRtree(self.tile_info.geometry.values)
+
+    @staticmethod
+    def _encode_cell(cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        return (cell_x.astype(np.int64) << _TILE_KEY_SHIFT) | (
+            cell_y.astype(np.int64) & ((1 << _TILE_KEY_SHIFT) - 1)
+        )
+
+    def get_tile_names_for_points(self, xs, ys) -> TileLookupResult:
+        """Get the tiles for many points at once.
+
+        Points on a shared tile edge are assigned to the tile which has the edge as
+        lower/left border for regular catalogs. Points which miss every tile or hit
+        several tiles are reported in the result instead of raising.
+
+        Args:
+            xs (array-like): x-coordinates (UTM32N)
+            ys (array-like): y-coordinates (UTM32N)
+
+        Returns:
+            TileLookupResult: tile names and keys per point
+        """
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        if xs.shape != ys.shape:
+            raise ValueError("xs and ys must have the same length")
+
+        if self._grid_extent is not None:
+            positions, counts = self._lookup_grid(xs, ys)
+        else:
+            positions, counts = self._lookup_tree(xs, ys)
+
+        resolved = counts == 1
+        tile_names = np.full(len(xs), None, dtype=object)
+        tile_names[resolved] = self._tile_names[positions[resolved]]
+        tile_keys = np.full(len(xs), -1, dtype=np.int64)
+        tile_keys[resolved] = self._tile_keys[positions[resolved]]
+
+        return TileLookupResult(
+            tile_names=tile_names,
+            tile_keys=tile_keys,
+            missing=np.flatnonzero(counts == 0),
+            ambiguous=np.flatnonzero(counts > 1),
+        )
+
+    def get_tile_names_for_keys(self, tile_keys) -> TileLookupResult:
+        """Get the tiles for many precomputed tile keys at once, see `encode_tile_key`.
+
+        Keys which are not part of the catalog (e.g. -1 for points without a tile) are
+        reported as missing.
+
+        Args:
+            tile_keys (array-like): integer tile keys
+
+        Returns:
+            TileLookupResult: tile names and keys per input key
+        """
+        tile_keys = np.asarray(tile_keys, dtype=np.int64).ravel()
+
+        order = np.argsort(self._tile_keys, kind="stable")
+        unique_keys, first_idx, counts = np.unique(
+            self._tile_keys[order], return_index=True, return_counts=True
+        )
+
+        # sentinel entry, keys beyond the last catalog key are not found
+        unique_keys = np.append(unique_keys, -1)
+        first_positions = np.append(order[first_idx], -1)
+        counts = np.append(counts, 0)
+
+        idx = np.minimum(np.searchsorted(unique_keys[:-1], tile_keys), len(unique_keys) - 1)
+        found = (tile_keys >= 0) & (unique_keys[idx] == tile_keys)
+        positions = np.where(found, first_positions[idx], -1)
+        counts = np.where(found, counts[idx], 0)
+
+        resolved = counts == 1
+        tile_names = np.full(len(tile_keys), None, dtype=object)
+        tile_names[resolved] = self._tile_names[positions[resolved]]
+
+        return TileLookupResult(
+            tile_names=tile_names,
+            tile_keys=np.where(resolved, tile_keys, -1),
+            missing=np.flatnonzero(counts == 0),
+            ambiguous=np.flatnonzero(counts > 1),
+        )
+
+    def _lookup_grid(self, xs: np.ndarray, ys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        n_cells = len(self._grid_cell_keys)
+        finite = np.isfinite(xs) & np.isfinite(ys)
+        xs = np.where(finite, xs, 0.0)
+        ys = np.where(finite, ys, 0.0)
+
+        cell_keys = self._encode_cell(
+            np.floor(xs / self._grid_extent), np.floor(ys / self._grid_extent)
+        )
+        idx = np.searchsorted(self._grid_cell_keys, cell_keys)
+        idx_clipped = np.minimum(idx, n_cells - 1)
+        found = finite & (idx < n_cells) & (self._grid_cell_keys[idx_clipped] == cell_keys)
+
+        positions = np.where(found, self._grid_tile_positions[idx_clipped], -1)
+        counts = np.where(found, self._grid_tile_counts[idx_clipped], 0)
+        return positions, counts
+
+    def _lookup_tree(self, xs: np.ndarray, ys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        points = shapely.points(xs, ys)
+        point_idx, tile_idx = self._tree.query(points, predicate="intersects")
+
+        counts = np.bincount(point_idx, minlength=len(xs))
+        positions = np.full(len(xs), -1, dtype=np.int64)
+        positions[point_idx] = tile_idx
+        return positions, counts
+
     def get_tile_name_from_point(self, x: float, y: float, with_extension: bool = False) -> str:
         """Get the tile name for a given point
 
@@ -58,26 +342,18 @@ class TileManager:
             str: tile name
         """
 
-        pt = shapely.Point(x, y)
+        result = self.get_tile_names_for_points([x], [y])
 
-        # filter tiles that contain the point
-        mask = self.tile_info.geometry.intersects(pt)
-
-        tiles = self.tile_info[mask]
-
-        if tiles.empty:
+        if len(result.missing) > 0:
             raise ValueError(f"No tile found for point ({x}, {y})")
 
-        if tiles.shape[0] > 1:
+        if len(result.ambiguous) > 0:
             raise ValueError(f"Multiple tiles found for point ({x}, {y}), should not happen!")
 
-        tile_name = tiles["tile_name"].iloc[0]
+        tile_name = result.tile_names[0]
 
         extension = FILE_EXTENSIONS[self._tile_type]
 
-        if tile_name.endswith(f".{extension}"):
-            tile_name = tile_name.split(f".{extension}")[0]
-
         if with_extension:
             return f"{tile_name}.{extension}"
         else:
@@ -87,6 +363,97 @@ class TileManager:
     def file_extension(self) -> str:
         return FILE_EXTENSIONS[self._tile_type]
 
+    @property
+    def base_url(self) -> str:
+        if self._base_url is not None:
+            return self._base_url
+        return DOWNLOAD_BASE_URL[self._tile_type]
+
+    def get_tile_path(self, tile_name: str) -> Path:
+        """Get the local file path of a tile (which does not have to exist).
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            Path: file path in the data folder
+        """
+        return self._data_folder / f"{tile_name}.{self.file_extension}"
+
+    def get_cog_path(self, tile_name: str) -> Path:
+        """Get the local file path of the COG version of a tile (which does not have to exist).
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            Path: file path in the data folder
+        """
+        return self._data_folder / f"{tile_name}{COG_SUFFIX}"
+
+    def get_remote_path(self, tile_name: str) -> Path:
+        """Get the remote path of a tile, read by HTTP range requests.
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            Path: GDAL path of the tile, see `utils.remote_tiles.remote_tile_path`
+        """
+        return remote_tile_path(urljoin(self.base_url, f"{tile_name}.{self.file_extension}"))
+
+    def get_served_path(self, tile_name: str) -> Path:
+        """Get the path of the file served by `ensure_tile`, the remote path, the COG or
+        the original tile."""
+        if self._remote:
+            return self.get_remote_path(tile_name)
+        if self._transcode_to_cog:
+            return self.get_cog_path(tile_name)
+        return self.get_tile_path(tile_name)
+
+    def get_tile_size(self, tile_name: str) -> int | None:
+        """Get the file size of a tile as listed in the tile information.
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            int | None: size in bytes, None if unknown
+        """
+        return self._tile_sizes.get(tile_name)
+
+    def get_tile_version(self, tile_name: str) -> str | None:
+        """Get the version of a tile as listed in the tile information, without
+        downloading it. The file size serves as version if no version is listed.
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            str | None: version, None if unknown
+        """
+        if tile_name in self._tile_versions:
+            return self._tile_versions[tile_name]
+        tile_size = self.get_tile_size(tile_name)
+        return str(tile_size) if tile_size is not None else None
+
+    def get_tile_geometry(self, tile_name: str) -> shapely.Polygon:
+        """Get the extent of a tile (UTM32N).
+
+        Args:
+            tile_name (str): tile name
+
+        Raises:
+            ValueError: in case the tile is unknown
+
+        Returns:
+            shapely.Polygon: tile extent
+        """
+        mask = self._tile_names == self._strip_extension(tile_name)
+        if not mask.any():
+            raise ValueError(f"Unknown tile {tile_name}")
+        return self.tile_info.geometry.values[np.argmax(mask)]
+
     def get_tiles_intersecting(self, polygon: shapely.Polygon) -> list[str]:
         """Get the tile names that intersect with a given polygon
 
@@ -100,15 +467,16 @@ class TileManager:
             list[str]: list of tiles
         """
 
-        # filter tiles that contain the point
-        mask = self.tile_info.geometry.intersects(polygon)
-
-        tiles = self.tile_info[mask]
+        # tiles which only share an edge with the polygon are not of interest
+        tile_geometries = self.tile_info.geometry.values
+        mask = shapely.intersects(tile_geometries, polygon) & ~shapely.touches(
+            tile_geometries, polygon
+        )
 
-        if tiles.empty:
+        if not mask.any():
             raise ValueError("No tile found for input polygon")
 
-        return tiles["tile_name"].tolist()
+        return self._tile_names[mask].tolist()
 
     def check_if_tile_exists(self, tile_name: str) -> bool:
         """Check if a tile exists in the data folder
@@ -117,12 +485,23 @@ class TileManager:
             tile_name (str): tile name
 
         Returns:
-            bool: True if the tile exists
+            bool: True if the tile exists (and has the expected size, if known)
         """
 
-        file_extension = FILE_EXTENSIONS[self._tile_type]
-        tile_path = self._data_folder / f"{tile_name}.{file_extension}"
-        return tile_path.exists()
+        tile_path = self.get_tile_path(tile_name)
+        if not tile_path.exists():
+            return False
+
+        expected_size = self.get_tile_size(tile_name)
+        return expected_size is None or tile_path.stat().st_size == expected_size
+
+    def _download_job(self, tile_name: str) -> DownloadJob:
+        tile_path = self.get_tile_path(tile_name)
+        return DownloadJob(
+            url=urljoin(self.base_url, tile_path.name),
+            destination=tile_path,
+            expected_size=self.get_tile_size(tile_name),
+        )
 
     def download_tile(
         self,
@@ -136,18 +515,150 @@ class TileManager:
             overwrite (bool, optional): overwrite the file if it exists.
                 Defaults to False.
         """
-        file_extension = FILE_EXTENSIONS[self._tile_type]
-        tile_filename = f"{tile_name}.{file_extension}"
-        tile_path = self._data_folder / tile_filename
-
         if self.check_if_tile_exists(tile_name) and not overwrite:
             print("File already exists, skipping download!")
             return
 
-        base_url = DOWNLOAD_BASE_URL[self._tile_type]
-        download_url = urljoin(base_url, tile_filename)
+        job = self._download_job(tile_name)
+        if self._cache is not None:
+            self._cache.reserve(job.expected_size or 0)
+
+        self._downloader.download(job.url, job.destination, job.expected_size)
+
+        if self._cache is not None:
+            self._cache.add(job.destination)
+
+    def download_tiles(self, tile_names: list[str], overwrite: bool = False) -> list[Path]:
+        """Download several tiles concurrently, existing tiles are skipped.
+
+        Args:
+            tile_names (list[str]): tile names
+            overwrite (bool, optional): overwrite the files if they exist.
+                Defaults to False.
+
+        Returns:
+            list[Path]: file paths of the tiles
+        """
+        tile_names = list(dict.fromkeys(tile_names))  # unique, in order
+        jobs = [
+            self._download_job(tile_name)
+            for tile_name in tile_names
+            if overwrite or not self.check_if_tile_exists(tile_name)
+        ]
+        if self._cache is not None:
+            self._cache.reserve(sum(job.expected_size or 0 for job in jobs))
+
+        self._downloader.download_many(jobs)
+
+        if self._cache is not None:
+            for job in jobs:
+                self._cache.add(job.destination)
+
+        return [self.get_tile_path(tile_name) for tile_name in tile_names]
+
+    def ensure_tile(self, tile_name: str) -> Path:
+        """Get the local file path of a tile, the tile is downloaded if missing (and
+        transcoded into a COG, if enabled).
+
+        Args:
+            tile_name (str): tile name
+
+        Returns:
+            Path: file path in the data folder, or the remote path in remote mode
+        """
+        if self._remote:
+            return self.get_remote_path(tile_name)
+
+        with self._lock:
+            tile_lock = self._tile_locks.setdefault(tile_name, threading.Lock())
+
+        # a tile is downloaded at most once, other tiles are downloaded meanwhile
+        with tile_lock:
+            return self._ensure_local_tile(tile_name)
 
-        download_file(download_url, str(tile_path))
+    def _ensure_local_tile(self, tile_name: str) -> Path:
+        tile_path = self.get_tile_path(tile_name)
+        served_path = self.get_served_path(tile_name)
+
+        if self._transcode_to_cog:
+            is_available = served_path.exists()
+        else:
+            is_available = self.check_if_tile_exists(tile_name)
+
+        if is_available:
+            if self._cache is not None:
+                self._cache.record_hit(served_path)
+            return served_path
+
+        if self._cache is not None:
+            self._cache.record_miss()
+
+        # the original tile must not be evicted before it is transcoded
+        with self._cache.pinned(tile_path) if self._cache is not None else nullcontext():
+            if not self.check_if_tile_exists(tile_name):
+                logger.info(f"Downloading tile data for {tile_name}")
+                self.download_tile(tile_name, overwrite=True)
+                logger.info("Download complete!")
+
+            if self._transcode_to_cog:
+                transcode_to_cog(tile_path, served_path)
+                if self._cache is not None:
+                    self._cache.remove(tile_path)
+                    self._cache.add(served_path)
+                else:
+                    tile_path.unlink()
+
+        return served_path
+
+    @contextmanager
+    def use_tile(self, tile_name: str):
+        """Context manager which provides the local file path of a tile, the tile is
+        downloaded if missing and pinned in the cache while the context is active.
+
+        Args:
+            tile_name (str): tile name
+
+        Yields:
+            Path: file path in the data folder
+        """
+        self.pin_tile(tile_name)
+        try:
+            yield self.ensure_tile(tile_name)
+        finally:
+            self.unpin_tile(tile_name)
+
+    def pin_tile(self, tile_name: str):
+        """Protect a tile from being evicted from the cache (no-op without cache)."""
+        if self._cache is not None and not self._remote:
+            self._cache.pin(self.get_served_path(tile_name))
+
+    def unpin_tile(self, tile_name: str):
+        if self._cache is not None and not self._remote:
+            self._cache.unpin(self.get_served_path(tile_name))
+
+    def acquire_tiles(self, tile_names: list[str]) -> list[Path]:
+        """Pin and provide several tiles, see `ensure_tile`. The tiles stay pinned until
+        they are released with `release_tiles`.
+
+        Args:
+            tile_names (list[str]): tile names
+
+        Returns:
+            list[Path]: file paths in the data folder
+        """
+        tile_paths = []
+        for i, tile_name in enumerate(tile_names):
+            self.pin_tile(tile_name)
+            try:
+                tile_paths.append(self.ensure_tile(tile_name))
+            except Exception:
+                self.release_tiles(tile_names[: i + 1])
+                raise
+        return tile_paths
+
+    def release_tiles(self, tile_names: list[str]):
+        for tile_name in tile_names:
+            self.unpin_tile(tile_name)
 
     @classmethod
     def from_tile_file(
@@ -165,21 +676,7 @@ class TileManager:
         Returns:
             TileManager: tile manager instance
         """
-        tile_info = pd.read_csv(tile_overview_path, sep=";", header=5)
-        tile_info["tile_name"] = tile_info["Kachelname"]
-
-        # the second, third and fourth part of the tile name are
-        # the x, y and extent in km, e.g.:
-        # dop10rgbi_32_478_5740_1_nw_2024 -> 478, 5740, 1
-        tile_extent = (
-            tile_info["tile_name"].str.split("_", expand=True).loc[:, 2:4].astype(int)
-            * 1000  # for km to m
-        )
-        tile_extent.columns = cls.extent_columns
-        tile_info = pd.concat([tile_info, tile_extent], axis=1)
-
-        tile_info = tile_info[["tile_name"] + cls.extent_columns]
-
+        tile_info = read_tile_overview_file(tile_overview_path)
         return cls(tile_info, data_folder=data_folder, tile_type=tile_type)
 
     @classmethod
@@ -192,46 +689,73 @@ class TileManager:
         """Read tile information from the HTML extraction result file created by
         the `scripts/extract_html_table.py` script.
 
-        E.g.
-        - `Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_4.tif` -> 280, 5648, 4
-        - `dop10rgbi_32_32280_5648_4_nw_2024.tif` -> 280, 5648, 4
-
-        Note, that the leading 32 in 32280 should be separated with "_", probably
-        an error in the naming of the data.
-
         Args:
             fp (str): file path
         """
-        tile_info = pd.read_csv(fp, sep=",")
-        tile_info["tile_name"] = tile_info["File"]
+        tile_info = read_html_extraction_file(fp)
+        return cls(tile_info, data_folder=data_folder, tile_type=tile_type)
 
-        if tile_type == DatasetType.AERIAL_IMAGE:
-            tile_extent = (
-                tile_info["tile_name"].str.split("_", expand=True).loc[:, 2:4].astype(int)
-                * 1000  # for km to m
-            )
-        else:
-            # Extract extent for other types
-            extent_list = list()
-            for name in tile_info["tile_name"]:
-                # remove file ending
-                name = name.split(".")[0]
-                name_split = name.split("_")
-                first_part = name_split[1]
-
-                # remove the leading "32"
-                first_part = first_part[2:]
-                min_x = int(first_part) * 1000
-                min_y = int(name_split[2]) * 1000
-                extent = int(name_split[3]) * 1000
-                extent_list.append({"min_x": min_x, "min_y": min_y, "extent": extent})
-
-            tile_extent = pd.DataFrame(extent_list)
-
-        tile_extent.columns = cls.extent_columns
-        tile_info = pd.concat([tile_info, tile_extent], axis=1)
 
-        return cls(tile_info, data_folder=data_folder, tile_type=tile_type)
+# x, y and extent (km) in tile names, the zone "32" is either separated by "_"
+# or directly prepended to the x value, e.g.:
+# - `dop10rgbi_32_478_5740_1_nw_2024` -> 478, 5740, 1
+# - `Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_4.tif` -> 280, 5648, 4
+_TILE_NAME_EXTENT_PATTERN = r"_32_?(?P<min_x>\d+)_(?P<min_y>\d+)_(?P<extent>\d+)"
+
+
+def parse_tile_extents(tile_names: pd.Series) -> pd.DataFrame:
+    """Parse the extent of tiles from their names (vectorized).
+
+    Args:
+        tile_names (pd.Series): tile names, with or without file extension
+
+    Raises:
+        ValueError: in case a tile name does not follow the nomenclature
+
+    Returns:
+        pd.DataFrame: `min_x`, `min_y` and `extent` in meters, same index as the input
+    """
+    extents = tile_names.str.extract(_TILE_NAME_EXTENT_PATTERN)
+
+    invalid = extents.isna().any(axis=1)
+    if invalid.any():
+        raise ValueError(f"Cannot parse tile name(s): {tile_names[invalid].head().tolist()}")
+
+    return extents.astype(np.int64) * 1000  # for km to m
+
+
+def read_tile_overview_file(fp) -> pd.DataFrame:
+    """Read the official overview CSV file like `dop_nw.csv` or `3dm_nw.csv`.
+
+    Args:
+        fp: file path or file-like object
+
+    Returns:
+        pd.DataFrame: columns `tile_name`, `min_x`, `min_y`, `extent` and `version` (date
+            of the acquisition, if listed)
+    """
+    tile_info = pd.read_csv(
+        fp, sep=";", header=5, usecols=lambda c: c in ("Kachelname", "Aktualitaet")
+    )
+    tile_info = tile_info.rename(columns={"Kachelname": "tile_name", "Aktualitaet": "version"})
+    return pd.concat([tile_info, parse_tile_extents(tile_info["tile_name"])], axis=1)
+
+
+def read_html_extraction_file(fp) -> pd.DataFrame:
+    """Read the HTML extraction result file created by the `scripts/extract_html_table.py`
+    script.
+
+    Args:
+        fp: file path or file-like object
+
+    Returns:
+        pd.DataFrame: columns `tile_name`, `min_x`, `min_y`, `extent` and `version` (date
+            of the publication, if listed)
+    """
+    # the listed size is rounded (e.g. "310 MB"), it cannot verify downloads
+    tile_info = pd.read_csv(fp, sep=",", usecols=lambda c: c in ("File", "Date"))
+    tile_info = tile_info.rename(columns={"File": "tile_name", "Date": "version"})
+    return pd.concat([tile_info, parse_tile_extents(tile_info["tile_name"])], axis=1)
 
 
 def get_bounding_box_from_tile_name(
@@ -256,13 +780,5 @@ def get_bounding_box_from_tile_name(
 
 
 def download_file(url: str, local_filename: str):
-    # NOTE the stream=True parameter below
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        with open(local_filename, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                # If you have chunk encoded response uncomment if
-                # and set chunk_size parameter to None.
-                # if chunk:
-                f.write(chunk)
+    TileDownloader(max_workers=1).download(url, local_filename)
     return local_filename
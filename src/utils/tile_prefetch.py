@@ -0,0 +1,163 @@
+"""
+Up-front planning of the tiles required for a set of buildings.
+
+The buildings are assigned to their tiles in one vectorized pass and processed tile by
+tile, while the upcoming tiles are downloaded in the background.
+"""
+
+from collections.abc import Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+
+from utils.building_artifact import CENTROID_COLUMNS, tile_key_column
+from utils.logging import get_library_logger
+from utils.spatial_ordering import SpatialOrdering, spatial_keys
+from utils.tile_management import TileManager
+from utils.transform import UTM_EPSG
+
+logger = get_library_logger(__name__)
+
+
+@dataclass
+class TilePlan:
+    """Buildings ordered tile by tile, with the tiles they require.
+
+    Attributes:
+        buildings: buildings with one tile name column per dataset, ordered by the
+            tile column used for processing
+        tiles: unique tile names per tile column, in processing order
+    """
+
+    buildings: gpd.GeoDataFrame
+    tiles: dict[str, list[str]]
+
+    def buildings_by_tile(self, tile_column: str) -> dict[str, gpd.GeoDataFrame]:
+        """Split the buildings by the tiles in `tile_column`."""
+        return dict(iter(self.buildings.groupby(tile_column, sort=False)))
+
+
+def plan_tiles(
+    buildings: gpd.GeoDataFrame,
+    tile_managers: Mapping[str, TileManager],
+    order_by: str | None = None,
+    ordering: SpatialOrdering | None = SpatialOrdering.HILBERT,
+) -> TilePlan:
+    """Determine the tiles required for each building and order the buildings tile by tile.
+
+    Buildings whose centroid is not covered by exactly one tile are dropped (and logged).
+    Precomputed tile keys and centroids of the building artifact are used where available,
+    see `utils.building_artifact`.
+
+    Args:
+        buildings (gpd.GeoDataFrame): buildings, e.g. from the `building-selector` output
+        tile_managers (Mapping[str, TileManager]): tile manager per output column, e.g.
+            `{"aerial_tile": ..., "energy_tile": ...}`
+        order_by (str | None, optional): tile column to group the buildings by.
+            Defaults to the first column of `tile_managers`.
+        ordering (SpatialOrdering | None, optional): order of the buildings within a tile,
+            along a space-filling curve through their centroids, see
+            `utils.spatial_ordering`. Defaults to a Hilbert curve, None keeps the order of
+            `buildings`.
+
+    Returns:
+        TilePlan: ordered buildings and required tiles
+    """
+    buildings = buildings.copy()
+
+    if set(CENTROID_COLUMNS).issubset(buildings.columns):
+        centroids_x, centroids_y = buildings[CENTROID_COLUMNS].to_numpy().T
+    else:
+        if buildings.crs is None:
+            buildings = buildings.set_crs("EPSG:4326")
+        centroids = buildings.geometry.to_crs(UTM_EPSG).centroid
+        centroids_x, centroids_y = centroids.x.to_numpy(), centroids.y.to_numpy()
+
+    is_valid = None
+    for tile_column, tile_manager in tile_managers.items():
+        key_column = tile_key_column(tile_column)
+        if key_column in buildings:
+            lookup = tile_manager.get_tile_names_for_keys(buildings[key_column])
+        else:
+            lookup = tile_manager.get_tile_names_for_points(centroids_x, centroids_y)
+        buildings[tile_column] = lookup.tile_names
+
+        is_valid = lookup.resolved if is_valid is None else is_valid & lookup.resolved
+        if len(lookup.missing) > 0 or len(lookup.ambiguous) > 0:
+            logger.warning(
+                f"{len(lookup.missing)} buildings without and {len(lookup.ambiguous)} "
+                f"buildings with multiple tiles for {tile_column}, they are skipped"
+            )
+
+    if is_valid is not None:
+        buildings = buildings[is_valid]
+        centroids_x, centroids_y = centroids_x[is_valid], centroids_y[is_valid]
+
+    order_by = order_by if order_by is not None else next(iter(tile_managers))
+
+    # tiles in the order of their first building
+    tile_order = {name: i for i, name in enumerate(buildings[order_by].unique())}
+    tile_positions = buildings[order_by].map(tile_order).to_numpy()
+
+    if ordering is not None:
+        # neighbouring buildings are processed one after another
+        keys = spatial_keys(centroids_x, centroids_y, ordering)
+        buildings = buildings.iloc[np.lexsort((keys, tile_positions))]
+    else:
+        # stable sort keeps the original order of the buildings within a tile
+        buildings = buildings.iloc[np.argsort(tile_positions, kind="stable")]
+
+    tiles = {
+        tile_column: buildings[tile_column].unique().tolist() for tile_column in tile_managers
+    }
+    return TilePlan(buildings=buildings, tiles=tiles)
+
+
+def iter_tiles_with_prefetch(
+    tile_manager: TileManager,
+    tile_names: list[str],
+    lookahead: int = 2,
+) -> Iterator[tuple[str, Path]]:
+    """Iterate over tiles, the next `lookahead` tiles are downloaded in the background
+    while the current one is processed. Tiles are pinned in the cache of the tile manager
+    from their scheduling until the consumer moves on to the next tile.
+
+    Args:
+        tile_manager (TileManager): tile manager of the dataset
+        tile_names (list[str]): tile names in processing order
+        lookahead (int, optional): number of tiles downloaded ahead. Defaults to 2.
+
+    Yields:
+        tuple[str, Path]: tile name and local file path
+    """
+    tile_names = list(tile_names)
+    futures: dict[int, Future] = {}
+
+    with ThreadPoolExecutor(max_workers=max(lookahead, 1)) as executor:
+
+        def schedule(i: int):
+            tile_manager.pin_tile(tile_names[i])
+            futures[i] = executor.submit(tile_manager.ensure_tile, tile_names[i])
+
+        try:
+            for i in range(min(lookahead + 1, len(tile_names))):
+                schedule(i)
+
+            for i, tile_name in enumerate(tile_names):
+                tile_path = futures[i].result()
+
+                if i + lookahead + 1 < len(tile_names):
+                    schedule(i + lookahead + 1)
+
+                yield tile_name, tile_path
+
+                del futures[i]
+                tile_manager.unpin_tile(tile_name)
+        finally:
+            # release the tiles of an aborted iteration
+            for i, future in futures.items():
+                future.cancel()
+                tile_manager.unpin_tile(tile_names[i])
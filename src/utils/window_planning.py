@@ -0,0 +1,197 @@
+"""
+Coalescing of many small raster window reads into few block-aligned reads.
+
+Crop windows of neighbouring buildings overlap and fall into the same internal blocks
+of a tile. Instead of decoding these blocks once per building, the windows are merged
+into block-aligned super-windows which are read once, the crops are sliced from them.
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from rasterio.io import DatasetReader
+from rasterio.windows import Window
+
+# row_start, row_stop, col_start, col_stop in pixels
+Extent = tuple[int, int, int, int]
+
+
+@dataclass
+class ReadPlan:
+    """Super-windows to read and the super-window each of the input windows is sliced from.
+
+    Attributes:
+        windows: block-aligned super-windows
+        assignment: index of the super-window per input window
+    """
+
+    windows: list[Window]
+    assignment: np.ndarray
+
+
+def _sample_indices(offset: float, length: float, size: int) -> np.ndarray:
+    # pixel centers of a nearest neighbour read of `size` pixels, as done by GDAL
+    return np.floor(offset + (np.arange(size) + 0.5) * length / size).astype(int)
+
+
+def window_pixel_extent(window: Window, shape: tuple[int, int]) -> Extent:
+    """Pixels touched by a full resolution read of a (fractional) window.
+
+    Args:
+        window (Window): window within the raster
+        shape (tuple[int, int]): output shape (height, width) of the read
+
+    Returns:
+        Extent: row_start, row_stop, col_start, col_stop (exclusive stop)
+    """
+    rows = _sample_indices(window.row_off, window.height, shape[0])
+    cols = _sample_indices(window.col_off, window.width, shape[1])
+    return int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+
+
+def align_to_blocks(
+    extent: Extent, block_shape: tuple[int, int], raster_shape: tuple[int, int]
+) -> Extent:
+    """Expand an extent to the internal blocks of the raster it touches."""
+    block_height, block_width = block_shape
+    row_start, row_stop, col_start, col_stop = extent
+    return (
+        row_start // block_height * block_height,
+        min(-(-row_stop // block_height) * block_height, raster_shape[0]),
+        col_start // block_width * block_width,
+        min(-(-col_stop // block_width) * block_width, raster_shape[1]),
+    )
+
+
+def _union(a: Extent, b: Extent) -> Extent:
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+def _intersects(a: Extent, b: Extent) -> bool:
+    return a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]
+
+
+def _num_pixels(extent: Extent) -> int:
+    return (extent[1] - extent[0]) * (extent[3] - extent[2])
+
+
+def plan_coalesced_reads(
+    extents: list[Extent],
+    block_shape: tuple[int, int],
+    raster_shape: tuple[int, int],
+    max_pixels: int = 4096 * 4096,
+) -> ReadPlan:
+    """Merge pixel extents sharing raster blocks into block-aligned super-windows.
+
+    Extents are merged as long as their block-aligned extents intersect and the merged
+    super-window does not exceed `max_pixels`.
+
+    Args:
+        extents (list[Extent]): pixel extents of the reads, see `window_pixel_extent`
+        block_shape (tuple[int, int]): internal block shape (height, width) of the raster
+        raster_shape (tuple[int, int]): raster shape (height, width)
+        max_pixels (int, optional): maximum number of pixels of a super-window.
+            Defaults to 4096 * 4096.
+
+    Returns:
+        ReadPlan: super-windows and the assignment of the extents
+    """
+    groups: list[Extent] = []
+    members: list[list[int]] = []
+
+    aligned = [align_to_blocks(extent, block_shape, raster_shape) for extent in extents]
+    for i in sorted(range(len(extents)), key=lambda i: (aligned[i][0], aligned[i][2])):
+        for g, group in enumerate(groups):
+            merged = _union(group, aligned[i])
+            if _intersects(group, aligned[i]) and _num_pixels(merged) <= max_pixels:
+                groups[g] = merged
+                members[g].append(i)
+                break
+        else:
+            groups.append(aligned[i])
+            members.append([i])
+
+    # grown super-windows may intersect each other now
+    merged_any = True
+    while merged_any:
+        merged_any = False
+        for g in range(len(groups)):
+            for h in range(g + 1, len(groups)):
+                merged = _union(groups[g], groups[h])
+                if _intersects(groups[g], groups[h]) and _num_pixels(merged) <= max_pixels:
+                    groups[g] = merged
+                    members[g] += members.pop(h)
+                    groups.pop(h)
+                    merged_any = True
+                    break
+            if merged_any:
+                break
+
+    assignment = np.empty(len(extents), dtype=int)
+    for g, group_members in enumerate(members):
+        assignment[group_members] = g
+
+    windows = [
+        Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+        for row_start, row_stop, col_start, col_stop in groups
+    ]
+    return ReadPlan(windows=windows, assignment=assignment)
+
+
+def slice_window(
+    data: np.ndarray, super_window: Window, window: Window, shape: tuple[int, int]
+) -> np.ndarray:
+    """Extract the full resolution read of `window` from the data of a super-window.
+
+    The result is identical to reading `window` with an output shape of `shape`.
+
+    Args:
+        data (np.ndarray): data of the super-window (bands, height, width)
+        super_window (Window): integer window `data` was read from
+        window (Window): (fractional) window within the super-window
+        shape (tuple[int, int]): output shape (height, width)
+
+    Returns:
+        np.ndarray: data of the window (bands, height, width)
+    """
+    rows = _sample_indices(window.row_off, window.height, shape[0]) - int(super_window.row_off)
+    cols = _sample_indices(window.col_off, window.width, shape[1]) - int(super_window.col_off)
+    return data[:, rows[:, None], cols[None, :]]
+
+
+def read_window(
+    dataset: DatasetReader, window: Window, indexes: list[int] | None = None
+) -> np.ndarray:
+    """Full resolution read of a (fractional) window from an integer-aligned read.
+
+    The result is identical to `dataset.read(indexes, window=window)` for a single
+    raster file. For VRT mosaics, GDAL rounds fractional windows per source, which
+    duplicates or drops pixels at the tile edges, an integer-aligned read avoids this.
+
+    Args:
+        dataset (DatasetReader): raster or mosaic
+        window (Window): (fractional) window, clipped to the raster
+        indexes (list[int] | None, optional): bands to read. Defaults to all bands.
+
+    Returns:
+        np.ndarray: data of the window (bands, height, width)
+    """
+    indexes = indexes if indexes is not None else list(dataset.indexes)
+
+    window = window.intersection(Window(0, 0, dataset.width, dataset.height))
+    # rasterio rounds half up, not half to even
+    shape = (math.floor(window.height + 0.5), math.floor(window.width + 0.5))
+    if shape[0] == 0 or shape[1] == 0:
+        return np.empty((len(indexes), *shape), dtype=dataset.dtypes[0])
+
+    row_start, row_stop, col_start, col_stop = window_pixel_extent(window, shape)
+    super_window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+    data = dataset.read(indexes, window=super_window)
+    rows = _sample_indices(window.row_off, window.height, shape[0])
+    cols = _sample_indices(window.col_off, window.width, shape[1])
+    if np.all(np.diff(rows) == 1) and np.all(np.diff(cols) == 1):
+        # every pixel of the super-window is sampled once, the data is used as is
+        return data
+    return slice_window(data, super_window, window, shape)
@@ -0,0 +1,86 @@
+import re
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with support for single HTTP Range requests."""
+
+    def __init__(self, *args, requests_log: list, **kwargs):
+        self._requests_log = requests_log
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self._requests_log.append((self.path, self.headers.get("Range")))
+
+        range_header = self.headers.get("Range")
+        if range_header is None:
+            return super().send_head()
+
+        path = self.translate_path(self.path)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        size = f.seek(0, 2)
+        start, end = re.match(r"bytes=(\d+)-(\d*)", range_header).groups()
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+
+        if start >= size:
+            f.close()
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        f.seek(start)
+        self._range_length = end - start + 1
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(self._range_length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        if self.headers.get("Range") is None:
+            return super().copyfile(source, outputfile)
+        outputfile.write(source.read(self._range_length))
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Local HTTP server (stand-in for OpenGeodata.NRW) serving the files in `root`.
+
+    Yields:
+        dict: `url` (base URL with trailing slash), `root` (served folder) and `requests`
+            (list of (path, range header) tuples of all received requests)
+    """
+    root = tmp_path / "server"
+    root.mkdir()
+    requests_log = []
+
+    handler = partial(RangeRequestHandler, directory=str(root), requests_log=requests_log)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield {
+        "url": f"http://127.0.0.1:{server.server_port}/",
+        "root": root,
+        "requests": requests_log,
+    }
+
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,54 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from utils.building_artifact import CROP_BOX_COLUMNS, add_building_columns, read_buildings
+
+
+def test_read_buildings_adds_columns(tmp_path):
+    outlines = [
+        shapely.box(280_010, 5_649_010, 280_030, 5_649_020),
+        shapely.Point(280_100, 5_649_100).buffer(3),
+    ]
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [1, 2]}, geometry=outlines, crs="EPSG:25832"
+    ).to_crs("EPSG:4326")
+    buildings.to_file(tmp_path / "buildings.gpkg", driver="GPKG")
+
+    result = read_buildings(tmp_path / "buildings.gpkg")
+
+    assert result.crs == "EPSG:25832"
+    np.testing.assert_allclose(result["centroid_x"], [280_020, 280_100], atol=1e-3)
+    np.testing.assert_allclose(result["centroid_y"], [5_649_015, 5_649_100], atol=1e-3)
+
+    # 20 m x 10 m building with a 5 m margin, squared
+    crop_box = result[CROP_BOX_COLUMNS].to_numpy()[0]
+    np.testing.assert_allclose(crop_box, [280_005, 5_649_000, 280_035, 5_649_030], atol=1e-3)
+
+    # squared boxes match the per-building computation
+    for outline, crop_box in zip(result.geometry, result[CROP_BOX_COLUMNS].to_numpy()):
+        envelope = outline.buffer(5).envelope
+        half_side = (
+            max(envelope.bounds[2] - envelope.bounds[0], envelope.bounds[3] - envelope.bounds[1])
+            / 2
+        )
+        center = envelope.centroid
+        assert tuple(crop_box) == (
+            center.x - half_side,
+            center.y - half_side,
+            center.x + half_side,
+            center.y + half_side,
+        )
+
+
+def test_read_buildings_keeps_artifact(tmp_path):
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [1]}, geometry=[shapely.box(0, 0, 10, 10)], crs="EPSG:25832"
+    )
+    artifact = add_building_columns(buildings, margin_around_building=2.0)
+    artifact.to_file(tmp_path / "buildings.gpkg", driver="GPKG")
+
+    result = read_buildings(tmp_path / "buildings.gpkg")
+
+    # the stored crop boxes are used as is
+    np.testing.assert_array_equal(result[CROP_BOX_COLUMNS].to_numpy(), [[-2, -2, 12, 12]])
@@ -0,0 +1,47 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from image_cropper.canvases import create_crops
+from utils.building_artifact import CROP_BOX_COLUMNS, add_building_columns
+
+
+def create_buildings() -> gpd.GeoDataFrame:
+    # a row of four touching houses and a detached one
+    outlines = [shapely.box(8 * k, 0, 8 * k + 8, 10) for k in range(4)]
+    outlines.append(shapely.box(100, 0, 110, 10))
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [10, 11, 12, 13, 14]}, geometry=outlines, crs="EPSG:25832"
+    )
+    return add_building_columns(buildings)
+
+
+def test_create_crops_without_canvases():
+    buildings = create_buildings()
+
+    crops = create_crops(buildings)
+
+    assert crops["crop_id"].tolist() == [10, 11, 12, 13, 14]
+    assert crops["building_ids"].tolist() == [[10], [11], [12], [13], [14]]
+    np.testing.assert_array_equal(
+        crops[CROP_BOX_COLUMNS].to_numpy(), buildings[CROP_BOX_COLUMNS].to_numpy()
+    )
+
+
+def test_create_crops_with_canvases():
+    buildings = create_buildings()
+
+    crops = create_crops(buildings, max_canvas_size=50)
+
+    assert crops["crop_id"].tolist() == [10, 14]
+    assert crops["building_ids"].tolist() == [[10, 11, 12, 13], [14]]
+
+    # square canvas around the (square) crop boxes of the row
+    min_x, min_y, max_x, max_y = crops[CROP_BOX_COLUMNS].to_numpy()[0]
+    assert max_x - min_x == max_y - min_y
+    np.testing.assert_allclose([min_x, max_x, (min_y + max_y) / 2], [-6, 38, 5], atol=1e-9)
+
+    # the canvas size is capped, the row is split
+    crops = create_crops(buildings, max_canvas_size=30)
+    assert all(len(building_ids) < 4 for building_ids in crops["building_ids"])
+    assert sorted(sum(crops["building_ids"], [])) == [10, 11, 12, 13, 14]
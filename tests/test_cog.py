@@ -0,0 +1,32 @@
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from utils.cog import transcode_to_cog
+
+
+def test_transcode_to_cog(tmp_path):
+    data = np.random.default_rng(0).integers(0, 255, size=(3, 1024, 1024), dtype=np.uint8)
+    src_path = tmp_path / "tile.tif"
+    with rasterio.open(
+        src_path,
+        "w",
+        driver="GTiff",
+        width=1024,
+        height=1024,
+        count=3,
+        dtype="uint8",
+        crs="EPSG:25832",
+        transform=from_origin(280_000, 5_649_000, 0.1, 0.1),
+    ) as dst:
+        dst.write(data)
+
+    cog_path = transcode_to_cog(src_path, tmp_path / "tile.cog.tif")
+
+    with rasterio.open(cog_path) as src:
+        assert src.block_shapes == [(512, 512)] * 3
+        assert src.overviews(1) != []
+        assert src.transform == from_origin(280_000, 5_649_000, 0.1, 0.1)
+        np.testing.assert_array_equal(src.read(), data)
+
+    assert not (tmp_path / "tile.cog.tif.tmp").exists()
@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import rasterio.windows
+from rasterio.transform import from_origin
+
+from image_cropper.crop_images import (
+    create_transform_for_scaled_crop,
+    crop_tile,
+    crop_tiles_with_process_pool,
+    extract_crops,
+    find_neighbour_tiles,
+    get_crop_size,
+    plan_crop_jobs,
+    plan_read_tasks,
+    read_task_data,
+)
+from utils.building_artifact import CROP_BOX_COLUMNS
+from utils.crop_store import TRANSFORM_COLUMNS, CropStore, merge_index_parts
+from utils.opengeodata_nrw import DatasetType
+from utils.raster_pool import RasterDatasetPool
+from utils.tile_management import TileManager
+
+
+@pytest.mark.parametrize("target_size", [None, 256, 64])
+def test_scaled_crop_covers_crop_window(target_size):
+    tile_transform = from_origin(280_000, 5_649_000, 0.1, 0.1)
+    bounds = (280_100.03, 5_648_200.01, 280_130.53, 5_648_230.51)
+    crop_window = rasterio.windows.from_bounds(*bounds, transform=tile_transform)
+
+    crop_size = get_crop_size(round(crop_window.width), target_size)
+    transform = create_transform_for_scaled_crop(tile_transform, crop_window, crop_size)
+
+    assert crop_size == (305 if target_size is None else min(305, target_size))
+
+    x_min, y_max = transform * (0, 0)
+    x_max, y_min = transform * (crop_size, crop_size)
+    tolerance = 0.1 if target_size is None else 1e-6
+    assert (x_min, y_max) == pytest.approx((bounds[0], bounds[3]), abs=1e-6)
+    assert (x_max, y_min) == pytest.approx((bounds[2], bounds[1]), abs=tolerance)
+
+
+AERIAL_TILE_NAMES = ["west", "east"]
+
+
+def create_aerial_scene(tile_folder):
+    """Two adjacent 50m aerial image tiles (0.1m pixels) with crops in both of them and
+    across the tile edge, and a single tile of the whole area."""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(4, 500, 1000), dtype=np.uint8)
+
+    profile = dict(count=4, dtype=np.uint8, crs="EPSG:25832", tiled=True)
+    for i, tile_name in enumerate(AERIAL_TILE_NAMES):
+        with rasterio.open(
+            tile_folder / f"{tile_name}.jp2",
+            "w",
+            driver="JP2OpenJPEG",
+            width=500,
+            height=500,
+            transform=from_origin(280_000 + i * 50, 5_648_050, 0.1, 0.1),
+            QUALITY=100,
+            REVERSIBLE=True,
+            **profile,
+        ) as dst:
+            dst.write(image[:, :, i * 500 : (i + 1) * 500])
+    with rasterio.open(
+        tile_folder / "merged.tif",
+        "w",
+        driver="GTiff",
+        width=1000,
+        height=500,
+        transform=from_origin(280_000, 5_648_050, 0.1, 0.1),
+        **profile,
+    ) as dst:
+        dst.write(image)
+
+    def crops_of(min_xs: list[float], crop_ids: list[int]) -> pd.DataFrame:
+        crops = pd.DataFrame(
+            [(x, 5_648_020.03, x + 8.35, 5_648_028.38) for x in min_xs],
+            columns=CROP_BOX_COLUMNS,
+        )
+        crops.insert(0, "crop_id", crop_ids)
+        crops.insert(1, "building_ids", [[crop_id] for crop_id in crop_ids])
+        return crops
+
+    # crops 3 and 6 cross the tile edge
+    crops_by_tile = {
+        AERIAL_TILE_NAMES[0]: crops_of([280_005.02, 280_020.51, 280_045.27], [1, 2, 3]),
+        AERIAL_TILE_NAMES[1]: crops_of([280_060.3, 280_080.84, 280_047.44], [4, 5, 6]),
+    }
+    tile_info = pd.DataFrame(
+        {
+            "tile_name": AERIAL_TILE_NAMES,
+            "min_x": [280_000, 280_050],
+            "min_y": 5_648_000,
+            "extent": 50,
+        }
+    )
+    return tile_info, crops_by_tile
+
+
+def read_crop_store(folder) -> tuple[pd.DataFrame, dict[int, np.ndarray]]:
+    crop_store = CropStore(folder)
+    images = {
+        building_id: np.array(crop_store.get_image(building_id))
+        for building_id in crop_store.building_ids
+    }
+    return crop_store.index, images
+
+
+@pytest.mark.parametrize("target_size", [None, 64])
+def test_crop_tile_matches_sequential_reads(tmp_path, target_size):
+    tile_info, crops_by_tile = create_aerial_scene(tmp_path)
+    tile_manager = TileManager(tile_info, data_folder=tmp_path, tile_type=DatasetType.AERIAL_IMAGE)
+
+    tile_name, neighbour_tile_name = AERIAL_TILE_NAMES
+    tile_crops = crops_by_tile[tile_name]
+    assert find_neighbour_tiles(tile_crops, tile_manager, tile_name) == [neighbour_tile_name]
+
+    index_part_path = crop_tile(
+        tile_name,
+        tile_manager.get_tile_path(tile_name),
+        tile_crops,
+        tmp_path / "crops",
+        neighbour_tile_paths=[tile_manager.get_tile_path(neighbour_tile_name)],
+        target_size=target_size,
+        raster_pool=RasterDatasetPool(),
+        read_threads=3,
+        compute_threads=2,
+    )
+    merge_index_parts(tmp_path / "crops", [index_part_path])
+    index, images = read_crop_store(tmp_path / "crops")
+
+    # the same reads one after another, crops across the tile edge from the merged tile
+    expected = dict()
+    with rasterio.open(tile_manager.get_tile_path(tile_name)) as tile:
+        crop_jobs, outside_positions = plan_crop_jobs(tile_crops, tile, target_size)
+        read_tasks = plan_read_tasks(tile, crop_jobs, coalesce=target_size is None)
+        for read_task in read_tasks:
+            for crop_job, image in extract_crops(read_task, read_task_data(tile, read_task)):
+                expected[crop_job.crop_id] = (image, crop_job, tile.transform)
+    with rasterio.open(tmp_path / "merged.tif") as merged:
+        crop_jobs, _ = plan_crop_jobs(
+            tile_crops.iloc[outside_positions], merged, target_size, positions=outside_positions
+        )
+        for read_task in plan_read_tasks(merged, crop_jobs, coalesce=True):
+            for crop_job, image in extract_crops(read_task, read_task_data(merged, read_task)):
+                expected[crop_job.crop_id] = (image, crop_job, merged.transform)
+
+    # crops are written in the order of the reads, the edge crop last
+    assert index["crop_id"].tolist() == [1, 2, 3]
+    assert sorted(expected) == [1, 2, 3]
+    for crop_id, (image, crop_job, transform) in expected.items():
+        np.testing.assert_array_equal(images[crop_id], np.moveaxis(image, 0, -1)[..., :3])
+        row = index.set_index("crop_id").loc[crop_id]
+        assert (
+            tuple(row[TRANSFORM_COLUMNS])
+            == tuple(
+                create_transform_for_scaled_crop(transform, crop_job.crop_window, crop_job.size)
+            )[:6]
+        )
+
+
+def test_process_pool_matches_single_worker(tmp_path):
+    tile_info, crops_by_tile = create_aerial_scene(tmp_path)
+    tile_manager = TileManager(tile_info, data_folder=tmp_path, tile_type=DatasetType.AERIAL_IMAGE)
+    neighbour_tiles = {
+        tile_name: find_neighbour_tiles(tile_crops, tile_manager, tile_name)
+        for tile_name, tile_crops in crops_by_tile.items()
+    }
+
+    def run(workers: int) -> tuple[pd.DataFrame, dict[int, np.ndarray]]:
+        output_location = tmp_path / f"crops_{workers}"
+        index_part_paths = crop_tiles_with_process_pool(
+            tile_manager,
+            [(tile_name, tile_manager.ensure_tile(tile_name)) for tile_name in AERIAL_TILE_NAMES],
+            crops_by_tile,
+            neighbour_tiles,
+            output_location,
+            workers=workers,
+            num_decode_threads="1",
+        )
+        merge_index_parts(
+            output_location, [index_part_paths[tile_name] for tile_name in AERIAL_TILE_NAMES]
+        )
+        return read_crop_store(output_location)
+
+    index, images = run(workers=1)
+    assert sorted(index["crop_id"]) == [1, 2, 3, 4, 5, 6]
+
+    parallel_index, parallel_images = run(workers=2)
+    pd.testing.assert_frame_equal(parallel_index, index)
+    assert images.keys() == parallel_images.keys()
+    for building_id, image in images.items():
+        np.testing.assert_array_equal(parallel_images[building_id], image)
+
+
+def test_full_resolution_crops_match_window_reads(tmp_path):
+    create_aerial_scene(tmp_path)
+    tile_path = tmp_path / f"{AERIAL_TILE_NAMES[0]}.jp2"
+
+    # crop boxes off the pixel grid
+    rng = np.random.default_rng(0)
+    min_xy = rng.uniform([280_001, 5_648_001], [280_035, 5_648_035], size=(20, 2))
+    sizes = rng.uniform(3, 12, size=(20, 1))
+    tile_crops = pd.DataFrame(np.hstack([min_xy, min_xy + sizes]), columns=CROP_BOX_COLUMNS)
+    tile_crops.insert(0, "crop_id", np.arange(1, 21))
+    tile_crops.insert(1, "building_ids", [[crop_id] for crop_id in tile_crops["crop_id"]])
+
+    index_part_path = crop_tile(
+        AERIAL_TILE_NAMES[0],
+        tile_path,
+        tile_crops,
+        tmp_path / "crops",
+        raster_pool=RasterDatasetPool(),
+    )
+    merge_index_parts(tmp_path / "crops", [index_part_path])
+    index, images = read_crop_store(tmp_path / "crops")
+    index = index.set_index("crop_id")
+
+    # without a target size, crops are the plain (nearest neighbour) window reads of the tile
+    with rasterio.open(tile_path) as tile:
+        for crop_id, crop_box in zip(tile_crops["crop_id"], tile_crops[CROP_BOX_COLUMNS].values):
+            crop_window = rasterio.windows.from_bounds(*crop_box, transform=tile.transform)
+            image = np.moveaxis(tile.read(window=crop_window)[:3], 0, -1)
+            np.testing.assert_array_equal(images[crop_id], image)
+            assert (
+                tuple(index.loc[crop_id, TRANSFORM_COLUMNS])
+                == tuple(rasterio.windows.transform(crop_window, tile.transform))[:6]
+            )
@@ -0,0 +1,74 @@
+import affine
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.crop_store import CropStore, CropStoreWriter, merge_index_parts
+
+
+def test_crop_store_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    crops = {
+        building_id: rng.integers(0, 255, size=(size, size, 3), dtype=np.uint8)
+        for building_id, size in [(1, 20), (2, 30), (3, 25)]
+    }
+    transform = affine.Affine(0.1, 0.0, 280_000.0, 0.0, -0.1, 5_649_000.0)
+
+    index_parts = []
+    for prefix, building_ids in [("tile_b", [3]), ("tile_a", [1, 2])]:
+        # tiny shards, each crop ends up in its own shard
+        with CropStoreWriter(tmp_path, prefix=prefix, max_shard_bytes=1_000) as writer:
+            for building_id in building_ids:
+                writer.append(building_id, crops[building_id], transform)
+        index_parts.append(writer.index_part_path)
+
+    merge_index_parts(tmp_path, index_parts)
+    assert not any(path.exists() for path in index_parts)
+
+    crop_store = CropStore(tmp_path)
+    assert crop_store.building_ids.tolist() == [3, 1, 2]
+    assert crop_store.index["shard"].tolist() == [
+        "tile_b-00000.bin",
+        "tile_a-00000.bin",
+        "tile_a-00001.bin",
+    ]
+
+    for building_id, crop in crops.items():
+        image = crop_store.get_image(building_id)
+        np.testing.assert_array_equal(image, crop)
+        assert isinstance(image.base, np.memmap)
+        assert crop_store.get_transform(building_id) == transform
+
+    (png_path,) = crop_store.export_png(tmp_path / "png", building_ids=[2])
+    np.testing.assert_array_equal(np.asarray(Image.open(png_path)), crops[2])
+
+
+def test_crop_store_shared_canvas(tmp_path):
+    canvas = np.zeros((40, 40, 3), dtype=np.uint8)
+    transform = affine.Affine(0.1, 0.0, 280_000.0, 0.0, -0.1, 5_649_000.0)
+
+    with CropStoreWriter(tmp_path, prefix="tile") as writer:
+        writer.append(7, canvas, transform, building_ids=[7, 8, 9])
+        writer.append(10, canvas[:20, :20], transform)
+    merge_index_parts(tmp_path, [writer.index_part_path])
+
+    crop_store = CropStore(tmp_path)
+    assert crop_store.building_ids.tolist() == [7, 8, 9, 10]
+    assert crop_store.crop_ids.tolist() == [7, 10]
+    assert crop_store.get_image(9).shape == (40, 40, 3)
+
+    # the canvas is exported once
+    paths = crop_store.export_png(tmp_path / "png", building_ids=[8, 9])
+    assert [path.name for path in paths] == ["7.png"]
+
+
+def test_crop_store_writer_failure(tmp_path):
+    transform = affine.Affine(0.1, 0.0, 280_000.0, 0.0, -0.1, 5_649_000.0)
+
+    with pytest.raises(RuntimeError):
+        with CropStoreWriter(tmp_path, prefix="tile") as writer:
+            writer.append(1, np.zeros((20, 20, 3), dtype=np.uint8), transform)
+            raise RuntimeError("reading the tile failed")
+
+    # no index part of the incomplete tile
+    assert not writer.index_part_path.exists()
@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pytest
+
+from utils.download import DownloadJob, TileDownloader
+from utils.opengeodata_nrw import DatasetType
+from utils.tile_management import TileManager
+
+
+def test_download_many(http_server, tmp_path):
+    contents = {f"tile_{i}.jp2": os.urandom(10_000 + i) for i in range(4)}
+    for name, content in contents.items():
+        (http_server["root"] / name).write_bytes(content)
+
+    jobs = [
+        DownloadJob(http_server["url"] + name, tmp_path / "data" / name, len(content))
+        for name, content in contents.items()
+    ]
+    paths = TileDownloader(max_workers=2, chunk_size=1024).download_many(jobs)
+
+    assert [p.read_bytes() for p in paths] == list(contents.values())
+    assert not list((tmp_path / "data").glob("*.part"))
+
+
+def test_download_resumes_partial_file(http_server, tmp_path):
+    content = os.urandom(50_000)
+    (http_server["root"] / "tile.jp2").write_bytes(content)
+
+    destination = tmp_path / "tile.jp2"
+    (tmp_path / "tile.jp2.part").write_bytes(content[:20_000])
+
+    TileDownloader().download(http_server["url"] + "tile.jp2", destination, len(content))
+
+    assert destination.read_bytes() == content
+    assert http_server["requests"] == [("/tile.jp2", "bytes=20000-")]
+
+
+def test_download_size_mismatch(http_server, tmp_path):
+    (http_server["root"] / "tile.jp2").write_bytes(os.urandom(1_000))
+
+    destination = tmp_path / "tile.jp2"
+    with pytest.raises(OSError, match="failed"):
+        TileDownloader(max_retries=2).download(
+            http_server["url"] + "tile.jp2", destination, expected_size=2_000
+        )
+
+    assert not destination.exists()
+
+
+def test_tile_manager_download_tiles(http_server, tmp_path):
+    tile_names = ["dop10rgbi_32_478_5740_1_nw_2024", "dop10rgbi_32_478_5739_1_nw_2024"]
+    for tile_name in tile_names:
+        (http_server["root"] / f"{tile_name}.jp2").write_bytes(os.urandom(5_000))
+
+    tile_info = pd.DataFrame(
+        {
+            "tile_name": tile_names,
+            "min_x": [478_000, 478_000],
+            "min_y": [5740_000, 5739_000],
+            "extent": [1000, 1000],
+            "size": [5_000, 5_000],
+        }
+    )
+    tile_manager = TileManager(
+        tile_info,
+        data_folder=tmp_path / "data",
+        tile_type=DatasetType.AERIAL_IMAGE,
+        base_url=http_server["url"],
+    )
+
+    # a truncated tile from a killed job must not count as existing
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / f"{tile_names[0]}.jp2").write_bytes(b"truncated")
+    assert not tile_manager.check_if_tile_exists(tile_names[0])
+
+    paths = tile_manager.download_tiles(tile_names)
+
+    assert all(tile_manager.check_if_tile_exists(tile_name) for tile_name in tile_names)
+    assert [p.name for p in paths] == [f"{tile_name}.jp2" for tile_name in tile_names]
@@ -0,0 +1,334 @@
+import shutil
+
+import affine
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import shapely
+from PIL import Image
+from rasterio.transform import from_origin
+
+from energy_extractor.energy_extraction import (
+    BuildingYieldData,
+    EnergyEngine,
+    assign_energy_datasets,
+    compute_building_energy,
+    extract_dataset_energy,
+    extract_tile_energy,
+)
+from energy_extractor.potential_cache import PotentialEnergyCache
+from energy_extractor.sweep import sweep_energy
+from energy_extractor.zonal import compute_energy, compute_footprints
+from utils.building_artifact import CENTROID_COLUMNS
+from utils.crop_store import TRANSFORM_COLUMNS
+from utils.opengeodata_nrw import DatasetType
+from utils.raster_pool import RasterDatasetPool
+from utils.tile_management import TileManager
+
+
+@pytest.mark.parametrize("pixel_size", [0.5, 1.0])
+def test_energy_follows_pixel_size(pixel_size):
+    # 20m x 20m area of 900 kWh/m², the outline is aligned with both grids
+    size = int(20 / pixel_size)
+    yield_data = np.full((size, size), 900, dtype=np.float32)
+    yield_transform = affine.Affine(pixel_size, 0, 0, 0, -pixel_size, 20)
+    outline = shapely.box(2, 3, 9, 7)
+    segmentation_mask = np.full((40, 40), 255, dtype=np.uint8)
+
+    energy = compute_building_energy(
+        BuildingYieldData(
+            building_order=0,
+            building_id=1,
+            building_polygon_utm=outline,
+            yield_data=yield_data.copy(),
+            yield_transform=yield_transform,
+            segmentation_mask=np.full(yield_data.shape, 255, dtype=np.uint8),
+        ),
+        no_data_value=None,
+        segmentation_threshold=0.5,
+        efficiency=0.2,
+    )
+    np.testing.assert_allclose(energy["potential_energy_kWh"], 7 * 4 * 900)
+    np.testing.assert_allclose(energy["actual_energy_kWh"], 7 * 4 * 900)
+
+    # the crop covers the whole area with 0.5m pixels
+    crops = pd.DataFrame({"building_id": [1], "crop_id": [1], "width": 40, "height": 40})
+    crops[TRANSFORM_COLUMNS] = (0.5, 0, 0, 0, -0.5, 20)
+    crops = crops.set_index("building_id")
+
+    footprints = compute_footprints(
+        np.array([outline]), yield_data, yield_transform, no_data_value=None
+    )
+    zonal_energy = compute_energy(
+        np.array([1]),
+        footprints,
+        crops,
+        {1: segmentation_mask}.__getitem__,
+        segmentation_threshold=0.5,
+        efficiency=0.2,
+    )
+    np.testing.assert_allclose(zonal_energy["potential_energy_kWh"], 7 * 4 * 900)
+
+
+def test_assign_energy_datasets():
+    buildings = gpd.GeoDataFrame(
+        geometry=[shapely.box(0, 0, 2, 2), shapely.box(10, 0, 12, 2), shapely.box(20, 0, 22, 2)],
+        crs="EPSG:25832",
+    )
+    buildings[CENTROID_COLUMNS] = [[1, 1], [11, 1], [21, 1]]
+    regions = gpd.GeoDataFrame(
+        {"dataset": ["energy_yield_100cm", "energy_yield_50cm"]},
+        geometry=[shapely.box(5, -5, 25, 5), shapely.box(15, -5, 30, 5)],
+        crs="EPSG:25832",
+    )
+
+    datasets = assign_energy_datasets(buildings, DatasetType.ENERGY_YIELD_50CM, regions)
+
+    # the first region wins where regions overlap
+    assert datasets.tolist() == [
+        DatasetType.ENERGY_YIELD_50CM,
+        DatasetType.ENERGY_YIELD_100CM,
+        DatasetType.ENERGY_YIELD_100CM,
+    ]
+
+    with pytest.raises(ValueError):
+        assign_energy_datasets(buildings, DatasetType.AERIAL_IMAGE)
+
+
+ENERGY_TILE_NAMES = [
+    "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_1",
+    "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32281_5648_1",
+]
+
+
+def create_energy_scene(tile_folder, segmentation_folder):
+    """Two adjacent 1km energy yield tiles with buildings in both of them and along the
+    tile edge, one 20m crop with a random segmentation result per building."""
+    rng = np.random.default_rng(0)
+    for i, tile_name in enumerate(ENERGY_TILE_NAMES):
+        with rasterio.open(
+            tile_folder / f"{tile_name}.tif",
+            "w",
+            driver="GTiff",
+            width=2000,
+            height=2000,
+            count=1,
+            dtype=np.float32,
+            crs="EPSG:25832",
+            transform=from_origin(280_000 + i * 1000, 5_649_000, 0.5, 0.5),
+            nodata=-9999,
+            tiled=True,
+            compress="deflate",
+        ) as dst:
+            dst.write(rng.uniform(800, 1000, size=(2000, 2000)).astype(np.float32), 1)
+
+    min_xs = [280_100.3, 280_500.0, 280_992.1, 281_300.7, 281_700.2, 281_701.4]
+    outlines = [shapely.box(x, 5_648_500, x + 9.5, 5_648_507.2) for x in min_xs]
+    buildings = gpd.GeoDataFrame(
+        {"building_id": np.arange(10, 10 + len(outlines))},
+        geometry=outlines,
+        crs="EPSG:25832",
+    )
+
+    crops = pd.DataFrame(
+        {"building_id": buildings["building_id"], "crop_id": buildings["building_id"]}
+    )
+    crops["width"] = crops["height"] = 200
+    crops[TRANSFORM_COLUMNS] = [
+        (0.1, 0, outline.centroid.x - 10, 0, -0.1, outline.centroid.y + 10) for outline in outlines
+    ]
+    crops = crops.set_index("building_id")
+
+    for crop_id in crops["crop_id"]:
+        mask = rng.integers(0, 256, size=(200, 200), dtype=np.uint8)
+        Image.fromarray(mask).save(segmentation_folder / f"{crop_id}.bmp")
+
+    tile_info = pd.DataFrame(
+        {
+            "tile_name": ENERGY_TILE_NAMES,
+            "min_x": [280_000, 281_000],
+            "min_y": 5_648_000,
+            "extent": 1000,
+            "version": "2023-11-20",
+        }
+    )
+    return tile_info, buildings, crops
+
+
+def test_potential_cache_skips_cached_tiles(http_server, tmp_path):
+    segmentation_folder = tmp_path / "segmentation"
+    segmentation_folder.mkdir()
+    tile_info, buildings, crops = create_energy_scene(http_server["root"], segmentation_folder)
+
+    def run(potential_cache: PotentialEnergyCache, raster_pool: RasterDatasetPool):
+        tile_manager = TileManager(
+            tile_info,
+            data_folder=tmp_path / "data",
+            tile_type=DatasetType.ENERGY_YIELD_50CM,
+            base_url=http_server["url"],
+        )
+        return extract_dataset_energy(
+            tile_manager,
+            buildings,
+            crops,
+            segmentation_folder,
+            engine=EnergyEngine.ZONAL,
+            potential_cache=potential_cache,
+            raster_pool=raster_pool,
+            segmentation_threshold=0.5,
+            efficiency=0.2,
+        )
+
+    with PotentialEnergyCache(tmp_path / "potential.sqlite") as potential_cache:
+        energy = run(potential_cache, RasterDatasetPool())
+        assert len(http_server["requests"]) > 0
+
+    # a fresh node: the tiles are gone, the cache is kept
+    shutil.rmtree(tmp_path / "data")
+    http_server["requests"].clear()
+
+    with PotentialEnergyCache(tmp_path / "potential.sqlite") as potential_cache:
+        raster_pool = RasterDatasetPool()
+        cached_energy = run(potential_cache, raster_pool)
+
+        # the listed tile version identifies the cached tiles without a download
+        assert http_server["requests"] == []
+        assert raster_pool.stats.opens == 0
+        assert potential_cache.stats.misses == 0
+
+    assert sorted(cached_energy, key=lambda s: s["building_order"]) == sorted(
+        energy, key=lambda s: s["building_order"]
+    )
+
+
+def test_window_engine_reads_across_tile_edge(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.uniform(800, 1000, size=(100, 200)).astype(np.float32)
+
+    def write_tile(name: str, tile_data: np.ndarray, left: float):
+        with rasterio.open(
+            tmp_path / f"{name}.tif",
+            "w",
+            driver="GTiff",
+            width=tile_data.shape[1],
+            height=tile_data.shape[0],
+            count=1,
+            dtype=np.float32,
+            crs="EPSG:25832",
+            transform=from_origin(left, 5_649_050, 0.5, 0.5),
+        ) as dst:
+            dst.write(tile_data, 1)
+        return tmp_path / f"{name}.tif"
+
+    left_tile = write_tile("left", data[:, :100], 280_000)
+    right_tile = write_tile("right", data[:, 100:], 280_050)
+    merged_tile = write_tile("merged", data, 280_000)
+
+    # the crop of the second building crosses the tile edge
+    outlines = [
+        shapely.box(280_010, 5_649_020, 280_018, 5_649_026),
+        shapely.box(280_041, 5_649_020, 280_047.5, 5_649_026),
+    ]
+    buildings = gpd.GeoDataFrame({"building_id": [1, 2]}, geometry=outlines, crs="EPSG:25832")
+    crops = pd.DataFrame({"building_id": [1, 2], "crop_id": [1, 2], "width": 200, "height": 200})
+    crops[TRANSFORM_COLUMNS] = [
+        (0.1, 0, outline.centroid.x - 10, 0, -0.1, outline.centroid.y + 10) for outline in outlines
+    ]
+    crops = crops.set_index("building_id")
+    for crop_id in crops["crop_id"]:
+        mask = rng.integers(0, 256, size=(200, 200), dtype=np.uint8)
+        Image.fromarray(mask).save(tmp_path / f"{crop_id}.bmp")
+
+    kwargs = dict(segmentation_threshold=0.5, efficiency=0.2, read_threads=2)
+    result = extract_tile_energy(
+        "left",
+        left_tile,
+        buildings,
+        crops,
+        tmp_path,
+        neighbour_tile_paths={"right": right_tile},
+        raster_pool=RasterDatasetPool(),
+        **kwargs,
+    )
+    expected = extract_tile_energy(
+        "merged",
+        merged_tile,
+        buildings,
+        crops,
+        tmp_path,
+        raster_pool=RasterDatasetPool(),
+        **kwargs,
+    )
+    assert result.energy_stats == expected.energy_stats
+
+
+@pytest.mark.parametrize("engine", [EnergyEngine.WINDOW, EnergyEngine.ZONAL])
+def test_worker_processes_match_sequential(tmp_path, engine):
+    tile_folder = tmp_path / "data"
+    segmentation_folder = tmp_path / "segmentation"
+    tile_folder.mkdir()
+    segmentation_folder.mkdir()
+    tile_info, buildings, crops = create_energy_scene(tile_folder, segmentation_folder)
+
+    def run(workers: int) -> list[dict]:
+        tile_manager = TileManager(
+            tile_info, data_folder=tile_folder, tile_type=DatasetType.ENERGY_YIELD_50CM
+        )
+        return extract_dataset_energy(
+            tile_manager,
+            buildings,
+            crops,
+            segmentation_folder,
+            engine=engine,
+            raster_pool=RasterDatasetPool(),
+            workers=workers,
+            segmentation_threshold=0.5,
+            efficiency=0.2,
+        )
+
+    energy = run(workers=1)
+    assert sorted(stats["building_id"] for stats in energy) == buildings["building_id"].tolist()
+
+    # per-tile results are merged in the same order, with identical values
+    assert run(workers=2) == energy
+
+
+@pytest.mark.parametrize("engine", [EnergyEngine.WINDOW, EnergyEngine.ZONAL])
+def test_sweep_matches_single_threshold(tmp_path, engine):
+    tile_folder = tmp_path / "data"
+    segmentation_folder = tmp_path / "segmentation"
+    tile_folder.mkdir()
+    segmentation_folder.mkdir()
+    tile_info, buildings, crops = create_energy_scene(tile_folder, segmentation_folder)
+    tile_manager = TileManager(
+        tile_info, data_folder=tile_folder, tile_type=DatasetType.ENERGY_YIELD_50CM
+    )
+
+    def run(**kwargs) -> pd.DataFrame:
+        energy = extract_dataset_energy(
+            tile_manager,
+            buildings,
+            crops,
+            segmentation_folder,
+            engine=engine,
+            raster_pool=RasterDatasetPool(),
+            efficiency=0.2,
+            **kwargs,
+        )
+        return pd.DataFrame(energy).sort_values("building_order", ignore_index=True)
+
+    # thresholds on the segmentation levels (127 / 255, 128 / 255) and in between
+    thresholds = [0.0, 0.3, 127 / 255, 0.5, 128 / 255, 254 / 255, 1.0]
+    sweep = sweep_energy(run(segmentation_threshold=0.5, sweep=True), thresholds, [0.2])
+
+    for threshold in thresholds:
+        energy = run(segmentation_threshold=threshold)
+        assert energy["actual_energy_kWh"].gt(0).any() or threshold >= 254 / 255
+
+        swept = sweep[sweep["segmentation_threshold"] == threshold].reset_index(drop=True)
+        assert swept["building_id"].tolist() == energy["building_id"].tolist()
+        # the single threshold sums the float32 yields in float32, the histograms in float64
+        for column in ["actual_energy_kWh", "mined_energy_kWh", "potential_energy_kWh"]:
+            np.testing.assert_allclose(swept[column], energy[column], rtol=1e-6)
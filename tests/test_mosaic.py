@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import from_bounds
+
+from utils.mosaic import open_mosaic
+from utils.window_planning import read_window
+
+
+def write_tile(path, data: np.ndarray, left: float, top: float, res: float = 0.5):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=data.shape[2],
+        height=data.shape[1],
+        count=data.shape[0],
+        dtype=data.dtype,
+        crs="EPSG:25832",
+        transform=from_origin(left, top, res, res),
+    ) as dst:
+        dst.write(data)
+    return path
+
+
+def test_mosaic_window_across_tile_edge(tmp_path):
+    data = np.random.default_rng(0).random((1, 100, 200), dtype=np.float32)
+    left_tile = write_tile(tmp_path / "left.tif", data[:, :, :100], 280_000, 5_649_050)
+    right_tile = write_tile(tmp_path / "right.tif", data[:, :, 100:], 280_050, 5_649_050)
+
+    bounds = (280_040.2, 5_649_010.3, 280_060.2, 5_649_030.3)
+
+    with open_mosaic([left_tile, right_tile]) as mosaic:
+        assert mosaic.shape == (100, 200)
+        assert mosaic.bounds == (280_000, 5_649_000, 280_100, 5_649_050)
+
+        window = from_bounds(*bounds, transform=mosaic.transform)
+        result = read_window(mosaic, window)
+
+    expected = data[:, 39:79, 80:120]
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_mosaic_requires_common_grid(tmp_path):
+    data = np.zeros((1, 10, 10), dtype=np.uint8)
+    a = write_tile(tmp_path / "a.tif", data, 280_000, 5_649_005)
+    b = write_tile(tmp_path / "b.tif", data, 280_005.25, 5_649_005)
+    c = write_tile(tmp_path / "c.tif", data, 280_005, 5_649_005, res=1.0)
+
+    with pytest.raises(ValueError, match="pixel grid"):
+        with open_mosaic([a, b]):
+            pass
+
+    with pytest.raises(ValueError, match="res"):
+        with open_mosaic([a, c]):
+            pass
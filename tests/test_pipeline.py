@@ -0,0 +1,70 @@
+import random
+import threading
+import time
+
+import pytest
+
+from utils.pipeline import Pipeline, Stage
+
+
+def sleep_randomly(x):
+    time.sleep(random.uniform(0, 0.005))
+    return x
+
+
+def test_pipeline_keeps_order():
+    written = []
+    in_flight = {"current": 0, "max": 0}
+    lock = threading.Lock()
+
+    def read(x):
+        with lock:
+            in_flight["current"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        return sleep_randomly(x)
+
+    def write(x):
+        written.append(x)
+        return x * 2
+
+    def consume(x):
+        with lock:
+            in_flight["current"] -= 1
+        return x
+
+    pipeline = Pipeline(
+        [
+            Stage(read, workers=4, name="read"),
+            Stage(sleep_randomly, workers=3, name="compute"),
+            Stage(write, ordered=True, name="write"),
+        ],
+        queue_size=2,
+        max_in_flight=6,
+    )
+    results = [consume(x) for x in pipeline.run(range(100))]
+
+    assert results == [2 * x for x in range(100)]
+    assert written == list(range(100))
+    assert in_flight["max"] <= 6
+    assert pipeline.stats.items == 100
+    assert set(pipeline.stats.busy_seconds) == {"read", "compute", "write"}
+
+
+def test_pipeline_raises_stage_errors():
+    def fail_on_13(x):
+        if x == 13:
+            raise RuntimeError("unlucky")
+        return x
+
+    pipeline = Pipeline([Stage(fail_on_13, workers=2), Stage(sleep_randomly, workers=2)])
+
+    with pytest.raises(RuntimeError, match="unlucky"):
+        list(pipeline.run(range(1000)))
+
+    # the threads are stopped
+    assert not any(t.name.startswith("pipeline-") for t in threading.enumerate())
+
+
+def test_stage_validation():
+    with pytest.raises(ValueError, match="single worker"):
+        Stage(print, workers=2, ordered=True)
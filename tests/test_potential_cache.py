@@ -0,0 +1,53 @@
+import affine
+import numpy as np
+import shapely
+
+from energy_extractor.potential_cache import (
+    PotentialEnergyCache,
+    decode_footprint,
+    encode_footprint,
+    geometry_hashes,
+)
+from energy_extractor.zonal import compute_footprints
+
+
+def create_footprints():
+    outlines = np.array([shapely.box(1, 1, 4.2, 3), shapely.box(5, 0.5, 7, 4)])
+    yield_data = np.arange(100, dtype=np.float32).reshape(10, 10)
+    transform = affine.Affine(0.5, 0, 0, 0, -0.5, 5)
+    return outlines, compute_footprints(outlines, yield_data, transform, no_data_value=None)
+
+
+def test_encode_decode_footprint():
+    _, footprints = create_footprints()
+
+    for footprint in footprints:
+        decoded = decode_footprint(encode_footprint(footprint))
+
+        np.testing.assert_allclose(decoded.xs, footprint.xs)
+        np.testing.assert_allclose(decoded.ys, footprint.ys)
+        np.testing.assert_array_equal(decoded.pixel_yield, footprint.pixel_yield)
+        assert decoded.pixel_size == footprint.pixel_size
+
+
+def test_potential_energy_cache(tmp_path):
+    outlines, footprints = create_footprints()
+    hashes = geometry_hashes(outlines)
+    assert hashes == geometry_hashes(shapely.transform(outlines, lambda c: c + 1e-6))
+
+    with PotentialEnergyCache(tmp_path / "cache.sqlite") as cache:
+        cache.put("tile_a", "1", hashes[:1], np.array([12.5]), footprints[:1])
+
+    # persisted across instances
+    with PotentialEnergyCache(tmp_path / "cache.sqlite") as cache:
+        np.testing.assert_array_equal(cache.contains("tile_a", "1", hashes), [True, False])
+        assert len(cache.get("tile_a", "2", hashes)) == 0  # another version of the tile
+
+        cached = cache.get("tile_a", "1", hashes)
+        assert list(cached) == hashes[:1]
+        potential_energy, footprint = cached[hashes[0]]
+        assert potential_energy == 12.5
+        np.testing.assert_array_equal(footprint.pixel_yield, footprints[0].pixel_yield)
+
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 3
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from utils.raster_pool import RasterDatasetPool
+
+
+def write_raster(path, value: int):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=16,
+        height=16,
+        count=1,
+        dtype="uint8",
+        crs="EPSG:25832",
+        transform=from_origin(0, 16, 1, 1),
+    ) as dst:
+        dst.write(np.full((1, 16, 16), value, dtype=np.uint8))
+    return path
+
+
+def test_raster_pool_reuses_and_closes_handles(tmp_path):
+    a = write_raster(tmp_path / "a.tif", 1)
+    b = write_raster(tmp_path / "b.tif", 2)
+
+    pool = RasterDatasetPool(max_open=1)
+
+    with pool.open(a) as dataset_a:
+        # "a" is in use and must not be closed
+        with pool.open(b) as dataset_b:
+            assert dataset_b.read(1)[0, 0] == 2
+        assert not dataset_a.closed
+        assert dataset_b.closed
+
+    with pool.open(a) as dataset:
+        assert dataset is dataset_a
+
+    assert pool.stats.opens == 2
+    assert pool.stats.hits == 1
+    assert pool.stats.closes == 1
+    assert len(pool) == 1
+
+    pool.close()
+    assert len(pool) == 0
+
+
+def test_raster_pool_handles_per_thread(tmp_path):
+    a = write_raster(tmp_path / "a.tif", 1)
+    pool = RasterDatasetPool(max_open=4)
+
+    datasets = []
+    barrier = threading.Barrier(2)
+
+    def read():
+        with pool.open(a) as dataset:
+            datasets.append(dataset)
+            assert dataset.read(1).sum() == 256
+            # both threads hold a handle at the same time
+            barrier.wait(timeout=10)
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert datasets[0] is not datasets[1]
+    assert pool.stats.opens == 2
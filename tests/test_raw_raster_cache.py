@@ -0,0 +1,58 @@
+import pickle
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window, from_bounds
+
+from utils.raw_raster_cache import RawRasterCache
+from utils.window_planning import read_window
+
+
+def write_yield_tile(path, data: np.ndarray):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=data.shape[1],
+        height=data.shape[0],
+        count=1,
+        dtype=data.dtype,
+        crs="EPSG:25832",
+        transform=from_origin(280_000, 5_649_050, 0.5, 0.5),
+        nodata=-9999,
+        compress="deflate",
+    ) as dst:
+        dst.write(data, 1)
+    return path
+
+
+def test_raw_raster_cache(tmp_path):
+    data = np.random.default_rng(0).uniform(800, 1000, size=(100, 200)).astype(np.float32)
+    data[:10, :10] = -9999
+    tile = write_yield_tile(tmp_path / "tile.tif", data)
+
+    cache = RawRasterCache(tmp_path / "raw")
+    raster = cache.open(tile)
+
+    with rasterio.open(tile) as dataset:
+        assert raster.bounds == dataset.bounds
+        assert raster.transform == dataset.transform
+
+        # fractional windows are read like from the tile, no data values are replaced
+        window = from_bounds(280_003.2, 5_649_010.3, 280_020.2, 5_649_045.3, dataset.transform)
+        expected = read_window(dataset, window, indexes=[1])
+        expected[expected == -9999] = 0
+        np.testing.assert_array_equal(read_window(raster, window, indexes=[1]), expected)
+
+    # integer windows are views of the memory-mapped data
+    view = raster.read(1, window=Window(5, 20, 30, 40))
+    assert np.shares_memory(view, raster.data)
+    assert raster.profile["nodata"] is None
+
+    # converted once, also for other processes
+    assert cache.stats.conversions == 1
+    assert cache.open(tile) is raster
+    other_cache = pickle.loads(pickle.dumps(cache))
+    np.testing.assert_array_equal(other_cache.open(tile).data, raster.data)
+    assert other_cache.stats.conversions == 0
@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window, from_bounds
+
+from utils.mosaic import open_mosaic
+from utils.opengeodata_nrw import DatasetType
+from utils import remote_tiles
+from utils.remote_tiles import RANGE_CACHE_FOLDER_ENV, is_remote_path, open_raster
+from utils.tile_management import RANGE_CACHE_FOLDER, TileManager
+from utils.window_planning import read_window
+
+TILE_NAMES = [
+    "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_1",
+    "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32281_5648_1",
+]
+
+
+def write_tile(path, data: np.ndarray, left: float):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=data.shape[1],
+        height=data.shape[0],
+        count=1,
+        dtype=data.dtype,
+        crs="EPSG:25832",
+        transform=from_origin(left, 5_649_000, 0.5, 0.5),
+        tiled=True,
+        compress="deflate",
+    ) as dst:
+        dst.write(data, 1)
+
+
+def transferred_bytes(requests: list) -> int:
+    ranges = [re.match(r"bytes=(\d+)-(\d+)", r).groups() for _, r in requests if r is not None]
+    return sum(int(end) - int(start) + 1 for start, end in ranges)
+
+
+def test_remote_windowed_reads(http_server, tmp_path, monkeypatch):
+    # the TileManager configures the disk cache in the environment, restored afterwards
+    for name in (RANGE_CACHE_FOLDER_ENV, "GDAL_DISABLE_READDIR_ON_OPEN"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+    data = np.random.default_rng(0).random((2000, 4000), dtype=np.float32)
+    for i, tile_name in enumerate(TILE_NAMES):
+        tile_data = data[:, i * 2000 : (i + 1) * 2000]
+        write_tile(http_server["root"] / f"{tile_name}.tif", tile_data, 280_000 + i * 1000)
+
+    tile_info = pd.DataFrame(
+        {"tile_name": TILE_NAMES, "min_x": [280_000, 281_000], "min_y": 5_648_000, "extent": 1000}
+    )
+    tile_manager = TileManager(
+        tile_info,
+        data_folder=tmp_path / "data",
+        tile_type=DatasetType.ENERGY_YIELD_50CM,
+        base_url=http_server["url"],
+        remote=True,
+    )
+
+    tile_paths = tile_manager.acquire_tiles(TILE_NAMES)
+    assert all(is_remote_path(path) for path in tile_paths)
+
+    def read_windows():
+        with open_raster(tile_paths[0]) as dataset:
+            np.testing.assert_array_equal(
+                dataset.read(1, window=Window(100, 200, 50, 40)), data[200:240, 100:150]
+            )
+
+        # windows across the tile edge are read from a mosaic of the remote tiles
+        with open_mosaic(tile_paths) as mosaic:
+            window = from_bounds(280_990.2, 5_648_500.3, 281_010.2, 5_648_520.3, mosaic.transform)
+            np.testing.assert_array_equal(
+                read_window(mosaic, window), data[None, 959:999, 1980:2020]
+            )
+
+    read_windows()
+
+    # nothing is downloaded, only the fetched byte ranges are cached
+    assert [path.name for path in (tmp_path / "data").iterdir()] == [RANGE_CACHE_FOLDER]
+
+    # only the header and the blocks of the windows are fetched
+    tile_size = (http_server["root"] / f"{TILE_NAMES[0]}.tif").stat().st_size
+    assert 0 < transferred_bytes(http_server["requests"]) < tile_size / 4
+
+    # a later run (with a new file system instance) is served from the disk cache
+    remote_tiles._range_cache_container.cache_clear()
+    num_requests = len(http_server["requests"])
+    read_windows()
+    assert len(http_server["requests"]) == num_requests
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+smp = pytest.importorskip("segmentation_models_pytorch")
+pytest.importorskip("onnxruntime")
+
+from segmentation_model.backends import InferenceBackend, export_model, load_predictor  # noqa: E402
+from segmentation_model.inference import SegmentationPredictor  # noqa: E402
+
+
+@pytest.fixture
+def model_folder(tmp_path):
+    torch.manual_seed(0)
+    model = smp.UnetPlusPlus("resnet18", encoder_weights=None, classes=1)
+    # non-trivial batch norm statistics, folded into the convolutions by the exports
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.1, 0.1)
+            module.running_var.uniform_(0.5, 1.5)
+    model.save_pretrained(str(tmp_path / "stored_model"))
+    export_model(tmp_path / "stored_model")
+    return tmp_path / "stored_model"
+
+
+def test_backend_parity(model_folder):
+    eager = load_predictor(model_folder, InferenceBackend.EAGER)
+    assert isinstance(eager, SegmentationPredictor)
+
+    # the input normalization follows from the encoder in the stored config
+    params = smp.encoders.get_preprocessing_params("resnet18")
+    np.testing.assert_allclose(eager.mean.flatten().numpy(), params["mean"])
+    np.testing.assert_allclose(eager.std.flatten().numpy(), params["std"])
+    eager.eval()
+
+    # batch and image axes differ from the traced example input
+    for shape in [(3, 3, 64, 96), (1, 3, 128, 128)]:
+        images = torch.rand(shape)
+        with torch.inference_mode():
+            expected = eager(images).numpy()
+            for backend in [InferenceBackend.TORCHSCRIPT, InferenceBackend.ONNX]:
+                result = load_predictor(model_folder, backend)(images).numpy()
+                assert result.shape == (shape[0], 1, *shape[2:])
+                np.testing.assert_allclose(result, expected, atol=1e-4)
+
+
+def test_missing_export(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_predictor(tmp_path, InferenceBackend.ONNX)
+
+
+def test_missing_encoder_name(tmp_path):
+    (tmp_path / "config.json").write_text("{}")
+    with pytest.raises(ValueError):
+        load_predictor(tmp_path, InferenceBackend.EAGER)
@@ -0,0 +1,65 @@
+import affine
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.crop_store import CropStoreWriter, merge_index_parts
+
+torch = pytest.importorskip("torch")
+smp = pytest.importorskip("segmentation_models_pytorch")
+
+from segmentation_model.inference import (  # noqa: E402
+    SegmentationPredictor,
+    SizeBucketBatchSampler,
+    bucket_shape,
+    input_shape,
+    segment_crops,
+)
+
+
+def test_size_buckets():
+    # the longer side is resized to the training input size, also upwards
+    assert input_shape(70, 50) == (256, 183)
+    assert bucket_shape(*input_shape(70, 50)) == (256, 192)
+    assert input_shape(2000, 1000) == (256, 128)
+    assert input_shape(256, 256) == (256, 256)
+
+    sampler = SizeBucketBatchSampler([(64, 64), (96, 96), (64, 64), (64, 64)], batch_size=2)
+    assert list(sampler) == [[0, 2], [3], [1]]
+    assert len(sampler) == 3
+
+
+def test_segment_crops(tmp_path):
+    rng = np.random.default_rng(0)
+    transform = affine.Affine(0.1, 0.0, 280_000.0, 0.0, -0.1, 5_649_000.0)
+
+    sizes = {1: (40, 40), 2: (70, 60), 3: (45, 45), 4: (130, 40)}
+    with CropStoreWriter(tmp_path / "crops", prefix="tile") as writer:
+        for crop_id, (height, width) in sizes.items():
+            image = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+            # buildings 4 and 5 share a canvas
+            writer.append(crop_id, image, transform, [4, 5] if crop_id == 4 else None)
+    merge_index_parts(tmp_path / "crops", [writer.index_part_path])
+
+    model = smp.Unet("resnet18", encoder_weights=None, classes=1)
+    params = smp.encoders.get_preprocessing_params("resnet18")
+    predictor = SegmentationPredictor(
+        model, mean=torch.tensor(params["mean"]), std=torch.tensor(params["std"])
+    )
+    stats = segment_crops(
+        predictor,
+        tmp_path / "crops",
+        tmp_path / "masks",
+        batch_size=2,
+        num_workers=0,
+        input_size=64,
+    )
+    assert stats.images == 4
+    assert stats.buckets == 2  # crops 1, 2 and 3 are fed as 64 x 64, crop 4 as 64 x 32
+    assert stats.images_per_second > 0
+
+    # masks in the size of the crops, as read by the energy extractor
+    for crop_id, shape in sizes.items():
+        mask = np.array(Image.open(tmp_path / "masks" / f"{crop_id}.bmp"))
+        assert mask.shape == shape
+        assert mask.dtype == np.uint8
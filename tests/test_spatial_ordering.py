@@ -0,0 +1,27 @@
+import numpy as np
+
+from utils.spatial_ordering import hilbert_keys, z_order_keys
+
+
+def test_hilbert_keys_visit_neighbouring_cells():
+    order = 3
+    n = 1 << order
+    ys, xs = np.mgrid[0:n, 0:n]
+    xs, ys = xs.ravel() + 0.5, ys.ravel() + 0.5
+
+    keys = hilbert_keys(xs, ys, bounds=(0, 0, n, n), order=order)
+
+    # every cell is visited once, consecutive cells are adjacent
+    assert sorted(keys.tolist()) == list(range(n * n))
+    path = np.argsort(keys)
+    steps = np.abs(np.diff(xs[path])) + np.abs(np.diff(ys[path]))
+    np.testing.assert_array_equal(steps, 1)
+    assert (xs[path[0]], ys[path[0]]) == (0.5, 0.5)
+
+
+def test_z_order_keys():
+    keys = z_order_keys(
+        [0.5, 1.5, 0.5, 1.5, 3.5], [0.5, 0.5, 1.5, 1.5, 3.5], (0, 0, 4, 4), order=2
+    )
+
+    assert keys.tolist() == [0, 1, 2, 3, 15]
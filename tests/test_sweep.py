@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from energy_extractor.sweep import SWEEP_COLUMNS, sweep_energy
+
+
+def test_sweep_energy():
+    histograms = np.zeros((2, 256))
+    histograms[0, [0, 128, 255]] = [1.0, 2.0, 4.0]
+    histograms[1, 200] = 8.0
+    energy_histograms = pd.DataFrame(
+        {
+            "building_id": [11, 7],
+            "potential_energy_kWh": histograms.sum(axis=1),
+            "histogram": list(histograms),
+        }
+    )
+
+    sweep = sweep_energy(energy_histograms, thresholds=[0.5, 0.9], efficiencies=[0.2, 0.25])
+
+    assert list(sweep.columns) == SWEEP_COLUMNS
+    assert sweep["building_id"].tolist() == [11] * 4 + [7] * 4
+    assert sweep["segmentation_threshold"].tolist() == [0.5, 0.5, 0.9, 0.9] * 2
+    assert sweep["efficiency"].tolist() == [0.2, 0.25] * 4
+    # 128 / 255 > 0.5, 200 / 255 < 0.9
+    np.testing.assert_allclose(sweep["actual_energy_kWh"], [6, 6, 4, 4, 8, 8, 0, 0])
+    np.testing.assert_allclose(
+        sweep["mined_energy_kWh"], sweep["actual_energy_kWh"] * np.tile([0.2, 0.25], 4)
+    )
+    np.testing.assert_allclose(sweep["potential_energy_kWh"], [7] * 4 + [8] * 4)
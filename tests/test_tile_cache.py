@@ -0,0 +1,63 @@
+import os
+
+from utils.tile_cache import TileCache
+
+
+def write_tile(folder, name: str, size: int, mtime: float):
+    path = folder / name
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_tile_cache_evicts_least_recently_used(tmp_path):
+    a = write_tile(tmp_path, "a.jp2", 100, mtime=1_000)
+    b = write_tile(tmp_path, "b.jp2", 100, mtime=2_000)
+    c = write_tile(tmp_path, "c.jp2", 100, mtime=3_000)
+    catalog = write_tile(tmp_path, "aerial_images.csv", 100, mtime=0)
+
+    cache = TileCache(tmp_path, max_bytes=300)
+    assert cache.used_bytes == 300
+
+    # "a" becomes the most recently used tile, "b" the least recently used one
+    cache.record_hit(a)
+    cache.record_miss()
+    cache.reserve(100)
+
+    assert not b.exists()
+    assert a.exists() and c.exists() and catalog.exists()
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.evictions == 1
+
+
+def test_tile_cache_keeps_pinned_tiles(tmp_path):
+    a = write_tile(tmp_path, "a.tif", 100, mtime=1_000)
+    b = write_tile(tmp_path, "b.tif", 100, mtime=2_000)
+
+    cache = TileCache(tmp_path, max_bytes=200)
+
+    with cache.pinned(a):
+        d = write_tile(tmp_path, "d.tif", 100, mtime=3_000)
+        cache.add(d)
+
+    assert a.exists() and d.exists()
+    assert not b.exists()
+    assert cache.used_bytes == 200
+
+
+def test_tile_caches_share_a_folder(tmp_path):
+    aerial = write_tile(tmp_path, "a.jp2", 100, mtime=1_000)
+    aerial_cog = write_tile(tmp_path, "b.cog.tif", 100, mtime=2_000)
+    energy = write_tile(tmp_path, "c.tif", 100, mtime=3_000)
+
+    aerial_cache = TileCache(tmp_path, max_bytes=200, patterns=("*.jp2", "*.cog.tif"))
+    energy_cache = TileCache(tmp_path, max_bytes=100, patterns=("*.tif",), exclude=("*.cog.tif",))
+    assert aerial_cache.used_bytes == 200
+    assert energy_cache.used_bytes == 100
+
+    # each cache only evicts its own tiles
+    energy_cache.reserve(100)
+    aerial_cache.reserve(100)
+    assert not energy.exists() and not aerial.exists()
+    assert aerial_cog.exists()
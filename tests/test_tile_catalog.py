@@ -0,0 +1,101 @@
+from io import StringIO
+
+import pandas as pd
+
+from utils.opengeodata_nrw import DatasetType
+from utils.tile_catalog import TileCatalog, tiles_from_download_links
+from utils.tile_management import encode_tile_key, read_html_extraction_file
+
+AERIAL_CSV = """\
+File,Date,Size
+dop10rgbi_32_280_5648_1_nw_2024.jp2,2024-05-02,310 MB
+dop10rgbi_32_283_5651_1_nw_2024.jp2,2024-05-02,305 MB
+dop10rgbi_32_284_5648_1_nw_2024.jp2,2024-05-02,301 MB
+"""
+
+ENERGY_CSV = """\
+File,Date,Size
+Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_4.tif,2023-11-20,120 MB
+"""
+
+
+def build_catalog() -> TileCatalog:
+    return TileCatalog.build(
+        {
+            DatasetType.AERIAL_IMAGE: read_html_extraction_file(StringIO(AERIAL_CSV)),
+            DatasetType.ENERGY_YIELD_50CM: read_html_extraction_file(StringIO(ENERGY_CSV)),
+        }
+    )
+
+
+def test_build_catalog():
+    catalog = build_catalog()
+
+    energy_tiles = catalog.get_tile_info(DatasetType.ENERGY_YIELD_50CM)
+    assert energy_tiles[["min_x", "min_y", "extent"]].iloc[0].tolist() == [
+        280_000,
+        5648_000,
+        4000,
+    ]
+    assert energy_tiles["tile_key"].iloc[0] == encode_tile_key(280_000, 5648_000)
+
+    # the publication date identifies the version of a tile without downloading it
+    energy_tile_manager = catalog.tile_manager(DatasetType.ENERGY_YIELD_50CM)
+    tile_name = "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_4"
+    assert energy_tile_manager.get_tile_version(tile_name) == "2023-11-20"
+
+    covering = catalog.covering_tiles(DatasetType.ENERGY_YIELD_50CM)
+    energy_tile = "Strahlungsenergie-NRW-KWh-Yr-Shd-50cm-V23_32280_5648_4.tif"
+    assert covering.to_dict() == {
+        "dop10rgbi_32_280_5648_1_nw_2024.jp2": energy_tile,
+        "dop10rgbi_32_283_5651_1_nw_2024.jp2": energy_tile,
+        "dop10rgbi_32_284_5648_1_nw_2024.jp2": None,
+    }
+
+
+def test_write_and_read_catalog(tmp_path):
+    catalog = build_catalog()
+    catalog_path = tmp_path / "tile_catalog.feather"
+
+    catalog.write(catalog_path)
+    catalog_read = TileCatalog.read(catalog_path)
+
+    # the tiles of a dataset are converted from the memory-mapped table on their own
+    for dataset_type in catalog.datasets:
+        pd.testing.assert_frame_equal(
+            catalog.get_tile_info(dataset_type), catalog_read.get_tile_info(dataset_type)
+        )
+    pd.testing.assert_series_equal(
+        catalog.covering_tiles(DatasetType.ENERGY_YIELD_50CM),
+        catalog_read.covering_tiles(DatasetType.ENERGY_YIELD_50CM),
+    )
+    assert catalog_read.datasets == catalog.datasets
+
+    pd.testing.assert_frame_equal(catalog.tiles, catalog_read.tiles)
+
+    tile_manager = catalog_read.tile_manager(DatasetType.AERIAL_IMAGE)
+    assert (
+        tile_manager.get_tile_name_from_point(283_500, 5651_500)
+        == "dop10rgbi_32_283_5651_1_nw_2024"
+    )
+
+
+def test_tiles_from_download_links():
+    download_links = pd.DataFrame(
+        {
+            "name": ["dop10rgbi_32_478_5740_1_nw_2024.jp2", "dop_nw.csv"],
+            "size": [312_000_000, 1_000],
+        }
+    )
+
+    tile_info = tiles_from_download_links(download_links)
+
+    assert tile_info.to_dict("records") == [
+        {
+            "tile_name": "dop10rgbi_32_478_5740_1_nw_2024.jp2",
+            "size": 312_000_000,
+            "min_x": 478_000,
+            "min_y": 5740_000,
+            "extent": 1000,
+        }
+    ]
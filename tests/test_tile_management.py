@@ -1,9 +1,11 @@
 from io import StringIO
 
+import numpy as np
+import pandas as pd
 import pytest
 
 from utils.opengeodata_nrw import DatasetType
-from utils.tile_management import TileManager
+from utils.tile_management import TileManager, decode_tile_key
 
 # Sample CSV data for testing
 CSV_DATA = """\
@@ -39,3 +41,49 @@ def test_get_tile_name_from_point(tile_manager):
     x, y = 100_000, 1000_000
     with pytest.raises(ValueError, match="No tile found for point"):
         tile_manager.get_tile_name_from_point(x, y)
+
+
+def test_get_tile_names_for_points(tile_manager):
+    xs = np.array([478_500, 384_999.5, 100_000, 478_000])
+    ys = np.array([5739_500, 5620_000.0, 1000_000, 5740_999])
+
+    result = tile_manager.get_tile_names_for_points(xs, ys)
+
+    assert result.tile_names.tolist() == [
+        "dop10rgbi_32_478_5739_1_nw_2024",
+        "dop10rgbi_32_384_5620_1_nw_2023",
+        None,
+        "dop10rgbi_32_478_5740_1_nw_2024",
+    ]
+    assert result.missing.tolist() == [2]
+    assert result.ambiguous.tolist() == []
+    assert decode_tile_key(result.tile_keys[0]) == (478_000, 5739_000)
+
+
+def test_get_tile_names_for_points_irregular_catalog():
+    tile_info = pd.DataFrame(
+        {
+            "tile_name": ["a", "b", "c"],
+            "min_x": [0, 1000, 500],
+            "min_y": [0, 0, 2000],
+            "extent": [1000, 1000, 2000],
+        }
+    )
+    tile_manager = TileManager(tile_info, tile_type=DatasetType.AERIAL_IMAGE)
+
+    result = tile_manager.get_tile_names_for_points([500, 1000, 1500, 5000], [500, 500, 3000, 0])
+
+    assert result.tile_names.tolist() == ["a", None, "c", None]
+    assert result.missing.tolist() == [3]
+    # the point lies on the shared edge of tiles "a" and "b"
+    assert result.ambiguous.tolist() == [1]
+
+
+def test_get_tile_names_for_keys(tile_manager):
+    points = tile_manager.get_tile_names_for_points([478_500, 384_500], [5739_500, 5620_500])
+
+    result = tile_manager.get_tile_names_for_keys([*points.tile_keys, -1, 12345])
+
+    assert result.tile_names.tolist() == [*points.tile_names, None, None]
+    assert result.tile_keys.tolist() == [*points.tile_keys, -1, -1]
+    assert result.missing.tolist() == [2, 3]
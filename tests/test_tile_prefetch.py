@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from utils.opengeodata_nrw import DatasetType
+from utils.tile_cache import TileCache
+from utils.tile_management import TileManager
+from utils.tile_prefetch import iter_tiles_with_prefetch, plan_tiles
+
+TILE_NAMES = [f"dop10rgbi_32_478_{y}_1_nw_2024" for y in (5739, 5740, 5741)]
+
+
+def create_tile_manager(http_server, tmp_path) -> TileManager:
+    for tile_name in TILE_NAMES:
+        (http_server["root"] / f"{tile_name}.jp2").write_bytes(os.urandom(1_000))
+
+    tile_info = pd.DataFrame(
+        {
+            "tile_name": TILE_NAMES,
+            "min_x": 478_000,
+            "min_y": [5739_000, 5740_000, 5741_000],
+            "extent": 1000,
+            "size": 1_000,
+        }
+    )
+    return TileManager(
+        tile_info,
+        data_folder=tmp_path / "data",
+        tile_type=DatasetType.AERIAL_IMAGE,
+        base_url=http_server["url"],
+        cache=TileCache(tmp_path / "data"),
+    )
+
+
+def test_plan_tiles(http_server, tmp_path):
+    tile_manager = create_tile_manager(http_server, tmp_path)
+
+    centers = [(478_500, 5740_500), (478_500, 5739_500), (478_600, 5740_500), (0, 0)]
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [1, 2, 3, 4]},
+        geometry=[shapely.Point(x, y).buffer(5) for x, y in centers],
+        crs="EPSG:25832",
+    ).to_crs("EPSG:4326")
+
+    plan = plan_tiles(buildings, {"aerial_tile": tile_manager}, ordering=None)
+
+    # grouped by tile, in the order of the first appearance, building 4 has no tile
+    assert plan.buildings["building_id"].tolist() == [1, 3, 2]
+    assert plan.tiles["aerial_tile"] == [TILE_NAMES[1], TILE_NAMES[0]]
+
+
+def test_plan_tiles_spatial_ordering(http_server, tmp_path):
+    tile_manager = create_tile_manager(http_server, tmp_path)
+
+    # a 2 x 2 grid of buildings within a tile, in scattered order
+    centers = [(478_900, 5740_900), (478_100, 5740_100), (478_900, 5740_100), (478_100, 5740_900)]
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [1, 2, 3, 4]},
+        geometry=[shapely.Point(x, y).buffer(5) for x, y in centers],
+        crs="EPSG:25832",
+    )
+
+    plan = plan_tiles(buildings, {"aerial_tile": tile_manager})
+
+    # along the Hilbert curve, starting in the lower left corner
+    assert plan.buildings["building_id"].tolist() == [2, 4, 1, 3]
+
+
+def test_iter_tiles_with_prefetch(http_server, tmp_path):
+    tile_manager = create_tile_manager(http_server, tmp_path)
+
+    visited = []
+    for tile_name, tile_path in iter_tiles_with_prefetch(tile_manager, TILE_NAMES, lookahead=1):
+        assert tile_path.exists()
+        visited.append(tile_name)
+
+    assert visited == TILE_NAMES
+    assert tile_manager._cache._pins == {}
+
+
+def test_concurrent_ensure_tile(http_server, tmp_path):
+    tile_manager = create_tile_manager(http_server, tmp_path)
+
+    # e.g. the prefetching and the neighbour tiles of the current tile
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(tile_manager.ensure_tile, [TILE_NAMES[0]] * 4))
+
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == (http_server["root"] / f"{TILE_NAMES[0]}.jp2").read_bytes()
+    assert len(http_server["requests"]) == 1
@@ -0,0 +1,60 @@
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from utils.window_planning import plan_coalesced_reads, slice_window, window_pixel_extent
+
+
+def test_plan_coalesced_reads():
+    extents = [
+        (10, 40, 10, 40),  # block (0, 0)
+        (30, 70, 30, 70),  # blocks (0, 0) to (1, 1)
+        (200, 220, 200, 220),  # block (3, 3)
+    ]
+    plan = plan_coalesced_reads(extents, block_shape=(64, 64), raster_shape=(256, 256))
+
+    assert plan.assignment.tolist() == [0, 0, 1]
+    assert plan.windows == [Window(0, 0, 128, 128), Window(192, 192, 64, 64)]
+
+    # super-windows are limited in size
+    plan = plan_coalesced_reads(
+        extents, block_shape=(64, 64), raster_shape=(256, 256), max_pixels=64 * 64
+    )
+    assert len(plan.windows) == 3
+
+
+def test_slice_window_equals_window_read(tmp_path):
+    data = np.random.default_rng(0).integers(0, 255, size=(3, 256, 256), dtype=np.uint8)
+    with rasterio.open(
+        tmp_path / "tile.tif",
+        "w",
+        driver="GTiff",
+        width=256,
+        height=256,
+        count=3,
+        dtype="uint8",
+        tiled=True,
+        blockxsize=64,
+        blockysize=64,
+        transform=from_origin(0, 256, 1, 1),
+    ) as dst:
+        dst.write(data)
+
+    windows = [Window(10.4, 12.7, 30.6, 30.6), Window(20.5, 25.2, 45.3, 45.3)]
+    shapes = [(round(w.height), round(w.width)) for w in windows]
+
+    with rasterio.open(tmp_path / "tile.tif") as src:
+        plan = plan_coalesced_reads(
+            [window_pixel_extent(w, shape) for w, shape in zip(windows, shapes)],
+            block_shape=src.block_shapes[0],
+            raster_shape=src.shape,
+        )
+        assert len(plan.windows) == 1
+
+        super_window_data = src.read(window=plan.windows[0])
+        for window, shape in zip(windows, shapes):
+            expected = src.read(window=window)
+            np.testing.assert_array_equal(
+                slice_window(super_window_data, plan.windows[0], window, shape), expected
+            )
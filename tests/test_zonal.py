@@ -0,0 +1,145 @@
+import affine
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from PIL import Image
+
+from energy_extractor.energy_extraction import (
+    BuildingYieldData,
+    EnergyEngine,
+    compute_building_energy,
+    extract_tile_energy,
+)
+from energy_extractor.zonal import (
+    ENERGY_COLUMNS,
+    assign_layers,
+    compute_energy,
+    compute_footprints,
+)
+from utils.crop_store import TRANSFORM_COLUMNS
+
+YIELD_TRANSFORM = affine.Affine(0.5, 0, 0, 0, -0.5, 20)
+
+
+def create_crops(crop_ids: dict[int, int], size: int = 40) -> pd.DataFrame:
+    # every crop covers the whole 20m x 20m area with `size` x `size` pixels
+    transform = affine.Affine(20 / size, 0, 0, 0, -20 / size, 20)
+    crops = pd.DataFrame(
+        {
+            "building_id": list(crop_ids),
+            "crop_id": list(crop_ids.values()),
+            "width": size,
+            "height": size,
+        }
+    )
+    crops[TRANSFORM_COLUMNS] = tuple(transform)[:6]
+    return crops.set_index("building_id")
+
+
+def test_assign_layers():
+    outlines = np.array(
+        [shapely.box(0, 0, 4, 4), shapely.box(2, 2, 6, 6), shapely.box(4, 0, 8, 2)]
+    )
+
+    # touching outlines share a layer, overlapping ones do not
+    np.testing.assert_array_equal(assign_layers(outlines), [0, 1, 0])
+
+
+def test_nested_and_duplicate_footprints():
+    outlines = np.array(
+        [shapely.box(0, 0, 10, 10), shapely.box(2, 2, 4, 4), shapely.box(0, 0, 10, 10)]
+    )
+    np.testing.assert_array_equal(assign_layers(outlines), [0, 1, 2])
+
+    # each building keeps its own footprint (0.5m pixels)
+    yield_data = np.ones((40, 40), dtype=np.float32)
+    footprints = compute_footprints(outlines, yield_data, YIELD_TRANSFORM, no_data_value=None)
+    assert [len(footprint) for footprint in footprints] == [400, 16, 400]
+
+
+def test_compute_energy():
+    rng = np.random.default_rng(0)
+    yield_data = rng.uniform(800, 1000, size=(40, 40)).astype(np.float32)
+    yield_data[0, 0] = -9999
+
+    outlines = [
+        shapely.box(0, 12, 6.5, 20),
+        shapely.box(5, 14, 12, 19),  # overlaps the first building
+        shapely.box(2, 2, 9, 7),
+    ]
+    buildings = gpd.GeoDataFrame({"building_id": [7, 3, 5]}, geometry=outlines, crs="EPSG:25832")
+    crops = create_crops({7: 7, 3: 7, 5: 5})
+
+    masks = {7: np.zeros((40, 40), dtype=np.uint8), 5: np.zeros((40, 40), dtype=np.uint8)}
+    masks[7][:8, :] = 255  # upper 4m of the area
+    masks[5][26:, :10] = 255
+
+    # the computation of `extract_tile_energy` with the zonal engine
+    footprints = compute_footprints(
+        np.array(outlines), yield_data, YIELD_TRANSFORM, no_data_value=-9999
+    )
+    energy = compute_energy(
+        buildings["building_id"].to_numpy(),
+        footprints,
+        crops,
+        masks.__getitem__,
+        segmentation_threshold=0.5,
+        efficiency=0.2,
+    )
+
+    assert energy["building_id"].tolist() == [7, 3, 5]
+
+    # identical to the computation per building, the crops are aligned with the pixels
+    for building, (_, row) in zip(buildings.itertuples(), energy.iterrows()):
+        expected = compute_building_energy(
+            BuildingYieldData(
+                building_order=0,
+                building_id=building.building_id,
+                building_polygon_utm=building.geometry,
+                yield_data=yield_data.copy(),
+                yield_transform=YIELD_TRANSFORM,
+                segmentation_mask=masks[crops.loc[building.building_id, "crop_id"]],
+            ),
+            no_data_value=-9999,
+            segmentation_threshold=0.5,
+            efficiency=0.2,
+        )
+        for column in ENERGY_COLUMNS:
+            np.testing.assert_allclose(row[column], expected[column], rtol=1e-6)
+
+
+def test_extract_tile_energy_from_footprints(tmp_path):
+    outlines = [shapely.box(0, 12, 6.5, 20), shapely.box(2, 2, 9, 7)]
+    buildings = gpd.GeoDataFrame(
+        {"building_id": [7, 5]}, geometry=outlines, crs="EPSG:25832", index=[4, 1]
+    )
+    crops = create_crops({7: 7, 5: 5})
+
+    masks = {7: np.zeros((40, 40), dtype=np.uint8), 5: np.full((40, 40), 255, dtype=np.uint8)}
+    for crop_id, mask in masks.items():
+        Image.fromarray(mask).save(tmp_path / f"{crop_id}.bmp")
+
+    yield_data = np.full((40, 40), 900, dtype=np.float32)
+    footprints = compute_footprints(
+        np.array(outlines), yield_data, YIELD_TRANSFORM, no_data_value=None
+    )
+
+    # all footprints are known, the energy yield tile is not read
+    result = extract_tile_energy(
+        "tile",
+        None,
+        buildings,
+        crops,
+        tmp_path,
+        segmentation_threshold=0.5,
+        efficiency=0.2,
+        engine=EnergyEngine.ZONAL,
+        footprints=footprints,
+    )
+
+    assert [stats["building_order"] for stats in result.energy_stats] == [4, 1]
+    assert [stats["building_id"] for stats in result.energy_stats] == [7, 5]
+    assert result.energy_stats[0]["actual_energy_kWh"] == 0
+    np.testing.assert_allclose(result.energy_stats[1]["actual_energy_kWh"], 7 * 5 * 900)
+    np.testing.assert_allclose(result.energy_stats[0]["potential_energy_kWh"], 6.5 * 8 * 900)